@@ -1,6 +1,7 @@
 # encoding: utf-8
 
 import os
+import re
 import sys
 import time
 from datetime import datetime
@@ -13,9 +14,16 @@ from init_conf import CUSTOMER_OPTIONS  # 导入自定义配置
 sys.path.append('..')
 from utils.common_func import print_function, is_same_day
 from utils.cmd import run_cmd
-from utils.prepare import read_env_file
-from utils.serial_utils import init_serial, get_ip
-from utils.ssh_utils import init_ssh_channel
+from utils.prepare import read_env_file, prefetch_env_files, set_env_selection
+from utils.prefetch import stop_prefetch
+from utils.serial_utils import init_serial, get_ip, start_serial_reader, stop_serial_reader, get_serial_reader, raw_to_string
+from utils.ssh_utils import init_ssh_executor
+from utils.session import DeviceSession
+from utils.capture import configure_capture, set_capture_case, release_spools
+from utils.cache import configure_cache, get_cache
+from utils.history import configure_history, get_history, close_history, set_history_case, record_case, case_id
+from utils.schedule import LPTScheduler
+from utils.tasks import TaskGroups, parse_tasks, task_reports
 
 
 def pytest_html_results_summary(prefix, summary, postfix):
@@ -40,8 +48,50 @@ def pytest_addoption(parser):
             group.addoption(opt, **filtered_kwargs)
 
 
+def _use_device(config, device, worker_id=None):
+    """
+    把--devices中的一块板设置为本进程的--serial_port/--ip,
+    worker使用host_ws和nfs_path下以worker id命名的子目录, 各板的工作空间互不干扰
+    """
+    if re.match(r'^\d{1,3}(\.\d{1,3}){3}$', device):
+        config.option.ip, config.option.serial_port = device, None
+    else:
+        config.option.serial_port, config.option.ip = device, None
+    if worker_id:
+        config.option.host_ws = config.getoption("--host_ws").replace("\\", "/").rstrip("/") + "/" + worker_id
+        config.option.nfs_path = config.getoption("--nfs_path").rstrip("/") + "/" + worker_id
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_configure_node(node):
+    """pytest-xdist: 主进程启动worker时, 传给worker的参数"""
+    node.workerinput["dist"] = node.config.option.dist
+
+
 def pytest_configure(config):
     """配置阶段"""
+    # 多板并行: 每块板一个pytest-xdist worker, 用例分发给空闲的板, 报告由主进程合并
+    devices = [d.strip() for d in (config.getoption("--devices") or "").split(",") if d.strip()]
+    xdist_controller = False
+    if devices:
+        worker_id = config.workerinput["workerid"] if hasattr(config, "workerinput") else None
+        if worker_id:
+            _use_device(config, devices[int(worker_id[2:])], worker_id)
+            # worker的选项来自命令行, 主进程设置的dist不会传过来
+            if config.getoption("--schedule") == "lpt" and config.workerinput.get("dist") == "loadgroup":
+                config.option.loadgroup = True
+        elif len(devices) == 1:
+            _use_device(config, devices[0])
+        elif not config.getoption("collectonly"):
+            if not config.pluginmanager.hasplugin("xdist"):
+                raise pytest.UsageError("--devices with several boards requires pytest-xdist")
+            xdist_controller = True
+            config.option.numprocesses = len(devices)
+            config.option.tx = ["popen"] * len(devices)
+            if config.option.dist == "no":
+                # lpt: 每个模块(链)作为一个xdist_group整体分给一块板
+                config.option.dist = "loadgroup" if config.getoption("--schedule") == "lpt" else "load"
+
     # 打印接收到的参数
     print("\n=== Customer Configuration ===\n")
     for group_name, options in CUSTOMER_OPTIONS.items():
@@ -50,6 +100,102 @@ def pytest_configure(config):
             value = config.getoption(opt)
             print(f"{opt.ljust(20)}:{value}")
 
+    # 长时间用例的串口输出写入spool文件, 内存中只保留尾部
+    spool_dir = config.getoption("--spool_dir")
+    if spool_dir:
+        configure_capture(spool_dir.replace("\\", "/"), compress=config.getoption("--spool_compress"),
+                          keep_passed=config.getoption("--spool_keep_passed"))
+
+    # 跨构建的下载缓存, 只有新的产物才需要从服务器下载;
+    # 多板并行时由各worker使用(索引加锁合并), 主进程不下载, 不使用缓存
+    cache_dir = config.getoption("--cache_dir")
+    if cache_dir and not xdist_controller:
+        configure_cache(cache_dir.replace("\\", "/"), quota_gb=config.getoption("--cache_quota"))
+
+    # 用例耗时历史, 用于按历史耗时缩短用例超时, 挂死的用例尽早失败
+    history_db = config.getoption("--history_db")
+    if history_db:
+        configure_history(history_db.replace("\\", "/"),
+                          board=config.getoption("--board"),
+                          sdk_version=config.getoption("--sdk_version"),
+                          margin=config.getoption("--timeout_margin"))
+
+    # 一个会话执行多组marker(--tasks): 设备只初始化一次, 每组有自己的时间预算和html/junit报告;
+    # 须在lpt_scheduler之前注册, 先按lpt排序, 再按组排序
+    tasks = config.getoption("--tasks")
+    if tasks:
+        groups = TaskGroups(parse_tasks(tasks))
+        config.pluginmanager.register(groups, "task_groups")
+        if not hasattr(config, "workerinput"):
+            for name, plugin in task_reports(config, groups, config.getoption("--task_reports")).items():
+                config.pluginmanager.register(plugin, name)
+
+    # 按历史耗时排序模块, 最长的先执行, 多板时总耗时最短
+    if config.getoption("--schedule") == "lpt":
+        config.pluginmanager.register(LPTScheduler(boards=max(1, len(devices)),
+                                                   history=get_history(),
+                                                   reports_dir=config.getoption("--schedule_reports")),
+                                      "lpt_scheduler")
+
+
+@pytest.hookimpl(trylast=True)
+def pytest_collection_finish(session):
+    """
+    收集完成后(-m/-k筛选和用例排序(包括--schedule)已完成):
+    1. 记录每个env_file被选中用例的marker和用例名, 只执行它们需要的action(for_markers);
+    2. 按模块执行顺序规划环境准备, 主机端的下载等操作在后台提前执行
+    """
+    config = session.config
+    selection = {}      # env_file -> tags, 按模块执行顺序
+    for item in session.items:
+        callspec = getattr(item, "callspec", None)
+        param = callspec.params.get("prepare_ws") if callspec else None
+        env_file = param.get("env_file") if isinstance(param, dict) else None
+        if env_file:
+            tags = selection.setdefault(env_file, set())
+            tags.update(marker.name for marker in item.iter_markers())
+            tags.add(item.originalname)
+    set_env_selection(selection)
+
+    # --clean 会在模块结束后删除工作空间, 预取的内容会被删除;
+    # 多板并行时worker收集全部用例, 但只执行分发给它的部分, 不预取
+    if config.option.collectonly or config.getoption("--clean") or config.getoption("--prefetch_workers") <= 0 \
+            or hasattr(config, "workerinput"):
+        return
+    if selection:
+        prefetch_env_files(list(selection), config)
+
+
+def pytest_unconfigure(config):
+    """结束阶段"""
+    stop_prefetch()
+    close_history()
+    cache = get_cache()
+    if cache:
+        cache.save()
+        logging.info(cache.summary())
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    """
+    记录用例耗时(见utils.history); 通过的用例删除其spool文件(除非--spool_keep_passed);
+    用例失败时, 将用例执行期间的完整串口输出附加到报告中
+    """
+    outcome = yield
+    report = outcome.get_result()
+    if report.when != "call":
+        return
+    record_case(case_id(item), report.duration, report.outcome)
+    release_spools(report.passed)
+    if not report.failed:
+        return
+    session = item.funcargs.get("setup_session")
+    reader = get_serial_reader(session.client) if session is not None else None
+    if reader:
+        console = raw_to_string(reader.window(call.start, call.stop))
+        report.sections.append(("Captured serial console", console))
+
 
 @pytest.fixture(scope="session", autouse=True)
 def setup_session(request):
@@ -59,8 +205,9 @@ def setup_session(request):
     Logic:
     1. LTPU device using host-device mode
     2. establish serial connection or ssh connection according options;
-    3. mkdir test_path and change to test_path for device
-    4. return serial.Serial or paramiko.Channel
+    3. mkdir test_path, the commands run in test_path;
+    4. return DeviceSession wrapping serial.Serial or SSHExecutor, it caches cwd and mounts
+       so the housekeeping commands already in effect are not sent again
     """
     print_function()
     device = None
@@ -70,10 +217,13 @@ def setup_session(request):
     if serial_port:
         device = init_serial(serial_port)
         assert device, f'{serial_port}: connect fail!'
+        # 会话级串口读线程, 命令之间的输出(内核打印/异步日志)也会保留
+        start_serial_reader(device)
     elif device_ip:
         user = request.config.getoption("--user")
         pwd = request.config.getoption("--pwd")
-        device = init_ssh_channel(ip=device_ip, user=user, pwd=pwd)
+        # 每条命令使用独立的exec通道, 返回真实退出码
+        device = init_ssh_executor(ip=device_ip, user=user, pwd=pwd)
         assert device, f'{device_ip}: connect fail!'
 
     if request.config.getoption("--reboot"):
@@ -82,23 +232,28 @@ def setup_session(request):
         ip = get_ip(ser=device)
         assert ip, "Cannot get ip"
 
+    session = DeviceSession(device)
     test_path = request.config.getoption("--test_path").replace("\\", "/")
-    cmd = "mkdir -p " + test_path + " && cd " + test_path + " && pwd"
-    run_cmd(client=device,
+    cmd = "mkdir -p " + test_path
+    run_cmd(client=session,
             cmd=str(cmd),
-            timeout=3)
+            timeout=3,
+            sentinel=True)
+    # 之后的命令在test_path下执行, 需要时cd内联到命令前
+    session.set_workdir(test_path)
     sd_dev = request.config.getoption("--sd_dev")
-    cmd = "mount " + sd_dev + " /mnt/sd"
-    run_cmd(client=device,
-            cmd=str(cmd),
-            timeout=3)
+    session.mount(sd_dev, "/mnt/sd")
 
     def teardown_setup_session():
         print_function()
-        run_cmd(client=device, cmd="cd ~", timeout=1)
-        device.close()
+        # 模块结束时不卸载nfs(--clean除外), 会话结束时统一卸载
+        session.umount(test_path)
+        if serial_port:
+            stop_serial_reader(device)
+        session.close()
 
-    return device
+    request.addfinalizer(teardown_setup_session)
+    return session
 
 
 @pytest.fixture(scope="session", autouse=True)
@@ -113,7 +268,7 @@ def check_img_ver(setup_session, request):
         today = datetime.today().strftime('%Y%m%d')
 
         device = setup_session
-        log, _, _ = run_cmd(client=device, cmd="uname -v", timeout=3)
+        log, _, _ = run_cmd(client=device, cmd="uname -v", timeout=3, sentinel=True)
         log = ' '.join(log.split('\n')[:])
         assert is_same_day(log, today), "Update Failed"
     else:
@@ -136,6 +291,8 @@ def prepare_ws(setup_session, request):
     print_function()
     module_id = id(request.module)
     logging.info(f"module_id:{module_id}")
+    device = setup_session
+    test_path = request.config.getoption("--test_path").replace("\\", "/")
 
     # 如果该模块的工作空间不存在则创建
     if module_id not in _module_workspaces:
@@ -148,17 +305,9 @@ def prepare_ws(setup_session, request):
         workspace_path_pc = request.config.getoption("--host_ws").replace("\\", "/")
         os.makedirs(workspace_path_pc, exist_ok=True)
 
-        # nfs 挂载
-        device = setup_session
+        # nfs 挂载, 前一个模块已挂载时不再发送命令
         nfs_path = request.config.getoption("--nfs_path").replace("\\", "/")
-        test_path = request.config.getoption("--test_path").replace("\\", "/")
-        src = nfs_path[:-1] if nfs_path.endswith("/") else nfs_path
-        log, _, _ = run_cmd(client=device, cmd="df -h", timeout=3)
-        if src not in log:
-            cmd = f"mount -t nfs -o nolock {nfs_path} {test_path}"
-            run_cmd(client=device, cmd=str(cmd))
-        log, _, _ = run_cmd(client=device, cmd="df -h", timeout=3)
-        assert src in log, 'mount nfs fail'
+        assert device.mount(nfs_path, test_path, options="-t nfs -o nolock"), 'mount nfs fail'
 
         # 初始化环境
         read_env_file(env_file, request, device)
@@ -173,10 +322,9 @@ def prepare_ws(setup_session, request):
     yield _module_workspaces[module_id]
 
     if module_id in _module_workspaces:
-        cmd = "umount " + test_path
-        run_cmd(client=device, cmd=str(cmd), timeout=3)
-        # 模块测试结束后清理工作空间
+        # 模块测试结束后清理工作空间; 不清理时nfs保持挂载给后续模块使用, 会话结束时卸载
         if request.config.getoption("--clean"):
+            device.umount(test_path)
             logging.warning(f"Cleaning workspace for module: {request.module.__name__}")
             workspace_path_pc = _module_workspaces[module_id]["path"]
             if os.path.exists(workspace_path_pc):
@@ -188,16 +336,11 @@ def prepare_ws(setup_session, request):
 def change_workspace(setup_session, request):
     """
     Function: change test workspace
+    The case commands run in test_path, DeviceSession prefixes "cd" to them only when the shell
+    may be elsewhere (no round trip before/after each case)
     """
     print_function()
-    device = setup_session
+    set_capture_case(request.node.name)
+    set_history_case(case_id(request.node))
     test_path = request.config.getoption("--test_path").replace("\\", "/")
-    cmd = "cd " + test_path + " && pwd"
-    run_cmd(client=device, cmd=str(cmd), timeout=3)
-
-    def return_cwd():
-        run_cmd(client=device,
-                cmd="cd ~ && pwd",
-                timeout=3)
-
-    request.addfinalizer(return_cwd)
+    setup_session.set_workdir(test_path)
@@ -12,6 +12,13 @@ CUSTOMER_OPTIONS = {
             "default": None,
             "help": "IP address connected to client. (mutually exclusive with --serial_port)"
         },
+        "--devices": {
+            "action": "store",
+            "type": str,
+            "default": None,
+            "help": "comma separated serial ports or IPs of several boards, the cases are distributed to "
+                    "the free board (one pytest-xdist worker per board, overrides --serial_port/--ip)"
+        },
         "--user": {
             "action": "store",
             "type": str,
@@ -63,6 +70,103 @@ CUSTOMER_OPTIONS = {
             "action": "store_true",
             "default": False,
             "help": "whether reboot board"
+        },
+        "--spool_dir": {
+            "action": "store",
+            "type": str,
+            "default": None,
+            "help": "spool console output of test cases to files in this directory instead of memory"
+        },
+        "--spool_compress": {
+            "action": "store_true",
+            "default": False,
+            "help": "gzip the spool files (require --spool_dir)"
+        },
+        "--spool_keep_passed": {
+            "action": "store_true",
+            "default": False,
+            "help": "keep the spool files of passed cases, by default only those of failed cases are kept"
+        },
+        "--download_workers": {
+            "action": "store",
+            "type": int,
+            "default": 4,
+            "help": "number of sftp sessions downloading a folder at once"
+        },
+        "--env_workers": {
+            "action": "store",
+            "type": int,
+            "default": 4,
+            "help": "number of independent env actions (test_environment_configs) running at once"
+        },
+        "--prefetch_workers": {
+            "action": "store",
+            "type": int,
+            "default": 2,
+            "help": "number of host env actions of later modules prefetched at once, 0 to disable (disabled by --clean)"
+        },
+        "--schedule": {
+            "action": "store",
+            "type": str,
+            "default": "none",
+            "choices": ["none", "lpt"],
+            "help": "lpt: run the longest test modules first (durations from --history_db or --schedule_reports) "
+                    "to minimise the makespan over the boards, `after` markers are kept"
+        },
+        "--schedule_reports": {
+            "action": "store",
+            "type": str,
+            "default": "reports",
+            "help": "directory of the junit xml of previous runs, durations for --schedule lpt"
+        },
+        "--tasks": {
+            "action": "store",
+            "type": str,
+            "default": None,
+            "help": "run several marker groups in one session, e.g. auto_test=2h,vc_ut=4h,isp: "
+                    "a group runs the cases with the marker, within its time budget (s/m/h, none if omitted), "
+                    "with its own html/junit report in --task_reports"
+        },
+        "--task_reports": {
+            "action": "store",
+            "type": str,
+            "default": "reports",
+            "help": "directory of the html/junit report of each group of --tasks"
+        },
+        "--no_env_stamp": {
+            "action": "store_true",
+            "default": False,
+            "help": "ignore the env stamps in host_ws and run every env action again"
+        },
+        "--no_board_batch": {
+            "action": "store_true",
+            "default": False,
+            "help": "run consecutive board env actions one by one instead of as one script"
+        },
+        "--cache_dir": {
+            "action": "store",
+            "type": str,
+            "default": None,
+            "help": "persistent artifact cache shared by builds, downloads hit it by url+size+mtime"
+        },
+        "--cache_quota": {
+            "action": "store",
+            "type": float,
+            "default": 50,
+            "help": "disk quota (GB) of the artifact cache, least recently used artifacts are evicted"
+        },
+        "--history_db": {
+            "action": "store",
+            "type": str,
+            "default": None,
+            "help": "SQLite file recording the runtime of each case (per board and SDK version), kept across builds"
+        },
+        "--timeout_margin": {
+            "action": "store",
+            "type": float,
+            "default": 0,
+            "help": "case timeout = p99 of the recent passed runs x margin, capped by the YAML runtime "
+                    "(require --history_db), 0 to keep the YAML runtime"
         }
     },
     "SDK Parameters": {
@@ -20,14 +20,14 @@ isp_cmds_file = os.path.join(
 
 @pytest.mark.isp
 @pytest.mark.parametrize('prepare_ws', [{'env_file': isp_cmds_file}], indirect=True)
-@pytest.mark.parametrize(('cmd', 'check_res', 'runtime'), read_cases(isp_cmds_file, "isp"))
-def test_isp(cmd, check_res, runtime, setup_session, prepare_ws, request):
+@pytest.mark.parametrize(('cmd', 'check_res', 'runtime', 'fail_res'), read_cases(isp_cmds_file, "isp"))
+def test_isp(cmd, check_res, runtime, fail_res, setup_session, prepare_ws, request):
     print_function()
     device = setup_session
     if request.config.getoption("--ip"):
         host = request.config.getoption("--ip")
     else:
-        host = get_ip(device)
+        host = get_ip(device.client)
 
     # run isp-tool-daemon in device
     log, ret_code, ret = run_cmd(client=device,
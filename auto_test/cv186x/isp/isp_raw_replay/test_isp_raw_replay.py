@@ -21,14 +21,15 @@ isp_raw_replay_cmds_file = os.path.join(
 
 @pytest.mark.isp_raw_replay
 @pytest.mark.parametrize('prepare_ws', [{'env_file': isp_raw_replay_cmds_file}], indirect=True)
-@pytest.mark.parametrize(('cmd', 'check_res', 'runtime'), read_cases(isp_raw_replay_cmds_file, "isp_raw_replay"))
-def test_isp_raw_replay(cmd, check_res, runtime, setup_session, prepare_ws, request):
+@pytest.mark.parametrize(('cmd', 'check_res', 'runtime', 'fail_res'), read_cases(isp_raw_replay_cmds_file, "isp_raw_replay"))
+def test_isp_raw_replay(cmd, check_res, runtime, fail_res, setup_session, prepare_ws, request):
     print_function()
     device = setup_session
     log, ret_code, ret = run_cmd(client=device,
                                  cmd=cmd,
                                  timeout=runtime,
                                  ret_regex=check_res,
+                                 fail_res=fail_res,
                                  echo=True)
 
     host_ws = request.config.getoption("--host_ws").replace("\\", "/")
@@ -18,8 +18,8 @@ mediapipe_cmds_file = os.path.join(
 @pytest.mark.basic_ini
 @pytest.mark.run(order=1)
 @pytest.mark.parametrize('prepare_ws', [{'env_file': mediapipe_cmds_file}], indirect=True)
-@pytest.mark.parametrize(('cmd', 'check_res', 'runtime'), read_cases(mediapipe_cmds_file, "basic_ini"))
-def test_basic_ini(cmd, check_res, runtime, setup_session, prepare_ws, request):
+@pytest.mark.parametrize(('cmd', 'check_res', 'runtime', 'fail_res'), read_cases(mediapipe_cmds_file, "basic_ini"))
+def test_basic_ini(cmd, check_res, runtime, fail_res, setup_session, prepare_ws, request):
     print_function()
     device = setup_session
     params = [cmd, "-1", "null", "null"]
@@ -28,6 +28,7 @@ def test_basic_ini(cmd, check_res, runtime, setup_session, prepare_ws, request):
                                  cmd=str(cmd),
                                  timeout=runtime,
                                  ret_regex=check_res,
+                                 fail_res=fail_res,
                                  echo=True)
     assert log, 'Device happens some errors, please check.'
     assert ret_code == 0, 'Test case execute timeout'
@@ -22,8 +22,8 @@ pytstmark = [
 @pytest.mark.sample_audio
 @pytest.mark.run(order=1)
 @pytest.mark.parametrize('prepare_ws', [{'env_file': sample_cmds_file}], indirect=True)
-@pytest.mark.parametrize(('cmd', 'check_res', 'runtime'), read_cases(sample_cmds_file, "sample_audio"))
-def test_sample_audio(cmd, check_res, runtime, setup_session, prepare_ws, request):
+@pytest.mark.parametrize(('cmd', 'check_res', 'runtime', 'fail_res'), read_cases(sample_cmds_file, "sample_audio"))
+def test_sample_audio(cmd, check_res, runtime, fail_res, setup_session, prepare_ws, request):
     print_function()
     device = setup_session
     # ./auto_test.sh sample_audio -1 SCREEN_TYPE BOARD
@@ -33,6 +33,7 @@ def test_sample_audio(cmd, check_res, runtime, setup_session, prepare_ws, reques
                                  cmd=str(cmd),
                                  timeout=runtime,
                                  ret_regex=check_res,
+                                 fail_res=fail_res,
                                  echo=True)
     assert log, 'Device happens some errors, please check.'
     if not ret:     # test fail, print dmesg
@@ -45,14 +46,15 @@ def test_sample_audio(cmd, check_res, runtime, setup_session, prepare_ws, reques
 @pytest.mark.sample_gdc
 @pytest.mark.run(order=3)
 @pytest.mark.parametrize('prepare_ws', [{'env_file': sample_cmds_file}], indirect=True)
-@pytest.mark.parametrize(('cmd', 'check_res', 'runtime'), read_cases(sample_cmds_file, "sample_gdc"))
-def test_sample_gdc(cmd, check_res, runtime, setup_session, prepare_ws, request):
+@pytest.mark.parametrize(('cmd', 'check_res', 'runtime', 'fail_res'), read_cases(sample_cmds_file, "sample_gdc"))
+def test_sample_gdc(cmd, check_res, runtime, fail_res, setup_session, prepare_ws, request):
     print_function()
     device = setup_session
     log, ret_code, ret = run_cmd(client=device,
                                  cmd=cmd,
                                  timeout=runtime,
                                  ret_regex=check_res,
+                                 fail_res=fail_res,
                                  echo=True)
     assert log, 'Device happens some errors, please check.'
     if not ret:     # test fail, print dmesg
@@ -65,8 +67,8 @@ def test_sample_gdc(cmd, check_res, runtime, setup_session, prepare_ws, request)
 @pytest.mark.sample_panel
 @pytest.mark.run(order=4)
 @pytest.mark.parametrize('prepare_ws', [{'env_file': sample_cmds_file}], indirect=True)
-@pytest.mark.parametrize(('cmd', 'check_res', 'runtime'), read_cases(sample_cmds_file, "sample_panel"))
-def test_sample_panel(cmd, check_res, runtime, setup_session, prepare_ws, request):
+@pytest.mark.parametrize(('cmd', 'check_res', 'runtime', 'fail_res'), read_cases(sample_cmds_file, "sample_panel"))
+def test_sample_panel(cmd, check_res, runtime, fail_res, setup_session, prepare_ws, request):
     print_function()
     device = setup_session
     # ./auto_test.sh sample_panel -1 SCREEN_TYPE BOARD
@@ -76,6 +78,7 @@ def test_sample_panel(cmd, check_res, runtime, setup_session, prepare_ws, reques
                                  cmd=str(cmd),
                                  timeout=runtime,
                                  ret_regex=check_res,
+                                 fail_res=fail_res,
                                  echo=True)
     assert log, 'Device happens some errors, please check.'
     if not ret:     # test fail, print dmesg
@@ -88,8 +91,8 @@ def test_sample_panel(cmd, check_res, runtime, setup_session, prepare_ws, reques
 @pytest.mark.sample_sensor
 @pytest.mark.run(order=6)
 @pytest.mark.parametrize('prepare_ws', [{'env_file': sample_cmds_file}], indirect=True)
-@pytest.mark.parametrize(('cmd', 'check_res', 'runtime'), read_cases(sample_cmds_file, "sensor_test"))
-def test_sample_sensor(cmd, check_res, runtime, setup_session, prepare_ws, request):
+@pytest.mark.parametrize(('cmd', 'check_res', 'runtime', 'fail_res'), read_cases(sample_cmds_file, "sensor_test"))
+def test_sample_sensor(cmd, check_res, runtime, fail_res, setup_session, prepare_ws, request):
     print_function()
     device = setup_session
     # ./auto_test.sh sample_sensor SENROR_NUM null BOARD
@@ -99,6 +102,7 @@ def test_sample_sensor(cmd, check_res, runtime, setup_session, prepare_ws, reque
                                  cmd=str(cmd),
                                  timeout=runtime,
                                  ret_regex=check_res,
+                                 fail_res=fail_res,
                                  echo=True)
     assert log, 'Device happens some errors, please check.'
     if not ret:     # test fail, print dmesg
@@ -111,14 +115,15 @@ def test_sample_sensor(cmd, check_res, runtime, setup_session, prepare_ws, reque
 @pytest.mark.sample_tde
 @pytest.mark.run(order=7)
 @pytest.mark.parametrize('prepare_ws', [{'env_file': sample_cmds_file}], indirect=True)
-@pytest.mark.parametrize(('cmd', 'check_res', 'runtime'), read_cases(sample_cmds_file, "sample_tde"))
-def test_sample_tde(cmd, check_res, runtime, setup_session, prepare_ws, request):
+@pytest.mark.parametrize(('cmd', 'check_res', 'runtime', 'fail_res'), read_cases(sample_cmds_file, "sample_tde"))
+def test_sample_tde(cmd, check_res, runtime, fail_res, setup_session, prepare_ws, request):
     print_function()
     device = setup_session
     log, ret_code, ret = run_cmd(client=device,
                                  cmd=cmd,
                                  timeout=runtime,
                                  ret_regex=check_res,
+                                 fail_res=fail_res,
                                  echo=True)
     assert log, 'Device happens some errors, please check.'
     if not ret:     # test fail, print dmesg
@@ -131,14 +136,15 @@ def test_sample_tde(cmd, check_res, runtime, setup_session, prepare_ws, request)
 @pytest.mark.sample_vpss
 @pytest.mark.run(order=8)
 @pytest.mark.parametrize('prepare_ws', [{'env_file': sample_cmds_file}], indirect=True)
-@pytest.mark.parametrize(('cmd', 'check_res', 'runtime'), read_cases(sample_cmds_file, "sample_vpss"))
-def test_sample_vpss(cmd, check_res, runtime, setup_session, prepare_ws, request):
+@pytest.mark.parametrize(('cmd', 'check_res', 'runtime', 'fail_res'), read_cases(sample_cmds_file, "sample_vpss"))
+def test_sample_vpss(cmd, check_res, runtime, fail_res, setup_session, prepare_ws, request):
     print_function()
     device = setup_session
     log, ret_code, ret = run_cmd(client=device,
                                  cmd=cmd,
                                  timeout=runtime,
                                  ret_regex=check_res,
+                                 fail_res=fail_res,
                                  echo=True)
     assert log, 'Device happens some errors, please check.'
     if not ret:     # test fail, print dmesg
@@ -151,8 +157,8 @@ def test_sample_vpss(cmd, check_res, runtime, setup_session, prepare_ws, request
 @pytest.mark.sample_vio
 @pytest.mark.run(order=9)
 @pytest.mark.parametrize('prepare_ws', [{'env_file': sample_cmds_file}], indirect=True)
-@pytest.mark.parametrize(('cmd', 'check_res', 'runtime'), read_cases(sample_cmds_file, "sample_vio"))
-def test_sample_vio(cmd, check_res, runtime, setup_session, prepare_ws, request):
+@pytest.mark.parametrize(('cmd', 'check_res', 'runtime', 'fail_res'), read_cases(sample_cmds_file, "sample_vio"))
+def test_sample_vio(cmd, check_res, runtime, fail_res, setup_session, prepare_ws, request):
     print_function()
     device = setup_session
     # ./auto_test.sh sample_vio SENROR_NUM SCREEN_TYPE BOARD
@@ -162,6 +168,7 @@ def test_sample_vio(cmd, check_res, runtime, setup_session, prepare_ws, request)
                                  cmd=str(cmd),
                                  timeout=runtime,
                                  ret_regex=check_res,
+                                 fail_res=fail_res,
                                  echo=True)
     assert log, 'Device happens some errors, please check.'
     if not ret:     # test fail, print dmesg
@@ -174,8 +181,8 @@ def test_sample_vio(cmd, check_res, runtime, setup_session, prepare_ws, request)
 @pytest.mark.sample_region
 @pytest.mark.run(order=10)
 @pytest.mark.parametrize('prepare_ws', [{'env_file': sample_cmds_file}], indirect=True)
-@pytest.mark.parametrize(('cmd', 'check_res', 'runtime'), read_cases(sample_cmds_file, "sample_region"))
-def test_sample_region(cmd, check_res, runtime, setup_session, prepare_ws, request):
+@pytest.mark.parametrize(('cmd', 'check_res', 'runtime', 'fail_res'), read_cases(sample_cmds_file, "sample_region"))
+def test_sample_region(cmd, check_res, runtime, fail_res, setup_session, prepare_ws, request):
     print_function()
     device = setup_session
     # ./auto_test.sh sample_region -1 SCREEN_TYPE BOARD
@@ -185,6 +192,7 @@ def test_sample_region(cmd, check_res, runtime, setup_session, prepare_ws, reque
                                  cmd=str(cmd),
                                  timeout=runtime,
                                  ret_regex=check_res,
+                                 fail_res=fail_res,
                                  echo=True)
     assert log, 'Device happens some errors, please check.'
     if not ret:     # test fail, print dmesg
@@ -22,14 +22,15 @@ pytstmark = [
 @pytest.mark.dec
 @pytest.mark.run(order=1)
 @pytest.mark.parametrize('prepare_ws', [{'env_file': vc_ut_cmds_file}], indirect=True)
-@pytest.mark.parametrize(('cmd', 'check_res', 'runtime'), read_cases(vc_ut_cmds_file, "dec"))
-def test_dec(cmd, check_res, runtime, setup_session, prepare_ws, request):
+@pytest.mark.parametrize(('cmd', 'check_res', 'runtime', 'fail_res'), read_cases(vc_ut_cmds_file, "dec"))
+def test_dec(cmd, check_res, runtime, fail_res, setup_session, prepare_ws, request):
     print_function()
     device = setup_session
     log, ret_code, ret = run_cmd(client=device,
                                  cmd=cmd,
                                  timeout=runtime,
                                  ret_regex=check_res,
+                                 fail_res=fail_res,
                                  echo=True)
     assert log, 'Device happens some errors, please check.'
     assert ret_code == 0, 'Test case execute timeout'
@@ -42,14 +43,15 @@ def test_dec(cmd, check_res, runtime, setup_session, prepare_ws, request):
 @pytest.mark.enc
 @pytest.mark.run(order=1)
 @pytest.mark.parametrize('prepare_ws', [{'env_file': vc_ut_cmds_file}], indirect=True)
-@pytest.mark.parametrize(('cmd', 'check_res', 'runtime'), read_cases(vc_ut_cmds_file, "enc"))
-def test_enc(cmd, check_res, runtime, setup_session, prepare_ws, request):
+@pytest.mark.parametrize(('cmd', 'check_res', 'runtime', 'fail_res'), read_cases(vc_ut_cmds_file, "enc"))
+def test_enc(cmd, check_res, runtime, fail_res, setup_session, prepare_ws, request):
     print_function()
     device = setup_session
     log, ret_code, ret = run_cmd(client=device,
                                  cmd=cmd,
                                  timeout=runtime,
                                  ret_regex=check_res,
+                                 fail_res=fail_res,
                                  echo=True)
     assert log, 'Device happens some errors, please check.'
     assert ret_code == 0, 'Test case execute timeout'
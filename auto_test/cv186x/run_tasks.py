@@ -0,0 +1,45 @@
+'''
+# Date:     2026/10/18
+# File:     run_tasks.py
+# Project:  LTPU
+# Function: Run the test tasks selected by TEST_TASK in one pytest session
+# Commad example:
+#   python run_tasks.py --test_task="auto_test,vc_ut" --serial_port=xx --board=xx ...
+'''
+
+# coding=utf-8
+
+import sys
+import argparse
+import pytest
+
+# 任务: (marker, 时间预算), 顺序即执行顺序
+TASKS = [
+    ("auto_test", "2h"),
+    ("audio_ut", "1h"),
+    ("vc_ut", "4h"),
+    ("isp", "1h"),
+    ("tdl_sdk", "1h"),
+]
+
+
+def select_tasks(test_task: str) -> list:
+    """default/all: 全部任务; 否则选择名字出现在TEST_TASK中的任务"""
+    if test_task in ("default", "all"):
+        return TASKS
+    return [(name, budget) for name, budget in TASKS if name in test_task]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run test tasks, the other args are passed to pytest')
+    parser.add_argument(
+        "--test_task", action="store", type=str, default="default",
+        help="TEST_TASK of the build: default/all, or the task names, e.g. auto_test,vc_ut"
+    )
+    args, pytest_args = parser.parse_known_args()
+
+    tasks = select_tasks(args.test_task)
+    if not tasks:
+        print(f"No task selected by TEST_TASK={args.test_task}")
+        sys.exit(0)
+    sys.exit(pytest.main(["--tasks", ",".join(f"{name}={budget}" for name, budget in tasks)] + pytest_args))
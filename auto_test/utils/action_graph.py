@@ -0,0 +1,239 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List, Set, Tuple
+
+
+BOARD_ACTIONS = ("board_link", "board_move", "board_copy", "board_nfs", "board_batch")
+
+
+def _norm(path: str) -> str:
+    """Normalise a path for overlap checks"""
+    return os.path.normpath(str(path).replace("\\", "/")).replace("\\", "/")
+
+
+def _fixed_prefix(source) -> str:
+    """Path of a source, for regex sources ('<...>' segments) the fixed part before the first regex"""
+    if isinstance(source, dict):
+        parts = source.get('parts', [])
+        # parts[0] is the text before the first regex, its directory is the fixed part
+        return os.path.dirname((parts[0] if parts else "") + "x")
+    path = str(source)
+    for mark in ('<', '*', '?', '['):
+        if mark in path:
+            path = os.path.dirname(path[:path.index(mark)] + "x")
+    return path
+
+
+def _basename(source) -> str:
+    """basename of a source, '' if unknown (regex or wildcard)"""
+    if isinstance(source, dict):
+        parts = source.get('parts', [])
+        last = parts[-1] if parts else ""
+        return "" if last.startswith('<') else os.path.basename(last.rstrip("/"))
+    path = str(source)
+    if any(mark in path for mark in ('<', '*', '?', '[')):
+        return ""
+    if "://" in path:
+        path = path.split("://", 1)[1]
+    return os.path.basename(path.rstrip("/"))
+
+
+def _into(source, target: str, file_only: bool = False) -> str:
+    """
+    Path written when source is put into target:
+    target/basename if target is a directory ('/' at the end) and basename is known, target otherwise
+
+    :param bool file_only: only use target/basename if basename looks like a file (has a dot),
+        e.g. a download of a folder writes its whole content into target
+    """
+    name = _basename(source)
+    if target.endswith("/") and name and (not file_only or "." in name):
+        return os.path.join(target, name)
+    return target
+
+
+def action_paths(env_op: dict, path_map: Dict[str, str] = None) -> Tuple[Set[str], Set[str]]:
+    """
+    Infer the paths an env action reads and writes
+
+    :param dict env_op: one item of test_environment_configs (after replace_params/extract_regex_segments)
+    :param Dict[str, str] path_map: board path prefix -> host path, e.g. {test_path: host_ws} for the nfs mount,
+        board paths outside of it are put into the "board:" namespace
+
+    :return Tuple[Set[str], Set[str]]: (reads, writes)
+    """
+    action = env_op['action']
+    source = env_op.get('source_info', env_op.get('source'))
+    target = str(env_op.get('target') or "")
+
+    def board(path: str) -> str:
+        path = _norm(path)
+        for prefix, host in (path_map or {}).items():
+            prefix = _norm(prefix)
+            if path == prefix or path.startswith(prefix + "/"):
+                return _norm(host + path[len(prefix):])
+        return "board:" + path
+
+    if action == "download":
+        extract = env_op.get('extract')
+        if extract:
+            # download-and-extract writes the whole extraction directory
+            return set(), {_norm(target if extract is True else str(extract))}
+        return set(), {_norm(_into(source, target, file_only=True))}
+    if action == "extract":
+        return {_norm(_fixed_prefix(source))}, {_norm(target)}
+    if action in ("move", "rename"):
+        dst = _into(source, target) if action == "move" else target
+        return set(), {_norm(_fixed_prefix(source)), _norm(dst)}
+    if action == "copy":
+        return {_norm(_fixed_prefix(source))}, {_norm(_into(source, target))}
+    if action == "delete":
+        return set(), {_norm(_fixed_prefix(source))}
+    if action == "board_copy":
+        return {board(_fixed_prefix(source))}, {board(_into(source, target))}
+    if action in ("board_link", "board_move"):
+        reads = {board(_fixed_prefix(source))}
+        writes = {board(_into(source, target))}
+        return (set(), reads | writes) if action == "board_move" else (reads, writes)
+    # board_nfs and unknown actions: depend on everything (see build_graph)
+    return {"/"}, {"/"}
+
+
+def _overlap(a: Set[str], b: Set[str]) -> bool:
+    for x in a:
+        for y in b:
+            if x == y or x.startswith(y.rstrip("/") + "/") or y.startswith(x.rstrip("/") + "/") or "/" in (x, y):
+                return True
+    return False
+
+
+def build_graph(env_config: List[dict],
+                path_map: Dict[str, str] = None,
+                paths: List[Tuple[Set[str], Set[str]]] = None) -> List[Set[int]]:
+    """
+    Turn the action list into a DAG
+
+    An action depends on an earlier one if one writes a path the other reads or writes (paths overlap
+    when one contains the other). Board actions are also chained in order because they share the device,
+    board_nfs is a barrier. Explicit dependencies are given with the optional `id` / `depends_on` keys.
+
+    :param List[Tuple[Set[str], Set[str]]] paths: (reads, writes) of each action if known better, action_paths() by default
+
+    :return List[Set[int]]: indexes of the actions each action depends on
+    """
+    paths = paths or [action_paths(op, path_map) for op in env_config]
+    ids = {op['id']: i for i, op in enumerate(env_config) if op.get('id')}
+    deps = []
+    last_board = None
+    for i, op in enumerate(env_config):
+        reads, writes = paths[i]
+        dep = set()
+        for j in range(i):
+            r, w = paths[j]
+            if _overlap(writes, r | w) or _overlap(reads, w):
+                dep.add(j)
+        if op['action'] in BOARD_ACTIONS:
+            if last_board is not None:
+                dep.add(last_board)
+            last_board = i
+        depends_on = op.get('depends_on') or []
+        for name in [depends_on] if isinstance(depends_on, str) else depends_on:
+            assert name in ids and ids[name] < i, f'Action "{op.get("desc")}": unknown depends_on "{name}"'
+            dep.add(ids[name])
+        deps.append(dep)
+    return deps
+
+
+def batch_board_actions(env_config: List[dict], deps: List[Set[int]]) -> Tuple[List[dict], List[Set[int]]]:
+    """
+    Merge each run of consecutive board actions into one "board_batch" action (run as one script on the board)
+
+    The merged action depends on what its steps depend on, and the actions depending on any step
+    depend on it. The steps are consecutive, so the graph stays acyclic.
+
+    :return Tuple[List[dict], List[Set[int]]]: (actions, deps) of the merged graph,
+        a board_batch action is {"action": "board_batch", "desc", "steps": [board actions]}
+    """
+    groups = []     # lists of original indexes
+    for i, op in enumerate(env_config):
+        if op['action'] in BOARD_ACTIONS and groups and env_config[groups[-1][-1]]['action'] in BOARD_ACTIONS \
+                and groups[-1][-1] == i - 1:
+            groups[-1].append(i)
+        else:
+            groups.append([i])
+    node_of = {i: n for n, group in enumerate(groups) for i in group}
+
+    actions, new_deps = [], []
+    for n, group in enumerate(groups):
+        if len(group) == 1:
+            actions.append(env_config[group[0]])
+        else:
+            steps = [env_config[i] for i in group]
+            actions.append({"action": "board_batch",
+                            "desc": " | ".join(str(op.get('desc')) for op in steps),
+                            "steps": steps})
+        new_deps.append({node_of[j] for i in group for j in deps[i]} - {n})
+    return actions, new_deps
+
+
+def run_graph(env_config: List[dict],
+              run_action: Callable[[dict], None],
+              deps: List[Set[int]],
+              workers: int = 4) -> List[dict]:
+    """
+    Run the actions as soon as their dependencies are done, at most `workers` at once
+
+    Board actions are run one at a time (they are chained in the graph and hold the device lock).
+    After a failure no new action is started, the running ones are waited for and the first error is raised.
+
+    :param List[dict] env_config: the actions
+    :param Callable[[dict], None] run_action: runs one action, raises (AssertionError) on failure
+    :param List[Set[int]] deps: see build_graph()
+    :param int workers: size of the thread pool
+
+    :return List[dict]: timing of each action {"desc", "action", "start", "seconds"} in declared order
+    """
+    device_lock = threading.Lock()
+    timings = [None] * len(env_config)
+    done, running = set(), {}
+    error = None
+    origin = time.time()
+
+    def task(i: int):
+        op = env_config[i]
+        start = time.time()
+        try:
+            if op['action'] in BOARD_ACTIONS:
+                with device_lock:
+                    run_action(op)
+            else:
+                run_action(op)
+        finally:
+            timings[i] = {"desc": op.get('desc'), "action": op['action'],
+                          "start": round(start - origin, 2), "seconds": round(time.time() - start, 2)}
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        while True:
+            if error is None:
+                for i in range(len(env_config)):
+                    if i not in done and i not in running.values() and deps[i] <= done:
+                        running[executor.submit(task, i)] = i
+            if not running:
+                break
+            finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in finished:
+                i = running.pop(future)
+                if future.exception() is not None:
+                    error = error or future.exception()
+                else:
+                    done.add(i)
+
+    report = "\n".join(f' - [{t["start"]:>8.2f}s +{t["seconds"]:>8.2f}s] {t["action"]}: {t["desc"]}'
+                       for t in timings if t)
+    logging.info(f"Env actions timing ({time.time() - origin:.2f}s in total):\n{report}")
+    if error is not None:
+        raise error
+    return timings
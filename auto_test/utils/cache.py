@@ -0,0 +1,272 @@
+import os
+import json
+import stat
+import hashlib
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from utils.fastcopy import copy_file
+
+
+def file_digest(path: str) -> str:
+    """sha256 of the file"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ArtifactCache:
+    """
+    Persistent content-addressed cache of downloaded artifacts.
+
+    Remote files are keyed by url + size + mtime (known from the listing, no extra round trip) and mapped
+    to the sha256 of their content, which is stored once under objects/ (read only). A hit is materialised
+    into host_ws by reflink or copy, so only new artifacts cross the network. Never by hardlink: host_ws
+    is exported to the boards, a case writing a file in place would corrupt the cached object.
+    The objects are evicted least recently used first when the quota is exceeded.
+
+    Several processes (e.g. the pytest-xdist workers of --devices) can share one cache: the index is
+    merged into index.json under a lock file after every store() and by save(), and objects left
+    without index entry (e.g. by a killed run) are adopted at start, so they are counted and evicted.
+
+    Layout:
+        cache_dir/index.json            {"keys": {key: digest}, "objects": {digest: {"size", "mode", "last_used"}}}
+        cache_dir/objects/ab/abcdef...
+    """
+    def __init__(self, cache_dir: str, quota: int = 50 * 1024 ** 3):
+        """
+        :param str cache_dir: directory of the cache, kept across builds
+        :param int quota: maximum size (bytes) of the objects
+        """
+        self.cache_dir = cache_dir
+        self.quota = quota
+        self.stats = {"hits": 0, "misses": 0, "hit_bytes": 0, "miss_bytes": 0, "evicted": 0}
+        self._lock = threading.RLock()
+        self._index_path = os.path.join(cache_dir, "index.json")
+        self._dropped = set()       # digests dropped since the index was read, not merged back
+        os.makedirs(os.path.join(cache_dir, "objects"), exist_ok=True)
+        with self._index_lock():
+            self._index = self._read_index()
+            self._adopt_orphans()
+
+    @contextmanager
+    def _index_lock(self, timeout: float = 60):
+        """Lock index.json between processes (lock file, a lock older than timeout is stale)"""
+        lock_path = self._index_path + ".lock"
+        deadline = time.time() + timeout
+        while True:
+            try:
+                os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(lock_path) > timeout:
+                        logging.warning(f'Artifact cache: remove stale lock \"{lock_path}\"')
+                        os.remove(lock_path)
+                        continue
+                except OSError:
+                    continue
+                if time.time() > deadline:
+                    raise TimeoutError(f'Artifact cache: \"{lock_path}\" is locked')
+                time.sleep(0.05)
+        try:
+            yield
+        finally:
+            try:
+                os.remove(lock_path)
+            except OSError:
+                pass
+
+    def _read_index(self) -> dict:
+        if os.path.exists(self._index_path):
+            try:
+                with open(self._index_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning(f'Artifact cache: index \"{self._index_path}\" is broken, start empty | {e}')
+        return {"keys": {}, "objects": {}}
+
+    def _adopt_orphans(self):
+        """Objects without index entry (written by a run killed before saving) are counted, oldest first evicted"""
+        objects_dir = os.path.join(self.cache_dir, "objects")
+        for sub in os.listdir(objects_dir):
+            for name in os.listdir(os.path.join(objects_dir, sub)) if os.path.isdir(os.path.join(objects_dir, sub)) else []:
+                path = os.path.join(objects_dir, sub, name)
+                if name.endswith(".tmp") or name in self._index["objects"]:
+                    continue
+                st = os.stat(path)
+                self._index["objects"][name] = {"size": st.st_size, "mode": 0o644, "last_used": st.st_mtime}
+
+    @staticmethod
+    def make_key(url: str, size: int, mtime: int) -> str:
+        return f"{url}|{size}|{int(mtime or 0)}"
+
+    def object_path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, "objects", digest[:2], digest)
+
+    def lookup(self, key: str) -> Optional[str]:
+        """
+        Find the cached object of key (counted as hit or miss)
+
+        :param str key: see make_key()
+
+        :return str: path of the object (read only), None if missed
+        """
+        with self._lock:
+            digest = self._index["keys"].get(key)
+            info = self._index["objects"].get(digest) if digest else None
+            path = self.object_path(digest) if info else None
+            if not info or not os.path.isfile(path) or os.path.getsize(path) != info["size"] \
+                    or not self._verify_legacy(path, digest):
+                if digest:
+                    self._drop(digest)
+                self.stats["misses"] += 1
+                return None
+            info["last_used"] = time.time()
+            self.stats["hits"] += 1
+            self.stats["hit_bytes"] += info["size"]
+            return path
+
+    @staticmethod
+    def _verify_legacy(path: str, digest: str) -> bool:
+        """Objects of older versions are writable and may be hardlinked into a workspace: check them once"""
+        if not os.stat(path).st_mode & (stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH):
+            return True
+        if file_digest(path) != digest:
+            logging.warning(f'Artifact cache: \"{path}\" was modified, drop it')
+            return False
+        os.chmod(path, 0o444)
+        return True
+
+    def fetch(self, key: str, dst: str, digest: str = None) -> bool:
+        """
+        Materialise the cached content of key to dst
+
+        :param str key: see make_key()
+        :param str dst: local file to create
+        :param str digest: expected sha256 of the content, a cached object with another one is a miss
+
+        :return bool: False if missed, the caller downloads and store()s it
+        """
+        # hold the lock so the object is not evicted while being materialised
+        with self._lock:
+            path = self.lookup(key)
+            if not path or (digest and os.path.basename(path) != digest.lower()):
+                return False
+            info = self._index["objects"][os.path.basename(path)]
+            copy_file(path, dst, hardlink=False)
+            os.chmod(dst, info["mode"])
+            return True
+
+    def store(self, key: str, src: str, mode: int = None, digest: str = None) -> str:
+        """
+        Store the downloaded file under key
+
+        :param str key: see make_key()
+        :param str src: the downloaded local file
+        :param int mode: file mode to restore when materialised, mode of src by default
+        :param str digest: sha256 of the content if already known
+
+        :return str: sha256 of the content
+        """
+        digest = digest or file_digest(src)
+        size = os.path.getsize(src)
+        path = self.object_path(digest)
+        with self._lock:
+            self.stats["miss_bytes"] += size
+            if not os.path.isfile(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f"{path}.{threading.get_ident()}.tmp"
+                # src stays in host_ws, it must not share the inode with the object
+                copy_file(src, tmp, hardlink=False)
+                os.chmod(tmp, 0o444)
+                os.replace(tmp, path)
+            self._index["keys"][key] = digest
+            self._index["objects"][digest] = {"size": size,
+                                              "mode": mode if mode is not None else os.stat(src).st_mode,
+                                              "last_used": time.time()}
+            self._dropped.discard(digest)
+            # saved right away: other processes see it, and it is not lost if the run is killed
+            self.save()
+        return digest
+
+    def _drop(self, digest: str):
+        self._dropped.add(digest)
+        self._index["objects"].pop(digest, None)
+        for key in [k for k, v in self._index["keys"].items() if v == digest]:
+            del self._index["keys"][key]
+        path = self.object_path(digest)
+        if os.path.exists(path):
+            os.chmod(path, 0o644)   # read only files can't be removed on Windows
+            os.remove(path)
+
+    def _evict(self):
+        """Evict the least recently used objects until the total size is in the quota"""
+        objects = self._index["objects"]
+        total = sum(info["size"] for info in objects.values())
+        for digest in sorted(objects, key=lambda d: objects[d]["last_used"]):
+            if total <= self.quota:
+                break
+            total -= objects[digest]["size"]
+            self._drop(digest)
+            self.stats["evicted"] += 1
+
+    def _merge(self, disk: dict):
+        """Merge the index written by the other processes into this one"""
+        objects = self._index["objects"]
+        for digest, info in disk.get("objects", {}).items():
+            if digest in self._dropped:
+                continue
+            if digest in objects:
+                objects[digest]["last_used"] = max(objects[digest]["last_used"], info["last_used"])
+            elif os.path.isfile(self.object_path(digest)):
+                objects[digest] = info
+        for key, digest in disk.get("keys", {}).items():
+            if key not in self._index["keys"] and digest in objects:
+                self._index["keys"][key] = digest
+        # dropped by another process since
+        for digest in [d for d in objects if not os.path.isfile(self.object_path(d))]:
+            objects.pop(digest)
+        self._index["keys"] = {k: d for k, d in self._index["keys"].items() if d in objects}
+
+    def save(self):
+        """Merge the index with the one on disk, evict over quota and write it atomically"""
+        with self._lock, self._index_lock():
+            self._merge(self._read_index())
+            self._evict()
+            self._dropped.clear()
+            tmp = f"{self._index_path}.{os.getpid()}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self._index, f)
+            os.replace(tmp, self._index_path)
+
+    def summary(self) -> str:
+        s = self.stats
+        total = s["hits"] + s["misses"]
+        rate = s["hits"] / total * 100 if total else 0
+        return (f'Artifact cache: {s["hits"]} hits / {s["misses"]} misses ({rate:.1f}%), '
+                f'{s["hit_bytes"]} bytes served from cache, {s["miss_bytes"]} bytes downloaded, '
+                f'{s["evicted"]} objects evicted')
+
+
+_CACHE = {"instance": None}
+
+
+def configure_cache(cache_dir: Optional[str], quota_gb: float = 50):
+    """
+    Enable the artifact cache for the session
+
+    :param str cache_dir: directory of the cache, None to disable
+    :param float quota_gb: disk quota of the cache (GB)
+    """
+    _CACHE["instance"] = ArtifactCache(cache_dir, int(quota_gb * 1024 ** 3)) if cache_dir else None
+
+
+def get_cache() -> Optional[ArtifactCache]:
+    """The artifact cache of the session, None if disabled"""
+    return _CACHE["instance"]
@@ -0,0 +1,193 @@
+import os
+import re
+import gzip
+import time
+from typing import List, Union, Optional
+
+from utils.expect import StreamDecoder
+
+
+# Spool capture for long cases, configured once per session (see conftest.py)
+CAPTURE_CONFIG = {
+    "spool_dir": None,      # None: capture in memory as before
+    "compress": False,      # gzip the spool files
+    "keep_passed": False,   # keep the spool files of passed cases
+    "case": None,           # name of the running case, used as the spool file name
+    "files": [],            # spool files of the running case
+}
+
+
+def configure_capture(spool_dir: Optional[str], compress: bool = False, keep_passed: bool = False):
+    """
+    Enable disk-spooled console capture
+
+    :param str spool_dir: directory of the spool files, None to disable
+    :param bool compress: whether gzip the spool files
+    :param bool keep_passed: keep the spool files of passed cases, only the failed ones are kept by default
+    """
+    CAPTURE_CONFIG["spool_dir"] = spool_dir
+    CAPTURE_CONFIG["compress"] = compress
+    CAPTURE_CONFIG["keep_passed"] = keep_passed
+    if spool_dir:
+        os.makedirs(spool_dir, exist_ok=True)
+
+
+def set_capture_case(name: Optional[str]):
+    """Set the name of the running case"""
+    CAPTURE_CONFIG["case"] = name
+    CAPTURE_CONFIG["files"] = []
+
+
+def release_spools(passed: bool):
+    """
+    End of the running case: remove its spool files if it passed (unless keep_passed)
+
+    :param bool passed: the case passed
+    """
+    files, CAPTURE_CONFIG["files"] = CAPTURE_CONFIG["files"], []
+    if not passed or CAPTURE_CONFIG["keep_passed"]:
+        return
+    for path in files:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def open_spool() -> Optional["SpoolWriter"]:
+    """
+    Open a spool file for the running case
+
+    :return SpoolWriter: None if spool capture is disabled
+    """
+    spool_dir = CAPTURE_CONFIG["spool_dir"]
+    if not spool_dir:
+        return None
+    name = re.sub(r'[^\w.-]+', '_', CAPTURE_CONFIG["case"] or "cmd")
+    path = os.path.join(spool_dir, f"{name}_{time.strftime('%Y%m%d%H%M%S')}.log")
+    if CAPTURE_CONFIG["compress"]:
+        path += ".gz"
+    CAPTURE_CONFIG["files"].append(path)
+    return SpoolWriter(path, compress=CAPTURE_CONFIG["compress"])
+
+
+def findall(ret_regex: Union[str, re.Pattern], log: Union[str, "SpooledLog"]) -> list:
+    """re.findall() for both in-memory logs and spooled logs"""
+    if isinstance(log, SpooledLog):
+        return log.findall(ret_regex)
+    if isinstance(ret_regex, str):
+        return re.findall(ret_regex, log)
+    return ret_regex.findall(log)
+
+
+class SpoolWriter:
+    """Write raw console bytes to a spool file as they arrive"""
+    def __init__(self, path: str, compress: bool = False):
+        self.path = path
+        self.compress = compress
+        self.size = 0
+        self._file = gzip.open(path, 'wb', compresslevel=1) if compress else open(path, 'wb')
+
+    def write(self, data: bytes):
+        self._file.write(data)
+        self.size += len(data)
+
+    def close(self, tail: str = "") -> "SpooledLog":
+        """
+        Close the spool file
+
+        :param str tail: the decoded tail kept in memory
+
+        :return SpooledLog: lazy handle of the spooled log
+        """
+        self._file.close()
+        return SpooledLog(self.path, self.size, tail=tail, compressed=self.compress)
+
+
+class SpooledLog:
+    """
+    Lazy handle of a console log spooled to disk.
+
+    Only the tail is kept in memory, regex extraction reads the file back in chunks, decoded and
+    cleaned like the in-memory logs (see StreamDecoder, strip). str(log) loads the whole decoded log.
+    """
+    read_size = 1 << 20     # chunk size of the streaming read
+    overlap = 1 << 16       # a match must fit in the overlap between chunks
+
+    def __init__(self, path: str, size: int, tail: str = "", compressed: bool = False, strip: re.Pattern = None):
+        """
+        :param re.Pattern strip: text removed from the log when it is read back (e.g. the markers of the transport)
+        """
+        self.path = path
+        self.size = size
+        self.tail = strip.sub('', tail) if strip else tail
+        self.compressed = compressed
+        self.strip = strip
+
+    def __bool__(self):
+        return self.size > 0
+
+    def __len__(self):
+        return self.size
+
+    def __str__(self):
+        return self.text()
+
+    def __repr__(self):
+        return f"SpooledLog({self.path!r}, size={self.size})"
+
+    def __contains__(self, item: str) -> bool:
+        return bool(self.findall(re.escape(item)))
+
+    def text(self) -> str:
+        """Load and decode the whole log"""
+        opener = gzip.open if self.compressed else open
+        with opener(self.path, 'rb') as f:
+            data = f.read()
+        text = StreamDecoder().decode(data, final=True)
+        return self.strip.sub('', text) if self.strip else text
+
+    def findall(self, ret_regex: Union[str, re.Pattern]) -> List:
+        """
+        re.findall() on the spooled log, same text as text() without loading it
+
+        :param Union[str, re.Pattern] ret_regex: Regular expressions used to extract the output
+
+        :return list: like re.findall() (tuples if the regex has several groups)
+        """
+        pattern = re.compile(ret_regex) if isinstance(ret_regex, str) else ret_regex
+        ret = []
+        for match in self._finditer(pattern):
+            groups = match.groups()
+            if not groups:
+                ret.append(match.group(0))
+            elif len(groups) == 1:
+                ret.append(groups[0] or '')
+            else:
+                ret.append(tuple(g or '' for g in groups))
+        return ret
+
+    def _finditer(self, pattern: re.Pattern):
+        if not self.size:
+            return
+        # scan decoded chunks, keep an overlap so matches (and strip markers) across chunks are found
+        decoder = StreamDecoder()
+        opener = gzip.open if self.compressed else open
+        with opener(self.path, 'rb') as f:
+            window = ''
+            while True:
+                chunk = f.read(self.read_size)
+                window += decoder.decode(chunk, final=not chunk)
+                if self.strip:
+                    window = self.strip.sub('', window)
+                cut = max(0, len(window) - self.overlap)
+                for match in pattern.finditer(window):
+                    # matches ending in the overlap are searched again in the next window,
+                    # the yielded ones end before the cut
+                    if chunk and match.end() > len(window) - self.overlap:
+                        cut = min(cut, match.start())
+                        break
+                    yield match
+                if not chunk:
+                    return
+                window = window[cut:]
@@ -1,5 +1,6 @@
 import re
-from typing import Union, Tuple
+import time
+from typing import Union, Tuple, List, Optional
 import paramiko
 import serial
 from yaml import load as yaml_load
@@ -9,53 +10,114 @@ except ImportError:
     from yaml import Loader
 
 from utils.serial_utils import ser_run_cmd
-from utils.ssh_utils import ssh_run_cmd
+from utils.ssh_utils import ssh_run_cmd, SSHExecutor
 from utils.host_utils import host_run_cmd
+from utils.session import DeviceSession
+from utils.capture import open_spool
+from utils.history import case_timeout, note_case_run
+from utils.tasks import budget_timeout
 
 
-def run_cmd(client: Union[paramiko.SSHClient, serial.Serial] = None,
+def run_cmd(client: Union[DeviceSession, SSHExecutor, paramiko.Channel, serial.Serial] = None,
             cmd: str = "",
             timeout: int = 5,
             ret_regex: Union[str, re.Pattern] = None,
-            echo=True) -> Tuple[str, int, list]:
+            echo=True,
+            sentinel: bool = False,
+            fail_res: List[Union[str, re.Pattern]] = None,
+            interruptible: bool = None) -> Tuple[str, int, list]:
     """
     Run command.
 
-    :param Union[paramiko.SSHClient, serial.Serial] client: commands executor for host-client mode
+    :param Union[DeviceSession, SSHExecutor, paramiko.Channel, serial.Serial] client: commands executor for host-client mode,
+        a DeviceSession runs the command in its working directory (see utils.session)
     :param str cmd: The commands
     :param int timeout: The command execution timeout period (seconds) which is 5 seconds by default
     :param Union[str, re.Pattern] ret_regex: Regular expressions used to extract the output
     :param bool echo: Whether to print out logs in real time, True by default
+    :param bool sentinel: Return as soon as the command finishes and use its exit status as ret_code,
+        recommended for short housekeeping commands (device only, host commands always wait for exit,
+        SSHExecutor always returns the exit status)
+    :param List[Union[str, re.Pattern]] fail_res: failure patterns of the case, if not None the case is decided
+        (and interrupted if needed) the moment ret_regex or one of fail_res appears (device only).
+        The output of such case commands is spooled to disk if enabled (see utils.capture), then log
+        is a lazy SpooledLog handle which supports bool(), str(), "in" and findall().
+        Their timeout may be shortened from the runtime history and their duration is recorded (see utils.history),
+        and is at most the rest of the time budget of the running task (see utils.tasks).
+    :param bool interruptible: interrupt the command (CTRL+C) when it times out (device only),
+        by default if it runs a program ("./..."), e.g. False for daemons which must keep running
 
     :return Tuple[str, int, list]:  (log, ret_code, ret)
     """
-    # ret_code: 0: success; 1: fail(include timeout)
-    if type(client) == paramiko.Channel:
+    # ret_code: 0: success; 1: fail(include timeout); exit status in sentinel mode
+    if type(client) == DeviceSession:
+        return client.run(cmd=cmd,
+                          timeout=timeout,
+                          ret_regex=ret_regex,
+                          echo=echo,
+                          sentinel=sentinel,
+                          fail_res=fail_res,
+                          interruptible=interruptible)
+    if fail_res is not None:
+        timeout = budget_timeout(case_timeout(timeout))
+    start_time = time.time()
+    spool = open_spool() if echo and fail_res is not None and \
+        type(client) in (SSHExecutor, paramiko.Channel, serial.Serial) else None
+    if type(client) == SSHExecutor:
+        log, ret_code, ret = client.run(cmd=cmd,
+                                        timeout=timeout,
+                                        ret_regex=ret_regex,
+                                        echo=echo,
+                                        fail_res=fail_res,
+                                        spool=spool,
+                                        interruptible=interruptible)
+    elif type(client) == paramiko.Channel:
         log, ret_code, ret = ssh_run_cmd(ssh_channel=client,
                                          cmd=cmd,
                                          timeout=timeout,
                                          ret_regex=ret_regex,
-                                         echo=echo)
+                                         echo=echo,
+                                         sentinel=sentinel,
+                                         fail_res=fail_res,
+                                         spool=spool,
+                                         interruptible=interruptible)
     elif type(client) == serial.Serial:
         log, ret_code, ret = ser_run_cmd(ser=client,
                                          cmd=cmd,
                                          timeout=timeout,
                                          ret_regex=ret_regex,
-                                         echo=echo)
+                                         echo=echo,
+                                         sentinel=sentinel,
+                                         fail_res=fail_res,
+                                         spool=spool,
+                                         interruptible=interruptible)
     else:
         log, ret_code, ret = host_run_cmd(cmd=cmd,
                                           timeout=timeout,
                                           ret_regex=ret_regex,
                                           echo=echo)
+    if fail_res is not None:
+        note_case_run(time.time() - start_time, len(log))
     return log, ret_code, ret
 
 
+def _as_list(value) -> Optional[list]:
+    """fail_res supports a single string or a list of strings, None if absent (no live verdict)"""
+    if value is None:
+        return None
+    if not value:
+        return []
+    return [value] if isinstance(value, str) else list(value)
+
+
 def read_cases(cases_file: str, marker: str):
     """
     Read test cases from *.yaml
 
     :param str case_file: *.yaml
     :param str marker: see in pytest.ini
+
+    :return list: [(case, check_res, runtime, fail_res), ...], fail_res is None if the case has none
     """
     with open(cases_file, 'r', encoding='utf-8') as f:
         cases = yaml_load(f, Loader=Loader)
@@ -63,6 +125,7 @@ def read_cases(cases_file: str, marker: str):
             test_marker_cases = cases['test_cases'][marker]
             return [(x['case'],
                      x.get('check_res', 'PASS'),
-                     x.get('runtime', 1)) for x in test_marker_cases]
+                     x.get('runtime', 1),
+                     _as_list(x.get('fail_res'))) for x in test_marker_cases]
         else:
             assert False, f'No valid \"testcase\" or \"cmds\" key found in the \"{cases_file}\"'
@@ -1,4 +1,6 @@
 import re
+import uuid
+from typing import Tuple
 from datetime import datetime
 import inspect
 import logging
@@ -27,6 +29,28 @@ def print_function():
     print(f"[Run {caller_function_name} function]")
 
 
+def add_sentinel(cmd: str) -> Tuple[str, re.Pattern]:
+    """
+    Wrap the command with an unique end marker which carries the shell exit status
+
+    The marker is printed as "__CMD_END_<token>_<exit status>__" when the command finishes,
+    the echoed command line only contains "$?" so it never matches the returned regex.
+    The echo is sent on its own line, so a trailing "&" or "# comment" of the command is harmless.
+
+    :param str cmd: The command to execute
+
+    :return Tuple[str, re.Pattern]: (wrapped command, regex of end marker, group(1) is exit status)
+    """
+    token = uuid.uuid4().hex[:8]
+    cmd = cmd.strip()
+    # a lone trailing ";" is redundant before the newline ("\;" of find -exec and ";;" are kept)
+    if cmd.endswith(";") and not cmd.endswith((";;", "\\;")):
+        cmd = cmd[:-1].rstrip()
+    wrapped_cmd = f"{cmd}\necho __CMD_END_{token}_$?__"
+    end_regex = re.compile(rf"__CMD_END_{token}_(\d+)__")
+    return wrapped_cmd, end_regex
+
+
 def extract_time(time_str, time_format="%a %b %d %H:%M:%S %Y"):
     """
     Extranct formatted time from str
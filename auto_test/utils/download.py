@@ -1,11 +1,22 @@
 import os
 import re
-from typing import List, Generator, Dict
+import glob
+import time
+import shutil
+import contextlib
+import tempfile
+import hashlib
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Generator, Dict, Tuple, Union, Callable, Any, Optional
 import logging
-from stat import S_ISDIR as isdir
+from stat import S_ISDIR as isdir, S_ISLNK as islink
 from datetime import datetime
 import paramiko
-from utils.ssh_utils import init_ssh_client
+from utils.ssh_utils import ssh_pool
+from utils.cache import ArtifactCache
+from utils.extract import extract_tar, extract_zip, remove_manifest
 
 
 def init_sftp(ip: str,
@@ -13,7 +24,7 @@ def init_sftp(ip: str,
               pwd: str,
               port: int = 22) -> paramiko.SFTPClient:
     """
-    Init SFTPClient and set keepalive=100s
+    Open SFTPClient on the pooled transport of the server (keepalive=20s)
 
     :param str ip: the server to connect to
     :param str user: the username to authenticate as (defaults to the current local username)
@@ -21,13 +32,94 @@ def init_sftp(ip: str,
     :param int port: the server port to connect to
     """
     sftp = None
-    ssh_client = init_ssh_client(ip=ip, user=user, pwd=pwd, port=port)
-    ssh_transport = ssh_client.get_transport()
-    ssh_transport.set_keepalive(20)
-    sftp = ssh_client.open_sftp()
+    sftp = ssh_pool.open_sftp(ip=ip, user=user, pwd=pwd, port=port)
     return sftp
 
 
+# Remote directory listings cached per session, several YAML entries under the same directory share one listing
+LISTING_TTL = 300   # seconds
+_LISTING_CACHE = {}     # (host, port, username, path) -> (time, {filename: SFTPAttributes})
+_LISTING_LOCK = threading.Lock()
+
+
+def listdir_attr_cached(sftp: paramiko.SFTPClient, path: str, ttl: int = LISTING_TTL) -> Dict[str, paramiko.SFTPAttributes]:
+    """
+    sftp.listdir_attr() cached for ttl seconds
+
+    :param paramiko.SFTPClient sftp: SFTPClient object
+    :param str path: remote directory
+    :param int ttl: seconds the listing stays valid
+
+    :return Dict[str, paramiko.SFTPAttributes]: {filename: attributes}
+    """
+    path = path.rstrip("/") or "/"
+    # the listing depends on the permissions of the user
+    transport = sftp.get_channel().get_transport()
+    key = transport.getpeername()[:2] + (transport.get_username(), path)
+    with _LISTING_LOCK:
+        cached = _LISTING_CACHE.get(key)
+    if cached and time.time() - cached[0] < ttl:
+        return cached[1]
+    entries = {entry.filename: entry for entry in sftp.listdir_attr(path)}
+    with _LISTING_LOCK:
+        _LISTING_CACHE[key] = (time.time(), entries)
+    return entries
+
+
+def sftp_stat(sftp: paramiko.SFTPClient, path: str) -> paramiko.SFTPAttributes:
+    """
+    sftp.stat() answered from the cached listing of the parent directory if possible
+
+    :raise FileNotFoundError: like sftp.stat() if path does not exist
+    """
+    parent, name = os.path.split(path.rstrip("/"))
+    if name:
+        try:
+            entries = listdir_attr_cached(sftp, parent or "/")
+        except IOError:
+            entries = {}
+        # symlinks are resolved by the real stat
+        if name in entries and not islink(entries[name].st_mode or 0):
+            return entries[name]
+    return sftp.stat(path)
+
+
+def sftp_map(sftp: paramiko.SFTPClient,
+             func: Callable[[paramiko.SFTPClient, Any], Any],
+             items: list,
+             workers: int = 8) -> list:
+    """
+    Run func(session, item) for the items concurrently, each worker has its own SFTP session
+    on the same transport (the first one uses sftp)
+
+    :return list: results in the order of items
+    """
+    if len(items) <= 1 or workers <= 1:
+        return [func(sftp, item) for item in items]
+    results = [None] * len(items)
+    todo = queue.Queue()
+    for index, item in enumerate(items):
+        todo.put((index, item))
+
+    def worker(index: int):
+        session = sftp if index == 0 else paramiko.SFTPClient.from_transport(sftp.get_channel().get_transport())
+        try:
+            while True:
+                try:
+                    i, item = todo.get_nowait()
+                except queue.Empty:
+                    return
+                results[i] = func(session, item)
+        finally:
+            if session is not sftp:
+                session.close()
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(items))) as executor:
+        for future in [executor.submit(worker, i) for i in range(min(workers, len(items)))]:
+            future.result()
+    return results
+
+
 class FileObj:
     """FileObj class"""
     def __init__(self, name: str, pre_path: str, mtime: datetime, isdir: bool, size: int):
@@ -42,7 +134,7 @@ def walk(sftp: paramiko.SFTPClient, path: str) -> Generator:
     """List all dir"""
     try:
         dirs, nondirs = [], []
-        for entry in sftp.listdir_attr(path):
+        for entry in listdir_attr_cached(sftp, path).values():
             if isdir(entry.st_mode):
                 dirs.append(entry.filename)
             else:
@@ -72,35 +164,33 @@ def find_from_sftp(sftp: paramiko.SFTPClient,
 
     :return List[FileObj]: matched FileObj list (name, parent absolute path, timestamp, isdir, size)
     """
+    def to_file_obj(root: str, attr: paramiko.SFTPAttributes) -> FileObj:
+        # the listing already has the attributes, only symlinks need a stat to be resolved
+        name = attr.filename
+        if islink(attr.st_mode or 0):
+            attr = sftp.stat(os.path.join(root, name))
+        return FileObj(name,
+                       root,
+                       datetime.fromtimestamp(attr.st_mtime),
+                       isdir(attr.st_mode),
+                       attr.st_size)
+
     entries = []
     try:
         if recursive:
             for root, _, filenames in walk(sftp, path):
+                listing = listdir_attr_cached(sftp, root)
                 for filename in filenames:
-                    full_path = os.path.join(root, filename)
                     if ret_regex:
                         if not re.fullmatch(ret_regex, filename):
                             continue
-                    stat = sftp.stat(full_path)
-                    file = FileObj(filename,
-                                    root,
-                                    datetime.fromtimestamp(stat.st_mtime),
-                                    isdir(stat.st_mode),
-                                    stat.st_size)
-                    entries.append(file)
+                    entries.append(to_file_obj(root, listing[filename]))
         else:
-            for entry in sftp.listdir_attr(path):
-                full_path = os.path.join(path, entry.filename)
+            for entry in listdir_attr_cached(sftp, path).values():
                 if ret_regex:
                     if not re.fullmatch(ret_regex, entry.filename):
                         continue
-                stat = sftp.stat(full_path)
-                file = FileObj(entry.filename,
-                                path,
-                                datetime.fromtimestamp(stat.st_mtime),
-                                isdir(stat.st_mode),
-                                stat.st_size)
-                entries.append(file)
+                entries.append(to_file_obj(path, entry))
 
         if latest and entries:
             return [max(entries, key=lambda x: x.mtime)]
@@ -168,75 +258,538 @@ def find_from_local(path: str,
     return entries
 
 
+def list_tree(sftp: paramiko.SFTPClient,
+              remote_path: str,
+              local_path: str,
+              recursive: bool = True) -> Tuple[List[str], List[Tuple[str, str, paramiko.SFTPAttributes]]]:
+    """
+    List the remote tree before downloading
+
+    :param paramiko.SFTPClient sftp: paramiko.SFTPClient
+    :param str remote_path: remote file or folder
+    :param str local_path: local saved path
+    :param bool recursive: whether list recursively
+
+    :return Tuple[List[str], List[Tuple[str, str, paramiko.SFTPAttributes]]]:
+        (local dirs to create, [(remote file, local file, attributes), ...])
+    """
+    stat = sftp.stat(remote_path)
+    if not isdir(stat.st_mode):
+        local_file = os.path.join(local_path, os.path.basename(remote_path)).replace("\\", "/")
+        return [local_path], [(remote_path, local_file, stat)]
+
+    dirs, files = [local_path], []
+    for entry in listdir_attr_cached(sftp, remote_path).values():
+        remote_file = os.path.join(remote_path, entry.filename).replace("\\", "/")
+        local_file = os.path.join(local_path, entry.filename).replace("\\", "/")
+        if isdir(entry.st_mode):
+            if recursive:
+                sub_dirs, sub_files = list_tree(sftp, remote_file, local_file, recursive)
+                dirs += sub_dirs
+                files += sub_files
+        else:
+            files.append((remote_file, local_file, entry))
+    return dirs, files
+
+
+CHECKSUM_ALGOS = ("sha256", "md5")
+DOWNLOAD_RETRIES = 3    # reconnections of one transfer before it fails
+READ_BLOCK = 1 << 20    # bytes of one sequential read
+READ_AHEAD = 4          # blocks requested at once, bounds the memory of a reader
+
+
+def _parse_checksum(text: str, name: str) -> Optional[str]:
+    """The digest of `name` in a checksum file ("<digest>" or sha256sum/md5sum "<digest>  <name>" lines)"""
+    for line in text.splitlines():
+        fields = line.split()
+        if not fields or not re.fullmatch(r'[0-9a-fA-F]{32}|[0-9a-fA-F]{64}', fields[0]):
+            continue
+        if len(fields) == 1 or os.path.basename(fields[-1].lstrip('*')) == name:
+            return fields[0].lower()
+    return None
+
+
+def find_checksum(sftp: paramiko.SFTPClient, remote_file: str) -> Optional[Tuple[str, str]]:
+    """
+    Look for a sidecar checksum of a remote file: <file>.sha256, <file>.sha256sum, <file>.md5, <file>.md5sum,
+    or SHA256SUMS / MD5SUMS in the same directory. The directory listing is cached, so only an existing
+    sidecar costs a round trip.
+
+    :return Tuple[str, str]: (algorithm, hex digest), None if there is no sidecar
+    """
+    dirname, name = os.path.split(remote_file)
+    try:
+        listing = listdir_attr_cached(sftp, dirname or ".")
+    except IOError:
+        return None
+    for algo in CHECKSUM_ALGOS:
+        for sidecar in (f"{name}.{algo}", f"{name}.{algo}sum", f"{algo.upper()}SUMS"):
+            if sidecar not in listing:
+                continue
+            with sftp.open(f"{dirname}/{sidecar}", 'rb') as f:
+                digest = _parse_checksum(f.read(1 << 20).decode('utf-8', errors='replace'), name)
+            if digest and len(digest) == hashlib.new(algo).digest_size * 2:
+                return algo, digest
+    return None
+
+
+class _ResumableReader:
+    """
+    Read-only file object over a remote file which survives a dropped connection: after a read error
+    the file is opened again (on a new SFTP session) and the reads go on from the current offset.
+    The reads are pipelined in windows of READ_AHEAD blocks, at most one window is held in memory.
+    """
+    def __init__(self,
+                 sftp: paramiko.SFTPClient,
+                 remote_file: str,
+                 offset: int = 0,
+                 size: int = None,
+                 reopen: Callable[[], paramiko.SFTPClient] = None,
+                 retries: int = DOWNLOAD_RETRIES):
+        """
+        :param paramiko.SFTPClient sftp: paramiko.SFTPClient
+        :param str remote_file: remote file
+        :param int offset: start reading at this offset (ranged read)
+        :param int size: size of the file, the reads are pipelined up to it
+        :param Callable[[], paramiko.SFTPClient] reopen: opens a new SFTP session after the connection dropped,
+            a new session on the same transport by default
+        :param int retries: reconnection attempts
+        """
+        self.sftp = sftp
+        self.remote_file = remote_file
+        self.pos = offset
+        self.size = size
+        self.reopen = reopen
+        self.retries = retries
+        self._transport = sftp.get_channel().get_transport()
+        self._fr = None
+        self._window = None     # generator of the blocks of the requested window
+        self._buf = b''         # data read ahead, returned from _buf[_off:]
+        self._off = 0
+        self._sessions = []     # sessions opened by the reader, closed with it
+
+    def _open(self):
+        if self._fr is not None:
+            return
+        if self.sftp is None:
+            if self.reopen:
+                self.sftp = self.reopen()
+            else:
+                self.sftp = paramiko.SFTPClient.from_transport(self._transport)
+            self._sessions.append(self.sftp)
+        self._fr = self.sftp.open(self.remote_file, 'rb')
+        if self.pos:
+            self._fr.seek(self.pos)
+
+    def _read_block(self) -> bytes:
+        """The block after the read-ahead data, a new window is requested when the last one is used up"""
+        offset = self.pos + len(self._buf) - self._off
+        if not self.size or offset >= self.size:
+            return self._fr.read(READ_BLOCK)
+        if self._window is None:
+            end = min(self.size, offset + READ_BLOCK * READ_AHEAD)
+            self._window = self._fr.readv([(o, min(READ_BLOCK, end - o)) for o in range(offset, end, READ_BLOCK)])
+        block = next(self._window, None)
+        if block is None:
+            self._window = None
+            return self._read_block()
+        return block
+
+    def read(self, size: int = -1) -> bytes:
+        attempt = 0
+        while True:
+            try:
+                self._open()
+                while size < 0 or len(self._buf) - self._off < size:
+                    block = self._read_block()
+                    if not block:
+                        break
+                    self._buf = self._buf[self._off:] + block
+                    self._off = 0
+                end = len(self._buf) if size < 0 else self._off + size
+                data = self._buf[self._off:end]
+                self._off += len(data)
+                self.pos += len(data)
+                return data
+            except (OSError, EOFError, paramiko.SSHException) as e:
+                attempt += 1
+                if attempt > self.retries:
+                    raise
+                logging.warning(f'Download: \"{self.remote_file}\" interrupted at {self.pos} bytes '
+                                f'({attempt}/{self.retries}), resume | {e}')
+                self._drop()
+                time.sleep(attempt)
+
+    def _drop(self):
+        """Forget the broken file and session, the next read reopens them"""
+        try:
+            self._fr.close()
+        except Exception:
+            pass
+        self._fr = None
+        self._window = None
+        self._buf, self._off = b'', 0
+        self.sftp = None
+
+    def close(self):
+        if self._fr is not None:
+            try:
+                self._fr.close()
+            except Exception:
+                pass
+            self._fr = None
+        for session in self._sessions:
+            session.close()
+        self._sessions = []
+
+
+def _get_file(sftp: paramiko.SFTPClient,
+              remote_file: str,
+              local_file: str,
+              attr: paramiko.SFTPAttributes,
+              checksum: Tuple[str, str] = None,
+              reopen: Callable[[], paramiko.SFTPClient] = None) -> Tuple[int, str]:
+    """
+    Download one file whose attributes are known, the reads are pipelined (prefetch)
+    and no extra stat round trip is needed
+
+    The data is written to a part file and hashed while it arrives (no second pass). A dropped
+    connection is resumed from the current offset, the part file left by an interrupted run is resumed
+    as well. The file is renamed into place only when it is complete and matches the checksum.
+
+    :param Tuple[str, str] checksum: expected (algorithm, hex digest), e.g. ("sha256", "9f86d0..."), None to skip
+    :param Callable[[], paramiko.SFTPClient] reopen: see _ResumableReader
+
+    :return Tuple[int, str]: (bytes downloaded, sha256 of the file)
+    """
+    size = attr.st_size or 0
+    # the part file is bound to the remote version, a stale one is never resumed
+    part = f"{local_file}.{size}-{int(attr.st_mtime or 0)}.part"
+    for stale in glob.glob(f"{glob.escape(local_file)}.*.part"):
+        if stale != part:
+            os.remove(stale)
+
+    while True:
+        offset = os.path.getsize(part) if os.path.isfile(part) else 0
+        if offset > size:
+            os.remove(part)
+            offset = 0
+        hashers = {"sha256": hashlib.sha256()}
+        if checksum:
+            hashers.setdefault(checksum[0], hashlib.new(checksum[0]))
+        if offset:
+            logging.info(f'Download: resume \"{remote_file}\" at {offset}/{size} bytes')
+            with open(part, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    for h in hashers.values():
+                        h.update(block)
+
+        reader = _ResumableReader(sftp, remote_file, offset=offset, size=size, reopen=reopen)
+        try:
+            with open(part, 'ab') as fw:
+                while True:
+                    data = reader.read(1 << 20)
+                    if not data:
+                        break
+                    fw.write(data)
+                    for h in hashers.values():
+                        h.update(data)
+        finally:
+            reader.close()
+
+        written = os.path.getsize(part)
+        if written != size:
+            os.remove(part)
+            raise IOError(f"size mismatch, {written} bytes received, {size} expected")
+        if checksum and hashers[checksum[0]].hexdigest() != checksum[1].lower():
+            os.remove(part)
+            if offset:
+                # the resumed part may come from a corrupted transfer, try once more from scratch
+                logging.warning(f'Download: resumed \"{remote_file}\" fails {checksum[0]} check, download again')
+                continue
+            raise IOError(f"{checksum[0]} mismatch, got {hashers[checksum[0]].hexdigest()}, expected {checksum[1]}")
+        break
+
+    # replace (not overwrite) local_file, it may be a hardlink of another file
+    os.replace(part, local_file)
+    # 保持权限
+    os.chmod(local_file, attr.st_mode)
+    return size - offset, hashers["sha256"].hexdigest()
+
+
 def download_from_sftp(
     sftp: paramiko.SFTPClient,
     remote_path: str,
     local_path: str,
-    recursive: bool = True
-) -> Dict[str, int]:
+    recursive: bool = True,
+    workers: int = 1,
+    large_file: int = 4 * 1024 * 1024,
+    cache: ArtifactCache = None,
+    checksum: Tuple[str, str] = None,
+    reopen: Callable[[], paramiko.SFTPClient] = None
+) -> Dict[str, Union[int, float]]:
     """
     Download files or folders from SFTP
 
+    The tree is listed first, then the files are spread across `workers` SFTP sessions opened on
+    the same transport. Large files (sorted by size, biggest first) and small files go to separate
+    queues, each worker prefers one queue and helps the other when its own is empty, so a few huge
+    files do not hold up the many small ones. With an artifact cache, files whose url, size and mtime
+    are already cached are materialised locally instead of downloaded.
+
+    Each file is hashed while downloaded and verified against `checksum` (single file) or its sidecar
+    checksum file (see find_checksum()). Interrupted transfers are resumed, see _get_file().
+
     :param paramiko.SFTPClient sftp: paramiko.SFTPClient
     :param str remote_path: remote path
     :param str local_path: local saved path
     :param bool recursive: whether download recursively
-
-    :return Dict[str, int]: result dictionary
+    :param int workers: number of SFTP sessions downloading at once
+    :param int large_file: files bigger than this (bytes) are queued as large files
+    :param ArtifactCache cache: the artifact cache (see utils.cache), None to always download
+    :param Tuple[str, str] checksum: expected (algorithm, hex digest) of remote_path if it is a file
+    :param Callable[[], paramiko.SFTPClient] reopen: opens a new SFTP session to resume after the
+        connection dropped, a new session on the same transport by default
+
+    :return Dict[str, Union[int, float]]: result dictionary
+        {'success': files, 'failed': files, 'cached': files served from cache,
+         'bytes': downloaded bytes, 'seconds': seconds, 'throughput': MB/s}
     """
-    result = {'success': 0, 'failed': 0}
+    result = {'success': 0, 'failed': 0, 'cached': 0, 'bytes': 0, 'seconds': 0.0, 'throughput': 0.0}
+    start_time = time.time()
+    lock = threading.Lock()
 
     try:
-        stat = sftp.stat(remote_path)
-        if isdir(stat.st_mode):
-            os.makedirs(local_path, exist_ok=True)
-
-            entries = sftp.listdir_attr(remote_path)
-            logging.info('Attempt to download from sftp')
-            logging.info(entries)
-
-            for entry in entries:
-                remote_file = os.path.join(remote_path, entry.filename).replace("\\", "/")
-                local_file = os.path.join(local_path, entry.filename).replace("\\", "/")
-                if isdir(entry.st_mode) and recursive:
-                    sub_result = download_from_sftp(sftp=sftp,
-                                                    remote_path=remote_file,
-                                                    local_path=local_file,
-                                                    recursive=recursive)
-                    result['success'] += sub_result['success']
-                    result['failed'] += sub_result['failed']
-                elif not isdir(entry.st_mode):
-                    try:
-                        sftp.get(remote_file, local_file)
-                        # 保持权限
-                        os.chmod(local_file, entry.st_mode)
-                        result['success'] += 1
-                        logging.info(f"Download: {local_path} <== {remote_path}")
-                    except Exception as e:
-                        result['failed'] += 1
-                        logging.error(f"Download: {local_path} <== {remote_path} fail | {e}")
-        else:
-            filename = os.path.basename(remote_path)
-            os.makedirs(local_path, exist_ok=True)
-            local_file = os.path.join(local_path, filename).replace("\\", "/")
-            sftp.get(remote_path, local_file)
-            # 保持权限
-            os.chmod(local_file, stat.st_mode)
-            result['success'] += 1
-            logging.info(f"Download: {local_file} <== {remote_path}")
+        dirs, files = list_tree(sftp, remote_path, local_path, recursive)
     except Exception as e:
         result['failed'] += 1
         logging.error(f"Download: {local_path} <== {remote_path} fail | {e}")
-
+        return result
+    for local_dir in dirs:
+        os.makedirs(local_dir, exist_ok=True)
+    logging.info(f'Attempt to download {len(files)} files from sftp \"{remote_path}\" with {workers} sessions')
+    if checksum and (len(files) != 1 or files[0][0] != remote_path):
+        logging.warning(f'Download: checksum of folder \"{remote_path}\" is ignored, use sidecar checksum files')
+        checksum = None
+
+    if cache:
+        host, port = sftp.get_channel().get_transport().getpeername()[:2]
+        url_prefix = f"sftp://{host}:{port}"
+
+    large_queue, small_queue = queue.Queue(), queue.Queue()
+    for item in sorted(files, key=lambda x: x[2].st_size or 0, reverse=True):
+        (large_queue if (item[2].st_size or 0) >= large_file else small_queue).put(item)
+
+    def worker(index: int):
+        # the first session uses the given SFTPClient, the others are new sessions on the same transport
+        session = sftp if index == 0 else paramiko.SFTPClient.from_transport(sftp.get_channel().get_transport())
+        # a quarter of the workers prefer large files
+        queues = (large_queue, small_queue) if index % 4 == 0 else (small_queue, large_queue)
+        try:
+            while True:
+                try:
+                    remote_file, local_file, attr = queues[0].get_nowait()
+                except queue.Empty:
+                    try:
+                        remote_file, local_file, attr = queues[1].get_nowait()
+                    except queue.Empty:
+                        return
+                try:
+                    expected = checksum or find_checksum(session, remote_file)
+                    if cache:
+                        key = cache.make_key(url_prefix + remote_file, attr.st_size, attr.st_mtime)
+                        # the cache is content-addressed by sha256, a sha256 checksum is checked for free
+                        digest = expected[1] if expected and expected[0] == "sha256" else None
+                        if cache.fetch(key, local_file, digest=digest):
+                            with lock:
+                                result['success'] += 1
+                                result['cached'] += 1
+                            logging.info(f"Download: {local_file} <== cache")
+                            continue
+                    size, sha256 = _get_file(session, remote_file, local_file, attr, checksum=expected, reopen=reopen)
+                    if cache:
+                        cache.store(key, local_file, mode=attr.st_mode, digest=sha256)
+                    with lock:
+                        result['success'] += 1
+                        result['bytes'] += size
+                    logging.info(f"Download: {local_file} <== {remote_file}")
+                except Exception as e:
+                    with lock:
+                        result['failed'] += 1
+                    logging.error(f"Download: {local_file} <== {remote_file} fail | {e}")
+        finally:
+            if session is not sftp:
+                session.close()
+
+    workers = max(1, min(workers, len(files)))
+    if workers == 1:
+        worker(0)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for future in [executor.submit(worker, i) for i in range(workers)]:
+                try:
+                    future.result()
+                except Exception as e:
+                    logging.error(f"Download: open sftp session fail | {e}")
+        # files left by the workers which could not open a session
+        worker(0)
+    if cache:
+        cache.save()
+
+    result['seconds'] = round(time.time() - start_time, 3)
+    result['throughput'] = round(result['bytes'] / 1024 / 1024 / max(result['seconds'], 1e-6), 2)
     logging.info(
         f"Download Results:\n"
         f" - success: {result['success']} files\n"
-        f" - failed: {result['failed']} files"
+        f" - failed: {result['failed']} files\n"
+        f" - cached: {result['cached']} files\n"
+        f" - {result['bytes']} bytes in {result['seconds']}s ({result['throughput']} MB/s)"
     )
 
     return result
 
 
+class _Prepend:
+    """Read-only file object which returns `head` before the rest of `fileobj` (the magic bytes are peeked)"""
+    def __init__(self, head: bytes, fileobj):
+        self.head = head
+        self.fileobj = fileobj
+
+    def read(self, size: int = -1) -> bytes:
+        if not self.head:
+            return self.fileobj.read(size)
+        if size is None or size < 0:
+            data, self.head = self.head + self.fileobj.read(), b''
+            return data
+        data, self.head = self.head[:size], self.head[size:]
+        if len(data) < size:
+            data += self.fileobj.read(size - len(data))
+        return data
+
+
+class _Tee:
+    """Read-only file object which hashes what is read and copies it into `out` (if any)"""
+    def __init__(self, fileobj, out=None, algos: Tuple[str, ...] = ("sha256",)):
+        self.fileobj = fileobj
+        self.out = out
+        self.hashers = {algo: hashlib.new(algo) for algo in algos}
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.fileobj.read(size)
+        if self.out is not None:
+            self.out.write(data)
+        for h in self.hashers.values():
+            h.update(data)
+        return data
+
+
+def extract_stream(fileobj, target: str, name: str, spool_size: int = 64 * 1024 * 1024):
+    """
+    Extract an archive from a sequential file object, unchanged members are skipped (see utils.extract)
+
+    tar (any compression) is extracted in streaming mode while it is read. zip needs random access,
+    it is spooled through a SpooledTemporaryFile (memory up to spool_size, then a temporary file).
+
+    :param fileobj: file object with read()
+    :param str target: directory to extract into
+    :param str name: name of the archive, used for the member manifest
+    :param int spool_size: memory limit (bytes) of the zip spool
+    """
+    os.makedirs(target, exist_ok=True)
+    head = fileobj.read(4)
+    if head.startswith(b'PK'):
+        with tempfile.SpooledTemporaryFile(max_size=spool_size) as spool:
+            spool.write(head)
+            shutil.copyfileobj(fileobj, spool, 1 << 20)
+            spool.seek(0)
+            extract_zip(spool, target, name=name)
+    else:
+        extract_tar(_Prepend(head, fileobj), target, name=name)
+
+
+def extract_from_sftp(sftp: paramiko.SFTPClient,
+                      remote_path: str,
+                      target: str,
+                      cache: ArtifactCache = None,
+                      checksum: Tuple[str, str] = None,
+                      reopen: Callable[[], paramiko.SFTPClient] = None) -> Dict[str, Union[int, float]]:
+    """
+    Download an archive and extract it on the fly, the archive is never written to disk.
+    The reads are pipelined (see _ResumableReader), so extraction overlaps the network transfer.
+    A dropped connection is resumed at the current offset, the extraction does not notice it.
+    The archive is hashed while read and verified against `checksum` or its sidecar checksum file,
+    a mismatch fails the download (and the archive is not cached); as the files are already extracted
+    then, the manifest of the archive is removed so the next extraction rewrites all of them.
+
+    :param paramiko.SFTPClient sftp: paramiko.SFTPClient
+    :param str remote_path: remote archive (tar, tar.gz, tgz, zip...)
+    :param str target: local directory to extract into
+    :param ArtifactCache cache: if the archive is cached it is extracted from the cache,
+        otherwise it is also written into the cache while being extracted
+    :param Tuple[str, str] checksum: expected (algorithm, hex digest) of the archive
+    :param Callable[[], paramiko.SFTPClient] reopen: see download_from_sftp()
+
+    :return Dict[str, Union[int, float]]: result dictionary, see download_from_sftp()
+    """
+    result = {'success': 0, 'failed': 0, 'cached': 0, 'bytes': 0, 'seconds': 0.0, 'throughput': 0.0}
+    start_time = time.time()
+    try:
+        attr = sftp_stat(sftp, remote_path)
+        checksum = checksum or find_checksum(sftp, remote_path)
+        cached = None
+        if cache:
+            host, port = sftp.get_channel().get_transport().getpeername()[:2]
+            key = cache.make_key(f"sftp://{host}:{port}{remote_path}", attr.st_size, attr.st_mtime)
+            cached = cache.lookup(key)
+            if cached and checksum and checksum[0] == "sha256" and os.path.basename(cached) != checksum[1].lower():
+                cached = None
+        if cached:
+            with open(cached, 'rb') as f:
+                extract_stream(f, target, name=os.path.basename(remote_path))
+            result['cached'] += 1
+            logging.info(f"Download and extract: {target} <== cache")
+        else:
+            algos = ("sha256",) if not checksum or checksum[0] == "sha256" else ("sha256", checksum[0])
+            reader = _ResumableReader(sftp, remote_path, size=attr.st_size, reopen=reopen)
+            tmp = None
+            try:
+                if cache:
+                    tmp = os.path.join(cache.cache_dir, f"{os.path.basename(remote_path)}.{threading.get_ident()}.part")
+                try:
+                    with open(tmp, 'wb') if tmp else contextlib.nullcontext() as out:
+                        tee = _Tee(reader, out, algos)
+                        extract_stream(tee, target, name=os.path.basename(remote_path))
+                        # the rest of the archive (e.g. zero padding of tar) is not read by the extraction
+                        while tee.read(1 << 20):
+                            pass
+                    if reader.pos != (attr.st_size or 0):
+                        raise IOError(f"size mismatch, {reader.pos} bytes received, {attr.st_size} expected")
+                    if checksum and tee.hashers[checksum[0]].hexdigest() != checksum[1].lower():
+                        raise IOError(f"{checksum[0]} mismatch, got {tee.hashers[checksum[0]].hexdigest()}, "
+                                      f"expected {checksum[1]}, the extracted files may be corrupted")
+                except Exception:
+                    # the manifest saved by the extraction must not mark the corrupted files as up to date
+                    remove_manifest(os.path.basename(remote_path), target)
+                    raise
+                if tmp:
+                    cache.store(key, tmp, mode=attr.st_mode, digest=tee.hashers["sha256"].hexdigest())
+            finally:
+                reader.close()
+                if tmp and os.path.exists(tmp):
+                    os.remove(tmp)
+            result['bytes'] += attr.st_size or 0
+            logging.info(f"Download and extract: {target} <== {remote_path}")
+        result['success'] += 1
+    except Exception as e:
+        result['failed'] += 1
+        logging.error(f"Download and extract: {target} <== {remote_path} fail | {e}")
+
+    result['seconds'] = round(time.time() - start_time, 3)
+    result['throughput'] = round(result['bytes'] / 1024 / 1024 / max(result['seconds'], 1e-6), 2)
+    logging.info(f"Download and extract: {result['bytes']} bytes in {result['seconds']}s ({result['throughput']} MB/s)")
+    return result
+
+
 def upload_file(src: str,
                 dst: str,
                 ip: str,
@@ -253,20 +806,19 @@ def upload_file(src: str,
     :param str pwd: used for password authentication
     :param int try_times: default try three times
     """
-    try:
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.MissingHostKeyPolicy())
-        ssh.connect(hostname=ip, username=user, password=pwd, auth_timeout=5)
-        ssh_transport = ssh.get_transport()
-        ssh_transport.set_keepalive(20)
-        sftp = ssh.open_sftp()
-        sftp.put(src, dst)
-        sftp.close()
-        ssh.close()
-        logging.info(f'Upload file from \"{src}\" to \"{ip}:{dst}\" success!')
-    except BaseException as e:
-        if try_times == 0:
-            logging.error(f'Upload file from \"{src}\" to \"{ip}:{dst}\" fail!')
-            raise e
-        else:
-            upload_file(src, dst, ip, user, pwd, try_times - 1)
+    for attempt in range(try_times + 1):
+        try:
+            sftp = ssh_pool.open_sftp(ip=ip, user=user, pwd=pwd)
+            try:
+                sftp.put(src, dst)
+            finally:
+                sftp.close()
+            logging.info(f'Upload file from \"{src}\" to \"{ip}:{dst}\" success!')
+            return
+        except Exception as e:
+            if attempt == try_times:
+                logging.error(f'Upload file from \"{src}\" to \"{ip}:{dst}\" fail!')
+                raise e
+            logging.warning(f'Upload file from \"{src}\" to \"{ip}:{dst}\" fail ({attempt+1}/{try_times}) | {e}')
+            # the transport may be broken, reconnect at the next attempt
+            ssh_pool.discard(ip=ip, user=user)
@@ -0,0 +1,259 @@
+import re
+import time
+import codecs
+from typing import Callable, List, Optional, Tuple, Union
+
+
+ANSI_ESCAPE = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+ANSI_PARTIAL = re.compile(r'\x1B(?:\[[0-?]*[ -/]*)?\Z')     # escape sequence cut at the end of a chunk
+ECHO_END = re.compile(r'\n')     # end of the command line echoed by the console
+
+
+def _gbk_fallback(exc: UnicodeDecodeError) -> Tuple[str, int]:
+    """Error handler of the UTF-8 decoder: decode the invalid sequence as a GBK character if possible"""
+    pair = exc.object[exc.start:exc.start + 2]
+    if len(pair) == 2:
+        try:
+            return pair.decode('gbk'), exc.start + 2
+        except UnicodeDecodeError:
+            pass
+    return '\ufffd', exc.start + 1
+
+
+codecs.register_error('gbk_fallback', _gbk_fallback)
+
+
+class StreamDecoder:
+    """
+    Stateful decoder of console byte streams.
+
+    Bytes are decoded as UTF-8 by an incremental decoder, invalid sequences fall back to GBK
+    (replacement character if neither fits). ANSI escape codes are stripped and CRLF is normalised
+    to LF; an escape sequence or a CR cut at the end of a chunk is held back until the next one,
+    so every byte is decoded exactly once whatever the chunking.
+
+    Example:
+        decoder = StreamDecoder()
+        text = decoder.decode(ser.read(1024))
+        ...
+        text += decoder.decode(b'', final=True)
+    """
+    def __init__(self, errors: str = 'gbk_fallback'):
+        """
+        :param str errors: error handler of the UTF-8 decoder
+        """
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors=errors)
+        self._pending = ""      # text held back: partial escape sequence or trailing CR
+
+    def decode(self, data: bytes, final: bool = False) -> str:
+        """
+        Decode one chunk
+
+        :param bytes data: raw bytes read from the transport
+        :param bool final: end of the stream, flush everything held back
+
+        :return str: cleaned text of this chunk
+        """
+        text = self._pending + self._decoder.decode(data, final=final)
+        self._pending = ""
+        if not final:
+            match = ANSI_PARTIAL.search(text)
+            if match:
+                cut = match.start()
+            elif text.endswith('\r'):
+                cut = len(text) - 1
+            else:
+                cut = len(text)
+            text, self._pending = text[:cut], text[cut:]
+        return ANSI_ESCAPE.sub('', text).replace('\r\n', '\n')
+
+
+def compile_patterns(patterns: List[Union[str, re.Pattern]]) -> List[re.Pattern]:
+    """
+    Compile the patterns which are given as string, skip empty ones
+
+    :param List[Union[str, re.Pattern]] patterns: strings or compiled regexes
+
+    :return List[re.Pattern]: compiled regexes
+    """
+    compiled = []
+    for pattern in patterns:
+        if not pattern:
+            continue
+        compiled.append(re.compile(pattern) if isinstance(pattern, str) else pattern)
+    return compiled
+
+
+def verdict_patterns(pass_res: Union[str, re.Pattern],
+                     fail_res: List[Union[str, re.Pattern]]) -> Tuple[List[re.Pattern], int]:
+    """
+    Build the patterns which decide a case on the live stream
+
+    :param Union[str, re.Pattern] pass_res: the check_res of the case
+    :param List[Union[str, re.Pattern]] fail_res: the declared failure patterns of the case
+
+    :return Tuple[List[re.Pattern], int]: (patterns, number of pass patterns at the head of the list)
+    """
+    pass_patterns = compile_patterns([pass_res])
+    return pass_patterns + compile_patterns(fail_res or []), len(pass_patterns)
+
+
+class ExpectBuffer:
+    """
+    Incremental expect engine for console streams (serial or SSH).
+
+    Bytes are fed in as they arrive and decoded incrementally. Matching only looks at the text
+    which was not scanned yet plus a bounded overlap of the tail window, so patterns split across
+    chunk boundaries still match and the match cost per chunk does not grow with the log size.
+
+    Example:
+        buf = ExpectBuffer()
+        while True:
+            buf.feed(channel.recv(4096))
+            index, match = buf.expect([prompt_re, pass_re, fail_re])
+            if match:
+                break
+    """
+    def __init__(self, window: int = 4096, spool=None):
+        """
+        :param int window: size (chars) of the tail window kept for matching,
+            a pattern must match within the window
+        :param spool: file-like object (see utils.capture.SpoolWriter), if given the raw bytes are
+            written to it as they arrive and the whole decoded output is not kept in memory
+        """
+        self.window = window
+        self.spool = spool
+        self.total_bytes = 0
+        self._decoder = StreamDecoder()
+        self._chunks = []       # decoded text of the whole session
+        self._tail = ""         # bounded tail window
+        self._scan_pos = 0      # position in _tail which expect() has scanned up to
+        self._match_end = 0     # end of the last returned match in _tail
+
+    def feed(self, data: bytes) -> str:
+        """
+        Feed raw bytes into the buffer
+
+        :param bytes data: raw bytes read from the transport
+
+        :return str: the decoded text of this chunk
+        """
+        if not data:
+            return ""
+        self.total_bytes += len(data)
+        if self.spool:
+            self.spool.write(data)
+        text = self._decoder.decode(data)
+        return self._append(text)
+
+    def flush(self) -> str:
+        """Decode the bytes which are still pending in the incremental decoder"""
+        return self._append(self._decoder.decode(b'', final=True))
+
+    def _append(self, text: str) -> str:
+        if not text:
+            return ""
+        if not self.spool:
+            self._chunks.append(text)
+        self._tail += text
+        # keep `window` chars before the scan position as overlap, never drop text which is not scanned yet
+        drop = self._scan_pos - self.window
+        if drop > 0:
+            self._tail = self._tail[drop:]
+            self._scan_pos -= drop
+            self._match_end = max(0, self._match_end - drop)
+        return text
+
+    def expect(self, patterns: List[re.Pattern]) -> Tuple[int, Optional[re.Match]]:
+        """
+        Search the new text for several compiled patterns at once
+
+        :param List[re.Pattern] patterns: compiled regexes, e.g. [prompt, pass string, error string]
+
+        :return Tuple[int, Optional[re.Match]]: (index of the earliest matched pattern, match),
+            (-1, None) if nothing matched
+        """
+        start = max(self._match_end, self._scan_pos - self.window, 0)
+        found_index, found = -1, None
+        for index, pattern in enumerate(patterns):
+            match = pattern.search(self._tail, start)
+            if match and (found is None or match.start() < found.start()):
+                found_index, found = index, match
+        self._scan_pos = len(self._tail)
+        if found:
+            self._match_end = found.end()
+        return found_index, found
+
+    def search_tail(self, pattern: re.Pattern, size: int = None) -> Optional[re.Match]:
+        """
+        Search pattern in the last `size` chars of the output, e.g. check the prompt
+
+        :param re.Pattern pattern: compiled regex
+        :param int size: size (chars) of the tail to search, the whole window by default
+        """
+        size = size or self.window
+        return pattern.search(self._tail, max(0, len(self._tail) - size))
+
+    def pump(self, read: Callable[[float], bytes], wait: float) -> bytes:
+        """
+        Read once from the transport and feed the data
+
+        :param Callable[[float], bytes] read: read(wait) returns the available bytes,
+            waits at most `wait` seconds and returns b'' if there is no data
+        :param float wait: maximum waiting time
+
+        :return bytes: raw data
+        """
+        data = read(wait)
+        self.feed(data)
+        return data
+
+    def wait(self,
+             read: Callable[[float], bytes],
+             patterns: List[re.Pattern],
+             timeout: float,
+             on_data: Callable[[bytes], None] = None) -> Tuple[int, Optional[re.Match]]:
+        """
+        Read from the transport until one of the patterns matches or timeout
+
+        :param Callable[[float], bytes] read: see pump()
+        :param List[re.Pattern] patterns: compiled regexes
+        :param float timeout: maximum waiting time (seconds)
+        :param Callable[[bytes], None] on_data: called with every raw chunk, e.g. print in real time
+
+        :return Tuple[int, Optional[re.Match]]: see expect()
+        """
+        deadline = time.time() + timeout
+        while True:
+            data = self.pump(read, min(0.05, max(0, deadline - time.time())))
+            if data and on_data:
+                on_data(data)
+            index, match = self.expect(patterns)
+            if match:
+                return index, match
+            if time.time() > deadline:
+                return -1, None
+
+    @property
+    def tail(self) -> str:
+        """The decoded tail window"""
+        return self._tail
+
+    @property
+    def log(self) -> str:
+        """The whole decoded output (the tail window if spooled)"""
+        if self.spool:
+            return self._tail
+        return "".join(self._chunks)
+
+    def finish(self):
+        """
+        Flush the decoder and close the spool
+
+        :return Union[str, SpooledLog]: the whole decoded output,
+            or the lazy handle of the spooled output (see utils.capture)
+        """
+        self.flush()
+        if self.spool:
+            return self.spool.close(tail=self._tail[-self.window:])
+        return self.log
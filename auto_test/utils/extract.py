@@ -0,0 +1,206 @@
+import os
+import json
+import time
+import logging
+import tarfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Union
+
+
+def _manifest_path(archive_name: str, target: str) -> str:
+    """The manifest of an archive lives in the target directory"""
+    return os.path.join(target, f".{os.path.basename(archive_name)}.manifest.json")
+
+
+def load_manifest(archive_name: str, target: str) -> Dict[str, list]:
+    """
+    Load the member manifest written by the previous extraction
+
+    :return Dict[str, list]: {member name: [size, crc or mtime]}
+    """
+    try:
+        with open(_manifest_path(archive_name, target), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(archive_name: str, target: str, manifest: Dict[str, list]):
+    path = _manifest_path(archive_name, target)
+    with open(path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(path + ".tmp", path)
+
+
+def remove_manifest(archive_name: str, target: str):
+    """Forget the previous extraction (e.g. the archive failed its check), the next one extracts all members"""
+    path = _manifest_path(archive_name, target)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def _unchanged(manifest: Dict[str, list], name: str, signature: list, target: str, mtime: int = None) -> bool:
+    """The member was extracted before with the same signature and is still on disk (not modified since)"""
+    if manifest.get(name) != signature:
+        return False
+    path = os.path.join(target, name)
+    if not os.path.isfile(path) or os.path.getsize(path) != signature[0]:
+        return False
+    return mtime is None or int(os.path.getmtime(path)) == mtime
+
+
+def _zip_member_path(filename: str, target: str) -> str:
+    """Path a zip member is extracted to, sanitised like zipfile.ZipFile.extract()"""
+    arcname = filename.replace('/', os.path.sep)
+    if os.path.altsep:
+        arcname = arcname.replace(os.path.altsep, os.path.sep)
+    arcname = os.path.splitdrive(arcname)[1]
+    arcname = os.path.sep.join(x for x in arcname.split(os.path.sep) if x not in ('', os.path.curdir, os.path.pardir))
+    if os.path.sep == '\\':
+        arcname = zipfile.ZipFile._sanitize_windows_name(arcname, os.path.sep)
+    return os.path.join(target, arcname)
+
+
+def _extract_zip_members(archive: str, names: List[str], target: str) -> int:
+    """Worker of the process pool: extract some members of a zip, return the bytes written"""
+    written = 0
+    with zipfile.ZipFile(archive, "r") as zip_ref:
+        for name in names:
+            info = zip_ref.getinfo(name)
+            zip_ref.extract(info, target)
+            written += info.file_size
+    return written
+
+
+def extract_zip(archive: Union[str, object], target: str, workers: int = None, name: str = None) -> Dict[str, Union[int, float]]:
+    """
+    Extract a zip, the members whose size and CRC did not change since the last extraction are skipped
+
+    Zip members are compressed independently, so they are decompressed on a process pool
+    (the members are split into batches of about the same size).
+
+    :param Union[str, object] archive: path of the zip, or a seekable file object (extracted in this process)
+    :param str target: directory to extract into
+    :param int workers: size of the process pool, os.cpu_count() by default
+    :param str name: name of the archive for the manifest, basename of archive by default
+
+    :return Dict[str, Union[int, float]]: see extract_archive()
+    """
+    name = name or os.path.basename(str(archive))
+    stats = {'members': 0, 'extracted': 0, 'skipped': 0, 'bytes': 0}
+    manifest = load_manifest(name, target)
+    new_manifest = {}
+    todo = []
+    with zipfile.ZipFile(archive, "r") as zip_ref:
+        for info in zip_ref.infolist():
+            stats['members'] += 1
+            if info.is_dir():
+                os.makedirs(os.path.join(target, info.filename), exist_ok=True)
+                continue
+            signature = [info.file_size, info.CRC]
+            new_manifest[info.filename] = signature
+            if _unchanged(manifest, info.filename, signature, target):
+                stats['skipped'] += 1
+            else:
+                todo.append(info)
+
+        workers = workers or os.cpu_count() or 1
+        if not isinstance(archive, str) or workers <= 1 or len(todo) < 2:
+            for info in todo:
+                zip_ref.extract(info, target)
+                stats['bytes'] += info.file_size
+            todo_batches = []
+        else:
+            # biggest members first, each goes to the lightest batch
+            batches = [[0, []] for _ in range(min(workers * 4, len(todo)))]
+            for info in sorted(todo, key=lambda x: x.file_size, reverse=True):
+                batch = min(batches, key=lambda b: b[0])
+                batch[0] += info.file_size
+                batch[1].append(info.filename)
+            todo_batches = [names for _, names in batches if names]
+            # zipfile creates the parent directories without exist_ok, the workers would race
+            # on the shared ones (zips without directory entries): create them all first
+            for parent in {os.path.dirname(_zip_member_path(info.filename, target)) for info in todo}:
+                os.makedirs(parent, exist_ok=True)
+
+    if todo_batches:
+        with ProcessPoolExecutor(max_workers=min(workers, len(todo_batches))) as executor:
+            futures = [executor.submit(_extract_zip_members, archive, names, target) for names in todo_batches]
+            stats['bytes'] += sum(f.result() for f in futures)
+    stats['extracted'] = len(todo)
+    save_manifest(name, target, new_manifest)
+    return stats
+
+
+def extract_tar(archive: Union[str, object], target: str, name: str = None) -> Dict[str, Union[int, float]]:
+    """
+    Extract a tar (any compression), the regular files whose size and mtime did not change since
+    the last extraction are not written again. A file object is read in streaming mode.
+    The members go through the 'tar' extraction filter; like extractall(), the attributes of the
+    directories are set at the end, so a read-only directory or its mtime is not changed by its content.
+
+    :param Union[str, object] archive: path of the tar, or a file object with read()
+    :param str target: directory to extract into
+    :param str name: name of the archive for the manifest, basename of archive by default
+
+    :return Dict[str, Union[int, float]]: see extract_archive()
+    """
+    name = name or os.path.basename(str(archive))
+    stats = {'members': 0, 'extracted': 0, 'skipped': 0, 'bytes': 0}
+    manifest = load_manifest(name, target)
+    new_manifest = {}
+    directories = []
+    if isinstance(archive, str):
+        tar_ref = tarfile.open(archive, "r:*")
+    else:
+        tar_ref = tarfile.open(fileobj=archive, mode="r|*")
+    with tar_ref:
+        for member in tar_ref:
+            stats['members'] += 1
+            if member.isfile():
+                signature = [member.size, int(member.mtime)]
+                new_manifest[member.name] = signature
+                if _unchanged(manifest, member.name, signature, target, mtime=int(member.mtime)):
+                    stats['skipped'] += 1
+                    continue
+                stats['bytes'] += member.size
+                stats['extracted'] += 1
+            if member.isdir():
+                directories.append(member)
+            tar_ref.extract(member, target, set_attrs=not member.isdir(), filter='tar')
+        # deepest first, as extractall()
+        for member in sorted(directories, key=lambda m: m.name, reverse=True):
+            member = tarfile.tar_filter(member, target)
+            path = os.path.join(target, member.name)
+            tar_ref.chown(member, path, numeric_owner=False)
+            tar_ref.utime(member, path)
+            tar_ref.chmod(member, path)
+    save_manifest(name, target, new_manifest)
+    return stats
+
+
+def extract_archive(archive: str, target: str, workers: int = None) -> Dict[str, Union[int, float]]:
+    """
+    Extract a zip or tar archive into target incrementally
+
+    :param str archive: path of the archive
+    :param str target: directory to extract into
+    :param int workers: size of the process pool for zip members
+
+    :return Dict[str, Union[int, float]]:
+        {'members', 'extracted', 'skipped', 'bytes': bytes written, 'seconds', 'throughput': MB/s}
+    """
+    start_time = time.time()
+    os.makedirs(target, exist_ok=True)
+    if zipfile.is_zipfile(archive):
+        stats = extract_zip(archive, target, workers=workers)
+    elif tarfile.is_tarfile(archive):
+        stats = extract_tar(archive, target)
+    else:
+        raise ValueError(f"{archive} is neither zip nor tar")
+    stats['seconds'] = round(time.time() - start_time, 3)
+    stats['throughput'] = round(stats['bytes'] / 1024 / 1024 / max(stats['seconds'], 1e-6), 2)
+    logging.info(f"Extract: {target} <== {archive}: {stats['extracted']} extracted, {stats['skipped']} unchanged, "
+                 f"{stats['bytes']} bytes in {stats['seconds']}s ({stats['throughput']} MB/s)")
+    return stats
@@ -0,0 +1,153 @@
+import os
+import time
+import shutil
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Union
+
+try:
+    import fcntl
+except ImportError:     # Windows host
+    fcntl = None
+
+FICLONE = 0x40049409    # ioctl of reflink (btrfs, xfs)
+COPY_WORKERS = 8        # files copied at once in a tree
+
+
+def reflink(src: str, dst: str) -> bool:
+    """Copy-on-write clone of src, return False if the filesystem (or platform) does not support it"""
+    if not fcntl:
+        return False
+    try:
+        with open(src, 'rb') as fs, open(dst, 'wb') as fd:
+            fcntl.ioctl(fd.fileno(), FICLONE, fs.fileno())
+        return True
+    except OSError:
+        if os.path.exists(dst):
+            os.remove(dst)
+        return False
+
+
+def _kernel_copy(src: str, dst: str) -> Optional[str]:
+    """
+    Copy inside the kernel (no round trip of the data through user space)
+
+    :return str: "copy_file_range" or "sendfile", None if neither is supported
+    """
+    with open(src, 'rb') as fs, open(dst, 'wb') as fd:
+        size = os.fstat(fs.fileno()).st_size
+        for name in ("copy_file_range", "sendfile"):
+            if not hasattr(os, name):
+                continue
+            offset = 0
+            try:
+                while offset < size:
+                    if name == "copy_file_range":
+                        n = os.copy_file_range(fs.fileno(), fd.fileno(), size - offset, offset, offset)
+                    else:
+                        n = os.sendfile(fd.fileno(), fs.fileno(), offset, size - offset)
+                    if not n:
+                        break
+                    offset += n
+            except OSError:
+                os.ftruncate(fd.fileno(), 0)
+                continue
+            return name
+    return None
+
+
+def copy_file(src: str, dst: str, hardlink: bool = True) -> str:
+    """
+    Copy one file with the cheapest method available:
+    hardlink -> reflink -> copy_file_range/sendfile -> buffered copy.
+    Symlinks are copied as symlinks, the mode and times of src are kept.
+
+    :param str src: source file
+    :param str dst: destination file, replaced if exists
+    :param bool hardlink: allow hardlinks, dst then shares the content (and later changes) with src
+
+    :return str: the method used
+    """
+    # replace dst instead of writing through it, it may be a hardlink of another file
+    if os.path.lexists(dst):
+        os.remove(dst)
+    if os.path.islink(src):
+        os.symlink(os.readlink(src), dst)
+        return "symlink"
+    if hardlink:
+        try:
+            os.link(src, dst)
+            return "hardlink"
+        except OSError:
+            pass
+    if reflink(src, dst):
+        method = "reflink"
+    else:
+        method = _kernel_copy(src, dst)
+        if not method:
+            with open(src, 'rb') as fs, open(dst, 'wb') as fd:
+                shutil.copyfileobj(fs, fd, 1 << 20)
+            method = "buffered"
+    shutil.copystat(src, dst)
+    return method
+
+
+def copy_path(src: str, dst: str, hardlink: bool = True, workers: int = COPY_WORKERS) -> Dict[str, Union[int, float]]:
+    """
+    Copy a file or a directory tree, the files of a tree are copied concurrently (see copy_file())
+
+    :param str src: source file or directory
+    :param str dst: destination path (not the parent directory), merged into if it is an existing directory
+    :param bool hardlink: allow hardlinks
+    :param int workers: files copied at once
+
+    :return Dict[str, Union[int, float]]: {'files', 'bytes', 'seconds', <method>: files copied with it}
+    """
+    start_time = time.time()
+    if os.path.isdir(src) and not os.path.islink(src):
+        dirs, files = [], []
+        for root, dirnames, filenames in os.walk(src):
+            rel = os.path.relpath(root, src)
+            dirs.append((root, os.path.normpath(os.path.join(dst, rel))))
+            os.makedirs(dirs[-1][1], exist_ok=True)
+            for name in filenames + [d for d in dirnames if os.path.islink(os.path.join(root, d))]:
+                files.append((os.path.join(root, name), os.path.normpath(os.path.join(dst, rel, name))))
+    else:
+        dirs, files = [], [(src, dst)]
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(files)))) as executor:
+        methods = Counter(executor.map(lambda item: copy_file(item[0], item[1], hardlink=hardlink), files))
+    # directory modes last, a read-only directory would refuse its files
+    for src_dir, dst_dir in reversed(dirs):
+        shutil.copystat(src_dir, dst_dir)
+
+    stats = {'files': len(files),
+             'bytes': sum(os.lstat(f).st_size for f, _ in files),
+             'seconds': round(time.time() - start_time, 3)}
+    stats.update(methods)
+    logging.info(f"Copy: {dst} <== {src}: {stats['files']} files, {stats['bytes']} bytes in {stats['seconds']}s "
+                 f"({', '.join(f'{k}: {v}' for k, v in methods.items())})")
+    return stats
+
+
+def move_path(src: str, target_dir: str, workers: int = COPY_WORKERS):
+    """
+    Move a file or directory into target_dir. On the same filesystem it is a rename,
+    across filesystems it is copied (see copy_path(), without hardlinks) and then deleted.
+
+    :param str src: source file or directory
+    :param str target_dir: existing destination directory
+    :param int workers: files copied at once
+    """
+    if os.stat(src, follow_symlinks=False).st_dev == os.stat(target_dir).st_dev:
+        shutil.move(src=src, dst=target_dir)
+        return
+    dst = os.path.join(target_dir, os.path.basename(os.path.normpath(src)))
+    if os.path.lexists(dst):
+        raise shutil.Error(f"Destination path '{dst}' already exists")
+    copy_path(src, dst, hardlink=False, workers=workers)
+    if os.path.isdir(src) and not os.path.islink(src):
+        shutil.rmtree(src)
+    else:
+        os.remove(src)
@@ -0,0 +1,181 @@
+import os
+import math
+import time
+import sqlite3
+import logging
+import threading
+import statistics
+from typing import Dict, List, Optional
+
+HISTORY_WINDOW = 50         # recent passed runs a timeout is derived from
+HISTORY_MIN_SAMPLES = 5     # with fewer passed runs the static timeout is kept
+TIMEOUT_FLOOR = 60          # adaptive timeouts are never shorter (seconds)
+
+
+class RuntimeHistory:
+    """
+    Local SQLite history of the case runs: wall time, time to verdict (the case command in run_cmd),
+    outcome and log size per case id, board and SDK version.
+
+    The timeout of a case command can be derived from it: a quantile of the recent passed runs on the
+    same board times a margin, capped by the static runtime of the YAML. The SDK version is recorded
+    but not used for the timeout, it changes with every daily build.
+    Several pytest processes (e.g. pytest-xdist workers) can share one database.
+    """
+    def __init__(self, path: str, board: str = "", sdk_version: str = ""):
+        """
+        :param str path: the database file, created if missing
+        :param str board: board of this session
+        :param str sdk_version: SDK version of this session
+        """
+        self.path = path
+        self.board = board or ""
+        self.sdk_version = sdk_version or ""
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS runs ("
+                               "id INTEGER PRIMARY KEY, case_id TEXT, board TEXT, sdk_version TEXT, "
+                               "started REAL, wall_time REAL, verdict_time REAL, outcome TEXT, log_size INTEGER)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS runs_case ON runs (case_id, board, outcome)")
+
+    def record(self,
+               case_id: str,
+               wall_time: float,
+               outcome: str,
+               verdict_time: float = None,
+               log_size: int = None,
+               started: float = None):
+        """
+        :param str case_id: pytest node id of the case
+        :param float wall_time: seconds of the call phase
+        :param str outcome: "passed", "failed" or "skipped"
+        :param float verdict_time: seconds the case command took to its verdict, None if unknown
+        :param int log_size: size of the case output
+        :param float started: start time (epoch), now - wall_time by default
+        """
+        started = started if started is not None else time.time() - wall_time
+        with self._lock, self._conn:
+            self._conn.execute("INSERT INTO runs (case_id, board, sdk_version, started, wall_time, verdict_time, "
+                               "outcome, log_size) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                               (case_id, self.board, self.sdk_version, started, wall_time, verdict_time,
+                                outcome, log_size))
+
+    def durations(self, case_id: str, limit: int = HISTORY_WINDOW) -> List[float]:
+        """Times to verdict of the recent passed runs of the case on this board"""
+        with self._lock:
+            rows = self._conn.execute("SELECT verdict_time FROM runs WHERE case_id = ? AND board = ? "
+                                      "AND outcome = 'passed' AND verdict_time IS NOT NULL "
+                                      "ORDER BY id DESC LIMIT ?", (case_id, self.board, limit)).fetchall()
+        return [row[0] for row in rows]
+
+    def estimates(self, limit: int = HISTORY_WINDOW) -> Dict[str, float]:
+        """Median wall time of the recent runs (not skipped) of each case on this board, {case_id: seconds}"""
+        with self._lock:
+            rows = self._conn.execute("SELECT case_id, wall_time FROM runs WHERE board = ? AND outcome != 'skipped' "
+                                      "ORDER BY id DESC", (self.board,)).fetchall()
+        samples = {}
+        for case_id, wall_time in rows:
+            if len(samples.setdefault(case_id, [])) < limit:
+                samples[case_id].append(wall_time)
+        return {case_id: statistics.median(values) for case_id, values in samples.items()}
+
+    def timeout(self, case_id: str, static: float, margin: float, quantile: float = 0.99) -> float:
+        """
+        Timeout of the case command: quantile of the recent passed runs x margin,
+        at least TIMEOUT_FLOOR and at most the static timeout
+
+        :param float static: the timeout of the YAML (runtime)
+        :param float margin: multiplier of the quantile
+        :param float quantile: e.g. 0.99 for p99
+
+        :return float: the static timeout if there are fewer than HISTORY_MIN_SAMPLES passed runs
+        """
+        samples = sorted(self.durations(case_id))
+        if len(samples) < HISTORY_MIN_SAMPLES:
+            return static
+        p = samples[max(0, math.ceil(quantile * len(samples)) - 1)]
+        return min(static, max(TIMEOUT_FLOOR, math.ceil(p * margin)))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# History of the session, configured once (see conftest.py)
+_HISTORY = {
+    "instance": None,
+    "margin": 0,            # 0: only record, keep the static timeouts
+    "case": None,           # node id of the running case
+    "verdict_time": None,   # seconds of its case commands
+    "log_size": None,
+}
+
+
+def case_id(item) -> str:
+    """Node id of a pytest item, without the "@group" suffix of pytest-xdist --dist loadgroup"""
+    mark = item.get_closest_marker("xdist_group")
+    name = mark and (mark.args[0] if mark.args else mark.kwargs.get("name", "default"))
+    suffix = f"@{name}"
+    return item.nodeid[:-len(suffix)] if name and item.nodeid.endswith(suffix) else item.nodeid
+
+
+def configure_history(path: Optional[str], board: str = "", sdk_version: str = "", margin: float = 0):
+    """
+    Enable the runtime history for the session
+
+    :param str path: the database file, None to disable
+    :param float margin: derive the case timeouts from the history (p99 x margin), 0 to only record
+    """
+    close_history()
+    _HISTORY["instance"] = RuntimeHistory(path, board, sdk_version) if path else None
+    _HISTORY["margin"] = margin
+
+
+def get_history() -> Optional[RuntimeHistory]:
+    """The runtime history of the session, None if disabled"""
+    return _HISTORY["instance"]
+
+
+def close_history():
+    if _HISTORY["instance"]:
+        _HISTORY["instance"].close()
+        _HISTORY["instance"] = None
+
+
+def set_history_case(case_id: Optional[str]):
+    """Set the node id of the running case"""
+    _HISTORY.update(case=case_id, verdict_time=None, log_size=None)
+
+
+def case_timeout(timeout: float) -> float:
+    """Timeout of a case command of the running case, see RuntimeHistory.timeout()"""
+    history, case_id = _HISTORY["instance"], _HISTORY["case"]
+    if not history or not case_id or _HISTORY["margin"] <= 0:
+        return timeout
+    adaptive = history.timeout(case_id, timeout, _HISTORY["margin"])
+    if adaptive < timeout:
+        logging.info(f'Adaptive timeout: {timeout}s -> {adaptive}s ({case_id})')
+    return adaptive
+
+
+def note_case_run(seconds: float, log_size: int):
+    """Add a case command of the running case (a case may run several)"""
+    _HISTORY["verdict_time"] = (_HISTORY["verdict_time"] or 0) + seconds
+    _HISTORY["log_size"] = (_HISTORY["log_size"] or 0) + log_size
+
+
+def record_case(case_id: str, wall_time: float, outcome: str):
+    """Record the finished case with its case commands (see note_case_run)"""
+    history = _HISTORY["instance"]
+    if not history:
+        return
+    verdict_time = _HISTORY["verdict_time"] if _HISTORY["case"] == case_id else None
+    log_size = _HISTORY["log_size"] if _HISTORY["case"] == case_id else None
+    try:
+        history.record(case_id, wall_time, outcome, verdict_time=verdict_time, log_size=log_size)
+    except sqlite3.Error as e:
+        logging.warning(f'Runtime history: record \"{case_id}\" fail | {e}')
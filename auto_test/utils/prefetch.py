@@ -0,0 +1,141 @@
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from utils.action_graph import BOARD_ACTIONS, action_paths, build_graph, _overlap
+
+
+def _dedupe_key(env_op: dict) -> str:
+    """Identity of an action regardless of its description"""
+    return json.dumps({k: v for k, v in env_op.items() if k not in ('desc', 'id', 'depends_on')},
+                      sort_keys=True, default=str)
+
+
+def plan_prefetch(modules: Dict[str, Tuple[List[dict], List[Set[int]]]],
+                  path_map: Dict[str, str] = None,
+                  resolve: Callable[[dict], Optional[Tuple[Set[str], Set[str]]]] = None
+                  ) -> Dict[str, Tuple[Set[int], List[Set[int]]]]:
+    """
+    Choose the actions which can run before their module starts
+
+    An action is prefetched if it runs on the host, all its dependencies are prefetched too, and it
+    touches no path used by another module (identical downloads are shared, not conflicting).
+    So prefetching never changes what a module running in the meantime sees.
+
+    :param modules: {env_file: (actions, deps)}, see build_graph()
+    :param Dict[str, str] path_map: see action_paths()
+    :param resolve: gives the exact (reads, writes) of an action if it can, e.g. the entries of a
+        downloaded folder from the remote listing, None to fall back to action_paths()
+
+    :return Dict[str, Tuple[Set[int], List[Set[int]]]]:
+        {env_file: (indexes of the prefetched actions, deps rebuilt from the resolved paths)}
+    """
+    def paths_of(env_op: dict) -> Tuple[Set[str], Set[str]]:
+        resolved = resolve(env_op) if resolve else None
+        return resolved if resolved is not None else action_paths(env_op, path_map)
+
+    paths = {env_file: [paths_of(op) for op in actions] for env_file, (actions, _) in modules.items()}
+    keys = {env_file: [_dedupe_key(op) if op['action'] == "download" else None for op in actions]
+            for env_file, (actions, _) in modules.items()}
+
+    def conflict(env_file: str, i: int) -> bool:
+        reads, writes = paths[env_file][i]
+        for other, (actions, _) in modules.items():
+            if other == env_file:
+                continue
+            for j in range(len(actions)):
+                if keys[env_file][i] is not None and keys[env_file][i] == keys[other][j]:
+                    continue
+                r, w = paths[other][j]
+                if _overlap(writes, r | w) or _overlap(reads, w):
+                    return True
+        return False
+
+    chosen = {}
+    for env_file, (actions, _) in modules.items():
+        deps = build_graph(actions, path_map, paths=paths[env_file])
+        chosen[env_file] = (set(), deps)
+        for i, op in enumerate(actions):
+            if op['action'] not in BOARD_ACTIONS and deps[i] <= chosen[env_file][0] and not conflict(env_file, i):
+                chosen[env_file][0].add(i)
+    return chosen
+
+
+class Prefetcher:
+    """
+    Run the prefetched actions of all modules on a background thread pool.
+
+    The actions are submitted module by module in collection order and in dependency order inside
+    a module, an action first waits for its dependencies. The pool is FIFO, so the dependencies
+    are always started before the waiting action and the pool cannot deadlock.
+    """
+    def __init__(self, workers: int = 2):
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="prefetch")
+        self._plans = {}    # env_file -> {index: Future}
+
+    @staticmethod
+    def _task(env_op: dict, dependencies: List[Future], run_action: Callable[[dict], None]):
+        for future in dependencies:
+            future.result()
+        run_action(env_op)
+
+    def start(self,
+              modules: Dict[str, Tuple[List[dict], List[Set[int]]]],
+              run_action: Callable[[dict], None],
+              path_map: Dict[str, str] = None,
+              resolve: Callable[[dict], Optional[Tuple[Set[str], Set[str]]]] = None):
+        """
+        :param modules: {env_file: (actions, deps)} in the order the modules run
+        :param Callable[[dict], None] run_action: runs one action, raises on failure
+        :param Dict[str, str] path_map: see action_paths()
+        :param resolve: see plan_prefetch()
+        """
+        chosen = plan_prefetch(modules, path_map, resolve)
+        shared = {}     # dedupe key of downloads -> Future
+        for env_file, (actions, _) in modules.items():
+            futures = {}
+            indexes, deps = chosen[env_file]
+            for i in sorted(indexes):
+                key = _dedupe_key(actions[i]) if actions[i]['action'] == "download" else None
+                if key in shared:
+                    futures[i] = shared[key]
+                    continue
+                futures[i] = self._executor.submit(self._task, actions[i], [futures[j] for j in deps[i]], run_action)
+                if key:
+                    shared[key] = futures[i]
+            self._plans[env_file] = futures
+            logging.info(f'Prefetch: {len(futures)}/{len(actions)} actions of \"{env_file}\"')
+
+    def get(self, env_file: str) -> Dict[int, Future]:
+        """The prefetched actions of a module, {index: Future}"""
+        return self._plans.get(env_file, {})
+
+    def shutdown(self):
+        """Cancel what has not started and wait for the running actions"""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+_PREFETCH = {"instance": None}
+
+
+def start_prefetch(modules: Dict[str, Tuple[List[dict], List[Set[int]]]],
+                   run_action: Callable[[dict], None],
+                   path_map: Dict[str, str] = None,
+                   resolve: Callable[[dict], Optional[Tuple[Set[str], Set[str]]]] = None,
+                   workers: int = 2):
+    """Start the session prefetcher, see Prefetcher.start()"""
+    stop_prefetch()
+    _PREFETCH["instance"] = Prefetcher(workers)
+    _PREFETCH["instance"].start(modules, run_action, path_map, resolve)
+
+
+def get_prefetched(env_file: str) -> Dict[int, Future]:
+    """The prefetched actions of a module, empty if prefetch is disabled"""
+    return _PREFETCH["instance"].get(env_file) if _PREFETCH["instance"] else {}
+
+
+def stop_prefetch():
+    if _PREFETCH["instance"]:
+        _PREFETCH["instance"].shutdown()
+        _PREFETCH["instance"] = None
@@ -1,8 +1,10 @@
 import os
 import re
+import uuid
 import tarfile
 import zipfile
 from typing import List
+from functools import partial
 from stat import S_ISDIR as isdir
 import logging
 import shutil
@@ -10,7 +12,13 @@ import paramiko
 import pytest
 import yaml
 
-from utils.download import init_sftp, download_from_sftp, find_from_local, find_from_sftp
+from utils.download import init_sftp, download_from_sftp, extract_from_sftp, find_from_local, find_from_sftp, sftp_stat, sftp_map, listdir_attr_cached
+from utils.cache import get_cache
+from utils.action_graph import action_paths, build_graph, batch_board_actions, run_graph
+from utils.prefetch import start_prefetch, get_prefetched
+from utils.stamp import fingerprints, stamp_file, load_stamp, save_stamp, make_stamp, check_stamp
+from utils.extract import extract_archive
+from utils.fastcopy import copy_path, move_path
 from utils.cmd import run_cmd
 from utils.common_func import print_function
 
@@ -184,27 +192,33 @@ def find(path_info: dict, sftp: paramiko.SFTPClient = None) -> List[str]:
                 latest = False
             regex_index += 1
 
-            for path in current_paths:
-                if sftp:
-                    matches = find_from_sftp(sftp=sftp,
-                                             path=path,
-                                             ret_regex=pattern,
-                                             latest=latest)
-                else:
-                    matches = find_from_local(path=path,
-                                              ret_regex=pattern,
-                                              latest=latest)
+            if sftp:
+                # 远程路径: 多个候选路径并发查找, 目录列表在会话内缓存
+                results = sftp_map(sftp,
+                                   lambda session, path: find_from_sftp(sftp=session,
+                                                                        path=path,
+                                                                        ret_regex=pattern,
+                                                                        latest=latest),
+                                   current_paths)
+            else:
+                results = [find_from_local(path=path,
+                                           ret_regex=pattern,
+                                           latest=latest) for path in current_paths]
+            for matches in results:
                 for match in matches:
                     full_path = os.path.join(match.pre_path, match.name)
                     next_paths.append(str(full_path))
         else:
             # 处理路径段部分: 检查当前所有路径的子路径是否存在
-            for path in current_paths:
-                new_path = path + part      # 可能存在part是'/'的情况, 所以使用+连接, 而不是使用os.path.join()
-                if sftp and sftp.stat(new_path):    # sftp.stat可以用来判断远程路径是否存在
-                    next_paths.append(new_path)
-                elif not sftp and os.path.exists(new_path):     # 如果是本地路径
-                    next_paths.append(new_path)
+            new_paths = [path + part for path in current_paths]  # 可能存在part是'/'的情况, 所以使用+连接, 而不是使用os.path.join()
+            if sftp:
+                # sftp_stat可以用来判断远程路径是否存在(不存在时抛出异常), 优先使用父目录的缓存列表,
+                # 同一父目录只列一次, 顺序执行即可, 不需要额外的会话
+                for path in new_paths:
+                    sftp_stat(sftp, path)
+                next_paths += new_paths
+            else:
+                next_paths += [path for path in new_paths if os.path.exists(path)]     # 如果是本地路径
         current_paths = [str(each) for each in next_paths]
     return current_paths
 
@@ -212,13 +226,13 @@ def find(path_info: dict, sftp: paramiko.SFTPClient = None) -> List[str]:
 def check_isdir(path: str, sftp: paramiko.SFTPClient = None):
     """检查path的是文件还是文件夹"""
     if sftp:
-        stat = sftp.stat(path=path)
+        stat = sftp_stat(sftp, path)
         return isdir(stat.st_mode)
     else:
         return os.path.isdir(path)
 
 
-def action_download(url_info: dict, source, target):
+def action_download(url_info: dict, source, target, workers: int = 1, extract_to: str = None, checksum: tuple = None):
     """下载
 
     :param dict url_info:
@@ -231,6 +245,9 @@ def action_download(url_info: dict, source, target):
         "pwd": str,
         "path": str
     }
+    :param int workers: 同时下载的sftp会话数
+    :param str extract_to: 不为空时, 压缩包边下载边解压到该目录, 压缩包本身不落盘
+    :param tuple checksum: (算法, 摘要), 如("sha256", "9f86d0..."), 下载时边下边校验; 为空时使用远端的校验文件(如有)
     """
     print_function()
     result = {'success': 0, 'failed': 0}
@@ -239,15 +256,31 @@ def action_download(url_info: dict, source, target):
         sftp = init_sftp(ip=url_info['hostname'],
                          user=url_info['user'],
                          pwd=url_info['pwd'])
+        # 连接中断时从连接池重新打开sftp会话(断线的transport会被重连), 从断点继续下载
+        reopen = partial(init_sftp, ip=url_info['hostname'], user=url_info['user'], pwd=url_info['pwd'])
         if isinstance(source, str):
             files = [source]
         elif isinstance(source, dict):
             files = find(path_info=source, sftp=sftp)
         for file in files:
-            result = download_from_sftp(sftp=sftp,
-                                        remote_path=file,
-                                        local_path=target,
-                                        recursive=True)
+            if extract_to:
+                result = extract_from_sftp(sftp=sftp,
+                                           remote_path=file,
+                                           target=extract_to,
+                                           cache=get_cache(),
+                                           checksum=checksum,
+                                           reopen=reopen)
+            else:
+                result = download_from_sftp(sftp=sftp,
+                                            remote_path=file,
+                                            local_path=target,
+                                            recursive=True,
+                                            workers=workers,
+                                            cache=get_cache(),
+                                            checksum=checksum,
+                                            reopen=reopen)
+            if result['failed']:
+                break
         sftp.close()
     else:   # TODO: 其他协议待补充
         logging.error("Need to add other download code for other protocal")
@@ -262,76 +295,135 @@ def action_extract(source, target):
     else:
         files = [source]
     for file in files:
-        os.makedirs(target, exist_ok=True)
-        if zipfile.is_zipfile(file):
-            with zipfile.ZipFile(file, "r") as zip_ref:
-                zip_ref.extractall(target)
-        elif tarfile.is_tarfile(file):
-            with tarfile.open(file, "r:*") as tar_ref:
-                tar_ref.extractall(target, filter=None)
-        else:
-            logging.error(f"Extract Fail: {file} => {target}")
+        # 增量解压: 与上次解压相比未变化的成员直接跳过, zip成员使用进程池并行解压
+        try:
+            extract_archive(file, target)
+        except Exception as e:
+            logging.error(f"Extract Fail: {file} => {target} | {e}")
             return False
     return True
 
 
-def action_board_link(device, source, target):
-    """在板端执行软连接操作"""
-    print_function()
+# 板端action输出中常见的错误
+BOARD_ERRORS = {
+    "board_link": ("no such file", "permission deny", "file exists"),
+    "board_move": ("no such file",),
+    "board_copy": ("no such file",),
+}
+# 板端action的命令超时(秒), 批量执行时累加
+BOARD_TIMEOUTS = {"board_link": 3, "board_move": 5, "board_copy": 5, "board_nfs": 13}
+BOARD_FAIL_MSG = {
+    "board_link": "Link {source} on board fail!",
+    "board_move": "Move {source} on board fail!",
+    "board_copy": "Copy {source} on board fail!",
+    "board_nfs": "mount nfs dir {source} to {target} on board fail!",
+}
+
+
+def board_action_cmd(action, source, target):
+    """板端action对应的shell命令, source不合法时返回None"""
+    if action == "board_nfs":
+        nfs_pattern = r'^\d{1,3}(\.\d{1,3}){3}:/.*$'
+        if not isinstance(source, str) or not re.match(nfs_pattern, source):
+            logging.error(f"NFS source format error: {source} should be like x.x.x.x:/path")
+            return None
+        # 检查板端目标路径是否可用, 挂载后通过df确认
+        return f"mkdir -p {target}; mount -t nfs -o nolock {source} {target}; df -h"
     if not isinstance(source, str):
         logging.error(f"Board link: {source} must be string")
-        return False
+        return None
     source = source.replace("\\", "/")
     target = target.replace("\\", "/")
-    cmd = f"ln -sf {source} {target}"
-    log, _, _ = run_cmd(client=device, cmd=str(cmd), timeout=3)
-    # 常见的一些错误
-    log = log.lower()
-    if "no such file" in log:
-        return False
-    elif "permission deny" in log:
-        return False
-    elif "file exists" in log:
+    return {"board_link": f"ln -sf {source} {target}",
+            "board_move": f"mv {source} {target}",
+            "board_copy": f"cp -f {source} {target}"}[action]
+
+
+def board_action_ok(action, source, log):
+    """按照板端action的输出判断是否成功"""
+    lower_log = log.lower()
+    if any(err in lower_log for err in BOARD_ERRORS.get(action, ())):
         return False
+    if action == "board_nfs":
+        src = source[:-1] if source.endswith("/") else source
+        return src in log
     return True
 
 
+def action_board_batch(device, steps):
+    """将连续的板端action合并为一条脚本, 一次发送到板端执行
+
+    每一步执行完输出带退出码的标记, 按标记切分输出后, 逐步使用与单独执行时相同的错误检查。
+    所有步骤都会执行(与逐条执行相同, 是否失败由输出判断), source不合法的步骤及其之后的步骤不发送
+
+    :param list steps: 板端action(env_op)列表
+    :return List[bool]: 每一步是否成功, 未执行的步骤为False
+    """
+    print_function()
+    cmds = []
+    for op in steps:
+        cmd = board_action_cmd(op['action'], op.get('source_info', op.get('source')), op['target'])
+        if cmd is None:
+            break
+        cmds.append(cmd)
+    if not cmds:
+        return [False] * len(steps)
+
+    token = uuid.uuid4().hex[:8]
+    # 标记中的退出码使用${r}, 回显的命令行不会匹配标记的正则
+    script = f"echo __STEP_{token}_begin_$?__; " + "; ".join(
+        f"{cmd}; r=$?; echo __STEP_{token}_{i}_${{r}}__" for i, cmd in enumerate(cmds))
+    timeout = sum(BOARD_TIMEOUTS[op['action']] for op in steps[:len(cmds)])
+    log, _, _ = run_cmd(client=device, cmd=script, timeout=timeout, sentinel=True)
+
+    results = []
+    markers = list(re.finditer(rf"__STEP_{token}_(\w+?)_(\d+)__", str(log)))
+    ends = {m.group(1): m for m in markers}
+    start = ends["begin"].end() if "begin" in ends else 0
+    for i, op in enumerate(steps):
+        marker = ends.get(str(i)) if i < len(cmds) else None
+        if marker is None:
+            results.append(False)
+            continue
+        step_log = str(log)[start:marker.start()]
+        start = marker.end()
+        results.append(board_action_ok(op['action'], op.get('source_info', op.get('source')), step_log))
+        logging.info(f"Board step {i}: {op['action']} exit {marker.group(2)} {'pass' if results[-1] else 'fail'}")
+    return results
+
+
+def action_board_link(device, source, target):
+    """在板端执行软连接操作"""
+    print_function()
+    cmd = board_action_cmd("board_link", source, target)
+    if cmd is None:
+        return False
+    log, _, _ = run_cmd(client=device, cmd=str(cmd), timeout=3, sentinel=True)
+    return board_action_ok("board_link", source, log)
+
+
 def action_board_move(device, source, target):
     """在板端执行移动操作"""
     print_function()
-    if not isinstance(source, str):
-        logging.error(f"Board link: {source} must be string")
+    cmd = board_action_cmd("board_move", source, target)
+    if cmd is None:
         return False
-    source = source.replace("\\", "/")
-    target = target.replace("\\", "/")
-    cmd = f"mv {source} {target}"
-    log, _, _ = run_cmd(client=device, cmd=str(cmd))
-    # 常见的一些错误
-    log = log.lower()
-    if "no such file" in log:
-        return False
-    return True
+    log, _, _ = run_cmd(client=device, cmd=str(cmd), sentinel=True)
+    return board_action_ok("board_move", source, log)
 
 
 def action_board_copy(device, source, target):
     """在板端执行移动操作"""
     print_function()
-    if not isinstance(source, str):
-        logging.error(f"Board link: {source} must be string")
+    cmd = board_action_cmd("board_copy", source, target)
+    if cmd is None:
         return False
-    source = source.replace("\\", "/")
-    target = target.replace("\\", "/")
-    cmd = f"cp -f {source} {target}"
-    log, _, _ = run_cmd(client=device, cmd=str(cmd))
-    # 常见的一些错误
-    log = log.lower()
-    if "no such file" in log:
-        return False
-    return True
+    log, _, _ = run_cmd(client=device, cmd=str(cmd), sentinel=True)
+    return board_action_ok("board_copy", source, log)
 
 
 def action_move(source, target):
-    """移动文件或目录"""
+    """移动文件或目录, 跨文件系统时先拷贝(见action_copy)再删除"""
     print_function()
     if not isinstance(source, str):
         files = find(path_info=source)
@@ -340,7 +432,7 @@ def action_move(source, target):
     for file in files:
         os.makedirs(target, exist_ok=True)
         try:
-            shutil.move(src=file, dst=target)
+            move_path(src=file, target_dir=target)
         except Exception as e:
             logging.error(f'Move: \"{file}\" to \"{target}\" fail | {e}')
             return False
@@ -363,8 +455,13 @@ def action_rename(source, target):
     return True
 
 
-def action_copy(source, target):
-    """拷贝文件或目录"""
+def action_copy(source, target, hardlink: bool = True):
+    """拷贝文件或目录到target目录下
+
+    依次尝试硬链接, reflink, copy_file_range/sendfile, 普通拷贝, 目录中的文件并发拷贝, 保留权限
+
+    :param bool hardlink: 是否允许硬链接, 硬链接与源文件共享内容, 用例会原地修改该文件时需关闭
+    """
     print_function()
     if not isinstance(source, str):
         files = find(path_info=source)
@@ -373,7 +470,7 @@ def action_copy(source, target):
     for file in files:
         os.makedirs(target, exist_ok=True)
         try:
-            shutil.move(src=file, dst=target)
+            copy_path(src=file, dst=os.path.join(target, os.path.basename(os.path.normpath(file))), hardlink=hardlink)
         except Exception as e:
             logging.error(f"Copy: \"{file}\" to \"{target}\" fail | {e}")
             return False
@@ -408,78 +505,267 @@ def action_board_nfs(device, source, target):
         return False
     # 检查板端目标路径是否可用
     cmd = f"mkdir -p {target}"
-    log, _, _ = run_cmd(client=device, cmd=str(cmd), timeout=3)
+    log, _, _ = run_cmd(client=device, cmd=str(cmd), timeout=3, sentinel=True)
     cmd = f"mount -t nfs -o nolock {source} {target}"
-    log, _, _ = run_cmd(client=device, cmd=str(cmd))
-    log, _, _ = run_cmd(client=device, cmd="df -h")
-    src = source[:-1] if source.endswith("/") else source
-    if src not in log:
-        return False
-    return True
+    log, _, _ = run_cmd(client=device, cmd=str(cmd), sentinel=True)
+    log, _, _ = run_cmd(client=device, cmd="df -h", sentinel=True)
+    return board_action_ok("board_nfs", source, log)
 
 
-def read_env_file(env_file, request, device):
+def run_env_action(env_op: dict, config, device):
+    """按照action属性处理文件和目录, 失败时抛出AssertionError"""
+    action = env_op['action']
+    desc = env_op['desc']
+    if 'source_info' in env_op.keys():
+        source = env_op['source_info']
+    else:
+        source = env_op['source']
+    target = env_op['target'] if env_op['target'] else None
+
+    logging.info(f'{desc}')
+    if action == "download":
+        # 下载操作之前，解析url，并从路径字符串中去除ip相关信息
+        if isinstance(source, str):
+            url_info = parse_url(source)
+            source = url_info['path']
+        else:
+            url_info = parse_url(source['parts'][0])
+            source['parts'][0] = url_info['path']
+        # extract: true 解压到target, extract: <path> 解压到指定目录
+        extract = env_op.get('extract')
+        extract_to = target if extract is True else (extract or None)
+        # sha256: <digest> / md5: <digest> 校验下载的文件
+        algo = next((algo for algo in ("sha256", "md5") if env_op.get(algo)), None)
+        checksum = (algo, str(env_op[algo]).strip()) if algo else None
+        assert action_download(url_info=url_info,
+                               source=source,
+                               target=target,
+                               workers=config.getoption("--download_workers"),
+                               extract_to=extract_to,
+                               checksum=checksum), f"Download {source} fail!"
+    elif action == "board_link":
+        assert action_board_link(device, source, target), f"Link {source} on board fail!"
+    elif action == "board_move":
+        assert action_board_move(device, source, target), f"Move {source} on board fail!"
+    elif action == "board_copy":
+        assert action_board_copy(device, source, target), f"Copy {source} on board fail!"
+    elif action == "board_nfs":
+        assert action_board_nfs(device, source, target), f"mount nfs dir {source} to {target} on board fail!"
+    elif action == "board_batch":
+        for step, ok in zip(env_op['steps'], action_board_batch(device, env_op['steps'])):
+            step_source = step.get('source_info', step.get('source'))
+            logging.info(f"{step['desc']}")
+            assert ok, BOARD_FAIL_MSG[step['action']].format(source=step_source, target=step['target'])
+    elif action == "extract":
+        assert action_extract(source, target), f"Extract {source} fail!"
+    elif action == "move":
+        assert action_move(source, target), f"Move {source} fail!"
+    elif action == "rename":
+        assert action_rename(source, target), f"Rename {source} fail!"
+    elif action == "copy":
+        assert action_copy(source, target, hardlink=env_op.get('hardlink', True)), f"Copy {source} fail!"
+    elif action == "delete":
+        assert action_delete(source), f"Delete {source} fail!"
+    else:   # TODO:其他action待补充
+        assert False, f'Read ops fail: Unknown Action "{action}"'
+
+
+def env_path_map(config):
+    """板端测试路径通过nfs挂载到主机工作空间, 见action_graph.action_paths"""
+    test_path = config.getoption("--test_path").replace("\\", "/")
+    host_ws = config.getoption("--host_ws").replace("\\", "/")
+    return {test_path: host_ws}
+
+
+# 每个env_file中被选中用例的marker和用例名, 由pytest_collection_modifyitems设置; 未设置的env_file执行全部action
+ENV_SELECTION = {}
+# 每个env_file中上次运行已准备好的action的指纹, 首次读取时确定, 预取和prepare_ws看到相同的action列表
+ENV_PREPARED = {}
+
+
+def set_env_selection(selection: dict):
     """
-    解析和处理env_file文件中的测试环境配置
+    :param dict selection: {env_file: 被选中用例的marker名和用例函数名的集合}
+    """
+    ENV_SELECTION.clear()
+    ENV_SELECTION.update(selection)
 
-    Logic:
-    1. 读取env_file文件;
-    2. 替换动态配置, "${}";
-    3. 正则路径处理, "<>";
-    4. 按照action属性处理文件和目录
+
+def select_env_actions(env_config, tags):
+    """
+    按for_markers筛选action: 只保留没有for_markers, 或for_markers与被选中用例的marker/用例名有交集的action,
+    depends_on了被跳过的action的action同样跳过
+
+    :param set tags: 被选中用例的marker名和用例函数名, None时不筛选
+    """
+    if tags is None:
+        return env_config
+    selected, skipped_ids = [], set()
+    for env_op in env_config:
+        for_markers = env_op.get('for_markers') or []
+        for_markers = {for_markers} if isinstance(for_markers, str) else set(for_markers)
+        depends_on = env_op.get('depends_on') or []
+        depends_on = {depends_on} if isinstance(depends_on, str) else set(depends_on)
+        if (for_markers and not for_markers & tags) or depends_on & skipped_ids:
+            logging.info(f'Skip \"{env_op.get("desc")}\": not needed by the selected cases')
+            if env_op.get('id'):
+                skipped_ids.add(env_op['id'])
+            continue
+        selected.append(env_op)
+    return selected
+
+
+def resolve_env_config(env_file, config):
+    """
+    读取env_file, 按被选中的用例筛选action(for_markers), 替换动态配置"${}", 处理正则路径"<>"
+
+    :return List[dict]: actions
     """
-    print_function()
     # 读取env_file文件
     with open(env_file, "rb") as f:
         raw_data = yaml.safe_load(f)
     env_config = raw_data['test_environment_configs']       # list
 
+    # 只执行被选中的用例需要的action
+    env_config = select_env_actions(env_config, ENV_SELECTION.get(env_file))
+
     # 替换动态配置
-    env_config = replace_params(config=env_config, params=request.config)
+    env_config = replace_params(config=env_config, params=config)
 
     # 正则路径处理
-    env_config = extract_regex_segments(env_config)
+    return extract_regex_segments(env_config)
 
-    # 按照action属性处理文件和目录
-    for env_op in env_config:
-        action = env_op['action']
-        desc = env_op['desc']
-        if 'source_info' in env_op.keys():
-            source = env_op['source_info']
-        else:
-            source = env_op['source']
-        target = env_op['target'] if env_op['target'] else None
-
-        logging.info(f'{desc}')
-        if action == "download":
-            # 下载操作之前，解析url，并从路径字符串中去除ip相关信息
-            if isinstance(source, str):
-                url_info = parse_url(source)
-                source = url_info['path']
+
+def load_env_config(env_file, config):
+    """
+    读取env_file(见resolve_env_config), 推导action之间的依赖关系,
+    并跳过上次运行已准备好且产物未变化的action(见utils.stamp)
+
+    :return Tuple[List[dict], List[Set[int]]]: (actions, deps), 见action_graph.build_graph
+    """
+    env_config = resolve_env_config(env_file, config)
+
+    # 推导依赖关系
+    path_map = env_path_map(config)
+    paths = [action_paths(env_op, path_map) for env_op in env_config]
+    deps = build_graph(env_config, paths=paths)
+
+    # 已准备好的action, 每个env_file在会话中只判断一次
+    if env_file not in ENV_PREPARED:
+        stamp = {} if config.getoption("--no_env_stamp") else \
+            load_stamp(stamp_file(config.getoption("--host_ws").replace("\\", "/"), env_file))
+        prepared = check_stamp(env_config, deps, paths, stamp) if stamp else set()
+        ENV_PREPARED[env_file] = {fingerprints(env_config)[i] for i in prepared}
+    kept = [i for i, fingerprint in enumerate(fingerprints(env_config)) if fingerprint not in ENV_PREPARED[env_file]]
+    if len(kept) == len(env_config):
+        return env_config, deps
+    new_index = {i: n for n, i in enumerate(kept)}
+    return [env_config[i] for i in kept], [{new_index[j] for j in deps[i] if j in new_index} for i in kept]
+
+
+def save_env_stamp(env_file, config):
+    """环境准备完成后, 记录各主机端action的指纹和产物(文件夹下载通过远端目录列表确定写入路径)"""
+    env_config = resolve_env_config(env_file, config)
+    path_map, unreachable = env_path_map(config), set()
+    writes = [(resolve_download_paths(env_op, unreachable) or action_paths(env_op, path_map))[1]
+              for env_op in env_config]
+    path = stamp_file(config.getoption("--host_ws").replace("\\", "/"), env_file)
+    save_stamp(path, make_stamp(env_config, writes, load_stamp(path)))
+
+
+def resolve_download_paths(env_op, unreachable: set = None):
+    """
+    文件夹下载写入target的内容事先无法知道, 通过远端目录列表(有缓存)得到其写入的确切路径
+
+    :param set unreachable: 连接失败的服务器, 不再重试
+    :return Tuple[Set[str], Set[str]]: (reads, writes), 无法确定时返回None
+    """
+    source, target = env_op.get('source'), str(env_op.get('target') or "")
+    if env_op['action'] != "download" or env_op.get('extract') or not isinstance(source, str) or "<" in source:
+        return None
+    url_info = parse_url(source)
+    if not url_info or url_info['protocol'] not in ["ftp"] or url_info['hostname'] in (unreachable or ()):
+        return None
+    try:
+        sftp = init_sftp(ip=url_info['hostname'], user=url_info['user'], pwd=url_info['pwd'])
+        try:
+            path = url_info['path']
+            if isdir(sftp_stat(sftp, path).st_mode):
+                names = listdir_attr_cached(sftp, path).keys()
             else:
-                url_info = parse_url(source['parts'][0])
-                source['parts'][0] = url_info['path']
-            assert action_download(url_info=url_info,
-                                   source=source,
-                                   target=target), f"Download {source} fail!"
-        elif action == "board_link":
-            assert action_board_link(device, source, target), f"Link {source} on board fail!"
-        elif action == "board_move":
-            assert action_board_move(device, source, target), f"Move {source} on board fail!"
-        elif action == "board_copy":
-            assert action_board_copy(device, source, target), f"Copy {source} on board fail!"
-        elif action == "board_nfs":
-            assert action_board_nfs(device, source, target), f"mount nfs dir {source} to {target} on board fail!"
-        elif action == "extract":
-            assert action_extract(source, target), f"Extract {source} fail!"
-        elif action == "move":
-            assert action_move(source, target), f"Move {source} fail!"
-        elif action == "rename":
-            assert action_rename(source, target), f"Rename {source} fail!"
-        elif action == "copy":
-            assert action_copy(source, target), f"Copy {source} fail!"
-        elif action == "delete":
-            assert action_delete(source), f"Delete {source} fail!"
-        else:   # TODO:其他action待补充
-            assert False, f'Read ops fail: Unknown Action "{action}"'
-    return True
+                names = [os.path.basename(path)]
+        finally:
+            sftp.close()
+    except paramiko.SSHException as e:
+        logging.warning(f'List \"{source}\" fail | {e}')
+        if unreachable is not None:
+            unreachable.add(url_info['hostname'])
+        return None
+    except Exception as e:
+        logging.warning(f'List \"{source}\" fail | {e}')
+        return None
+    return set(), {os.path.normpath(os.path.join(target, name)).replace("\\", "/") for name in names}
+
+
+def prefetch_env_files(env_files, config):
+    """
+    会话开始时规划所有模块的环境准备: 相同的下载只执行一次, 与其他模块不冲突的主机端action
+    在后台提前执行(见utils.prefetch), 各模块的read_env_file只需等待自己的部分
+    """
+    print_function()
+    modules = {}
+    for env_file in env_files:
+        try:
+            modules[env_file] = load_env_config(env_file, config)
+        except Exception as e:
+            logging.warning(f'Prefetch: skip \"{env_file}\" | {e}')
+    os.makedirs(config.getoption("--host_ws").replace("\\", "/"), exist_ok=True)
+    start_prefetch(modules,
+                   run_action=lambda env_op: run_env_action(env_op, config, None),
+                   path_map=env_path_map(config),
+                   resolve=partial(resolve_download_paths, unreachable=set()),
+                   workers=config.getoption("--prefetch_workers"))
+
+
+def read_env_file(env_file, request, device):
+    """
+    解析和处理env_file文件中的测试环境配置
+
+    Logic:
+    1. 读取env_file文件, 跳过被选中的用例不需要的action(for_markers);
+    2. 替换动态配置, "${}";
+    3. 正则路径处理, "<>";
+    4. 根据source/target路径(以及可选的id/depends_on)推导action之间的依赖关系;
+    5. 跳过上次运行已准备好且产物未变化的action(host_ws下的stamp);
+    6. 无依赖的主机端action并发执行, 板端action按顺序串行执行, 连续的板端action合并执行;
+    7. 已在后台预取的action只等待其完成, 预取失败时重新执行;
+    8. 全部成功后更新stamp
+
+    :return List[dict]: 每个action的耗时
+    """
+    print_function()
+    env_config, deps = load_env_config(env_file, request.config)
+    prefetched = {id(env_config[i]): future for i, future in get_prefetched(env_file).items()}
+
+    # 连续的板端action合并为一条脚本, 一次往返执行
+    if not request.config.getoption("--no_board_batch"):
+        env_config, deps = batch_board_actions(env_config, deps)
+
+    def run_action(env_op):
+        future = prefetched.get(id(env_op))
+        if future is not None:
+            try:
+                future.result()
+                logging.info(f'{env_op["desc"]}: prefetched')
+                return
+            except Exception as e:
+                logging.warning(f'{env_op["desc"]}: prefetch fail, run again | {e}')
+        run_env_action(env_op, request.config, device)
+
+    # 按照依赖关系执行action
+    timings = run_graph(env_config,
+                        run_action=run_action,
+                        deps=deps,
+                        workers=request.config.getoption("--env_workers"))
+    save_env_stamp(env_file, request.config)
+    return timings
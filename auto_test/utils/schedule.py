@@ -0,0 +1,162 @@
+import os
+import glob
+import logging
+import statistics
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional, Tuple
+
+import pytest
+
+from utils.history import RuntimeHistory, case_id
+
+
+def _junit_key(nodeid: str) -> str:
+    """classname::name of a node id, as written by --junit-xml"""
+    parts = nodeid.split("::")
+    path = parts[0][:-3] if parts[0].endswith(".py") else parts[0]
+    return "::".join([".".join([path.replace("/", ".")] + parts[1:-1]), parts[-1]])
+
+
+def junit_durations(reports_dir: str) -> Dict[str, float]:
+    """
+    Median duration of each case in the junit xml files of the previous runs
+
+    :return Dict[str, float]: {"classname::name": seconds}
+    """
+    samples = {}
+    for path in glob.glob(os.path.join(reports_dir, "*.xml")):
+        try:
+            root = ET.parse(path).getroot()
+        except (OSError, ET.ParseError) as e:
+            logging.warning(f'Schedule: skip \"{path}\" | {e}')
+            continue
+        for case in root.iter("testcase"):
+            if case.find("skipped") is not None or case.get("time") is None:
+                continue
+            key = f'{case.get("classname")}::{case.get("name")}'
+            samples.setdefault(key, []).append(float(case.get("time")))
+    return {key: statistics.median(values) for key, values in samples.items()}
+
+
+def lpt_plan(jobs: Dict[str, float], boards: int) -> List[Tuple[float, List[str]]]:
+    """
+    Longest processing time first: each job, longest first, goes to the board which is free first
+
+    :param Dict[str, float] jobs: {job: seconds}
+    :param int boards: number of boards
+
+    :return List[Tuple[float, List[str]]]: (busy seconds, jobs in order) of each board
+    """
+    plan = [(0.0, []) for _ in range(max(1, boards))]
+    for job in sorted(jobs, key=lambda j: jobs[j], reverse=True):
+        board = min(range(len(plan)), key=lambda b: plan[b][0])
+        plan[board] = (plan[board][0] + jobs[job], plan[board][1] + [job])
+    return plan
+
+
+class LPTScheduler:
+    """
+    Order the test modules to minimise the makespan over the boards (pytest plugin, see conftest.py)
+
+    A job is a test module (its cases share prepare_ws and keep their order, e.g. from pytest-ordering)
+    or a chain of modules tied by the `after` marker: `pytest.mark.after("test_vc_ut")` on the cases of
+    a module runs it after the module test_vc_ut, on the same board. The estimated duration of a case
+    is the median of its recent runs in the runtime history, else in the junit xml of the previous runs,
+    else its YAML runtime. Jobs are ordered longest first, so the free board always takes the
+    longest remaining job. With several boards each job is an xdist_group (--dist loadgroup).
+    """
+    def __init__(self, boards: int = 1, history: Optional[RuntimeHistory] = None, reports_dir: str = None):
+        """
+        :param int boards: number of boards running at once
+        :param RuntimeHistory history: runtime history of the previous runs
+        :param str reports_dir: directory of the junit xml of the previous runs
+        """
+        self.boards = boards
+        self.estimates = history.estimates() if history else {}
+        self.junit = junit_durations(reports_dir) if reports_dir and os.path.isdir(reports_dir) else {}
+
+    def estimate(self, item: pytest.Item) -> float:
+        if case_id(item) in self.estimates:
+            return self.estimates[case_id(item)]
+        if _junit_key(case_id(item)) in self.junit:
+            return self.junit[_junit_key(case_id(item))]
+        callspec = getattr(item, "callspec", None)
+        runtime = callspec.params.get("runtime") if callspec else None
+        return float(runtime) if isinstance(runtime, (int, float)) else 0.0
+
+    @staticmethod
+    def _module(item: pytest.Item) -> str:
+        return item.nodeid.split("::")[0]
+
+    def _group(self, items: List[pytest.Item]) -> Tuple[Dict[str, str], Dict[str, List[str]]]:
+        """
+        Tie the modules chained by the `after` marker into jobs
+
+        :return Tuple[Dict[str, str], Dict[str, List[str]]]: ({module: job}, {module: modules it runs after})
+        """
+        modules = list(dict.fromkeys(self._module(item) for item in items))
+        names = {}      # test_xxx and xxx -> module
+        for module in modules:
+            name = os.path.splitext(os.path.basename(module))[0]
+            names[name] = names[name[5:] if name.startswith("test_") else name] = module
+        parent = {module: module for module in modules}
+        after = {module: [] for module in modules}
+
+        def root(module):
+            while parent[module] != module:
+                module = parent[module]
+            return module
+
+        for item in items:
+            for mark in item.iter_markers("after"):
+                for name in mark.args:
+                    assert name in names, f'{item.nodeid}: unknown module \"{name}\" in after marker'
+                    if names[name] not in after[self._module(item)]:
+                        after[self._module(item)].append(names[name])
+                    a, b = root(self._module(item)), root(names[name])
+                    if a != b:
+                        parent[a] = b
+        return {module: root(module) for module in modules}, after
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_collection_modifyitems(self, session, config, items):
+        """Before xdist reads them: one xdist_group per job, the boards run whole jobs"""
+        if getattr(config.option, "dist", "no") == "loadgroup" or getattr(config.option, "loadgroup", False):
+            jobs, _ = self._group(items)
+            for item in items:
+                item.add_marker(pytest.mark.xdist_group(name=jobs[self._module(item)]))
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_collection_finish(self, session):
+        """After the other plugins ordered the cases: order the jobs, longest first"""
+        items = session.items
+        if not items:
+            return
+        jobs, after = self._group(items)
+        durations = {}
+        for item in items:
+            job = jobs[self._module(item)]
+            durations[job] = durations.get(job, 0) + self.estimate(item)
+
+        # inside a job the modules run after the modules of their `after` marker, in collection order otherwise
+        topo = []
+
+        def visit(module, path):
+            assert module not in path, f'Cycle in after markers: {" -> ".join(path + [module])}'
+            if module not in topo:
+                for other in after[module]:
+                    visit(other, path + [module])
+                topo.append(module)
+
+        for module in after:
+            visit(module, [])
+
+        plan = lpt_plan(durations, self.boards)
+        rank = {job: n for n, job in enumerate(sorted(durations, key=lambda j: durations[j], reverse=True))}
+        position = {id(item): n for n, item in enumerate(items)}
+        items.sort(key=lambda item: (rank[jobs[self._module(item)]], topo.index(self._module(item)), position[id(item)]))
+
+        label = {job: "+".join(os.path.basename(m) for m in topo if jobs[m] == job) for job in durations}
+        report = "\n".join(f" - board {n}: {busy:.0f}s, {', '.join(label[job] for job in board_jobs)}"
+                           for n, (busy, board_jobs) in enumerate(plan))
+        logging.info(f"LPT schedule on {self.boards} board(s), makespan {max(p[0] for p in plan):.0f}s:\n{report}")
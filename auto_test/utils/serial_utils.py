@@ -1,9 +1,14 @@
 import re
 import time
-from typing import Union, Tuple, List
+import threading
+from collections import deque
+from typing import Union, Tuple, List, Callable, Optional
 import logging
 import serial
 from serial.tools import list_ports
+from utils.common_func import add_sentinel
+from utils.expect import ExpectBuffer, StreamDecoder, ECHO_END, verdict_patterns
+from utils.capture import SpoolWriter, SpooledLog, findall
 
 
 SEIRAL_STATUS = {
@@ -35,14 +40,15 @@ def init_serial(ser_port: str) -> serial.Serial:
     return False
 
 
-def send_break_signal_serial(ser: serial.Serial):
+def send_break_signal_serial(ser: serial.Serial, reason: str = 'Timeout'):
     """
     Send CTRL+C to Serial.
 
     :param serial.Serial ser: the serial object
+    :param str reason: why the command is interrupted
     """
     try:
-        logging.warning('Timeout')
+        logging.warning(reason)
         ser.write(b'\x03')
         ser.write(b'\x03')
         time.sleep(0.5)
@@ -51,28 +57,186 @@ def send_break_signal_serial(ser: serial.Serial):
         logging.error(f'send CTRL+C to \"{ser.port}\": fail! {e}')
 
 
-def raw_to_string(raw_data):
-    try:
-        # 0. UTF-8 decode
-        decoded = raw_data.decode('utf-8', errors='replace')
-    except UnicodeDecodeError:
-        # 1. GBK decode
-        decoded = raw_data.decode('gbk', errors='replace')
-
-    # 2. replace \r\n with \n, replace \r with \n
-    cleaned = decoded.replace('\r\n', '\n')
-
-    # 3. remove ANSI escape code
-    ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-    chunk_threshold = 100000
-    if len(cleaned) <= chunk_threshold:
-        # case 1: small data
-        return ansi_escape.sub('', cleaned)
-    else:
-        # case 2: large data
-        chunks = [cleaned[i:i + 50000] for i in range(0, len(cleaned), 50000)]
-        result_chunks = [ansi_escape.sub('', chunk) for chunk in chunks]
-        return ''.join(result_chunks)
+class SerialReader:
+    """
+    Session-level reader thread of Serial object.
+
+    Drains the port continuously into a timestamped ring buffer, so console output between commands
+    (kernel messages, async test output, watchdog resets) is kept. Command execution consumes from
+    the ring buffer by offset and is woken up as soon as data arrives.
+    """
+    coalesce_bytes = 4096     # small reads are appended to the last chunk up to this size
+    coalesce_time = 0.05      # if it is not older than this (seconds), for window()
+
+    def __init__(self, ser: serial.Serial, max_bytes: int = 16 * 1024 * 1024):
+        """
+        :param serial.Serial ser: the serial object
+        :param int max_bytes: size of the ring buffer, the oldest chunks are dropped
+        """
+        self.ser = ser
+        self.max_bytes = max_bytes
+        self._chunks = deque()      # (timestamp, offset, data)
+        self._size = 0
+        self._start = 0             # offset of the first byte in the ring buffer
+        self._end = 0               # offset after the last byte
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f"serial-reader-{ser.port}")
+
+    def start(self) -> "SerialReader":
+        self._thread.start()
+        logging.info(f'Serial reader: start draining \"{self.ser.port}\"')
+        return self
+
+    def stop(self):
+        self._stop.set()
+        try:
+            self.ser.cancel_read()
+        except Exception:
+            pass
+        self._thread.join(timeout=2)
+
+    @property
+    def alive(self) -> bool:
+        return self._thread.is_alive()
+
+    @property
+    def offset(self) -> int:
+        """Offset after the last received byte"""
+        with self._cond:
+            return self._end
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                # block until at least one byte arrives, then take everything available
+                data = self.ser.read(max(1, self.ser.in_waiting))
+            except Exception as e:
+                if not self._stop.is_set():
+                    logging.error(f'Serial reader: \"{self.ser.port}\" read fail | {e}')
+                break
+            if data:
+                self._append(data)
+        with self._cond:
+            self._cond.notify_all()
+
+    def _append(self, data: bytes):
+        with self._cond:
+            now = time.time()
+            # at serial speed a read returns a few bytes, coalesce them to keep the number of chunks low
+            if self._chunks and len(self._chunks[-1][2]) + len(data) <= self.coalesce_bytes \
+                    and now - self._chunks[-1][0] <= self.coalesce_time:
+                ts, chunk_offset, last = self._chunks.pop()
+                self._chunks.append((ts, chunk_offset, last + data))
+            else:
+                self._chunks.append((now, self._end, data))
+            self._end += len(data)
+            self._size += len(data)
+            while self._size > self.max_bytes and len(self._chunks) > 1:
+                _, _, dropped = self._chunks.popleft()
+                self._size -= len(dropped)
+                self._start += len(dropped)
+            self._cond.notify_all()
+
+    def read_from(self, offset: int, wait: float) -> Tuple[bytes, int]:
+        """
+        Read the bytes received after offset
+
+        :param int offset: offset returned by the previous call (or self.offset)
+        :param float wait: maximum waiting time if there is no new data
+
+        :return Tuple[bytes, int]: (data, new offset)
+        """
+        with self._cond:
+            if offset >= self._end and self.alive:
+                self._cond.wait(wait)
+            if offset < self._start:
+                logging.warning(f'Serial reader: {self._start - offset} bytes dropped from ring buffer')
+                offset = self._start
+            # the new data is at the end of the ring buffer, walk back to offset only
+            parts = []
+            for _, chunk_offset, data in reversed(self._chunks):
+                if chunk_offset + len(data) <= offset:
+                    break
+                parts.append(data[max(0, offset - chunk_offset):])
+            parts.reverse()
+            return b''.join(parts), self._end
+
+    def window(self, start_time: float, end_time: float = None) -> bytes:
+        """
+        Get the bytes received in a time window, e.g. the duration of a test
+
+        :param float start_time: time.time() of the window start
+        :param float end_time: time.time() of the window end, now by default
+        """
+        end_time = end_time or time.time()
+        with self._cond:
+            return b''.join(data for ts, _, data in self._chunks if start_time <= ts <= end_time)
+
+    def reader(self) -> Callable[[float], bytes]:
+        """Create read(wait) function for ExpectBuffer which starts from the current offset"""
+        position = [self.offset]
+
+        def read(wait: float) -> bytes:
+            data, position[0] = self.read_from(position[0], wait)
+            return data
+        return read
+
+
+_SERIAL_READERS = {}
+
+
+def start_serial_reader(ser: serial.Serial) -> SerialReader:
+    """
+    Start the session-level reader thread of Serial object, ser_run_cmd will consume from it
+
+    :param serial.Serial ser: the serial object
+    """
+    if ser not in _SERIAL_READERS or not _SERIAL_READERS[ser].alive:
+        _SERIAL_READERS[ser] = SerialReader(ser).start()
+    return _SERIAL_READERS[ser]
+
+
+def get_serial_reader(ser: serial.Serial) -> Optional[SerialReader]:
+    """Get the running reader thread of Serial object"""
+    reader = _SERIAL_READERS.get(ser)
+    return reader if reader and reader.alive else None
+
+
+def stop_serial_reader(ser: serial.Serial):
+    """Stop the reader thread of Serial object"""
+    reader = _SERIAL_READERS.pop(ser, None)
+    if reader:
+        reader.stop()
+
+
+def serial_reader(ser: serial.Serial) -> Callable[[float], bytes]:
+    """
+    Create read(wait) function of Serial object for ExpectBuffer
+
+    :param serial.Serial ser: the serial object
+    """
+    session_reader = get_serial_reader(ser)
+    if session_reader:
+        return session_reader.reader()
+
+    def read(wait: float) -> bytes:
+        deadline = time.time() + wait
+        while ser.in_waiting <= 0:
+            if time.time() >= deadline:
+                return b''
+            time.sleep(0.01)
+        return ser.read(min(ser.in_waiting, 8192))
+    return read
+
+
+def raw_to_string(raw_data: bytes) -> str:
+    """
+    Decode the whole raw output at once, see StreamDecoder for streams
+
+    :param bytes raw_data: raw bytes read from serial
+    """
+    return StreamDecoder().decode(raw_data, final=True)
 
 
 def ser_run_cmd(
@@ -81,7 +245,12 @@ def ser_run_cmd(
         timeout: int = 5,
         ret_regex: Union[str, re.Pattern] = None,
         echo: bool = True,
-        prompt_cmd: str = r"\[root@cvitek\][^\#]+\#") -> Tuple[str, int, list]:
+        prompt_cmd: str = r"\[root@cvitek\][^\#]+\#",
+        sentinel: bool = False,
+        fail_res: List[Union[str, re.Pattern]] = None,
+        verdict_grace: int = 10,
+        spool: SpoolWriter = None,
+        interruptible: bool = None) -> Tuple[str, int, list]:
     """
     Executes the command on Serial object, and handles output reading.
 
@@ -91,19 +260,37 @@ def ser_run_cmd(
     :param Union[str, re.Pattern] ret_regex: Regular expressions used to extract the output
     :param bool echo: whether read log
     :param str prompt_cmd: Command line prompt.
-
-    :return Tuple[str, int, list]: (log, ret_code, ret)
+    :param bool sentinel: wrap the command with an end marker, return as soon as the marker arrives
+        and use the shell exit status as ret_code (1 if the marker never arrives).
+    :param List[Union[str, re.Pattern]] fail_res: declared failure patterns, if not None the case is decided
+        on the live stream: ret_regex (pass) or fail_res (fail) stops reading the moment it appears.
+    :param int verdict_grace: seconds to wait for the prompt after the pass verdict before sending CTRL+C
+    :param SpoolWriter spool: write the raw output to a spool file instead of keeping it in memory,
+        log is returned as a lazy SpooledLog handle
+    :param bool interruptible: send CTRL+C when the command times out, by default if it runs a program ("./...")
+
+    :return Tuple[Union[str, SpooledLog], int, list]: (log, ret_code, ret)
     """
+    if interruptible is None:
+        interruptible = cmd.strip().startswith("./")
     # init result variables
     log = ""
-    ret_code = 0    # 0: success; 1: fail(contains timeout)
+    ret_code = 0    # 0: success; 1: fail(contains timeout); exit status in sentinel mode
     ret = []
 
-    # clear buffer
-    ser.reset_input_buffer()
+    # clear buffer, the session reader (if any) keeps the output between commands instead
+    if not get_serial_reader(ser):
+        ser.reset_input_buffer()
     ser.reset_output_buffer()
+    # take the read position before sending, so the echo is never missed
+    read = serial_reader(ser)
 
-    cmd_bytes = (cmd.strip() + '\r').encode('utf-8')
+    end_regex = None
+    if sentinel and echo:
+        send_cmd, end_regex = add_sentinel(cmd)
+    else:
+        send_cmd = cmd.strip()
+    cmd_bytes = (send_cmd + '\r').encode('utf-8')
     start_time = time.time()
 
     ser.write(cmd_bytes)
@@ -112,62 +299,78 @@ def ser_run_cmd(
 
     if echo:
         # init temp variables
-        full_output = []
+        buf = ExpectBuffer(spool=spool)
         is_timeout = False
         check_time = min(20, timeout)
-        time.sleep(0.2)
-
-        while True:
-            no_data_count = 0       # change waittime for log dynamically
-            max_no_data_count = 10
-            while no_data_count < max_no_data_count:
-                if time.time() - start_time > timeout:
-                    break
-
-                while ser.in_waiting > 0:
-                    chrunk_size = min(ser.in_waiting, 8192)
-                    raw_data = ser.read(chrunk_size)
+        prompt_regex = re.compile(prompt_cmd) if prompt_cmd else None
+        patterns, pass_count = verdict_patterns(ret_regex, fail_res) if fail_res is not None else ([], 0)
+        verdict = None
+        echo_done = None
+
+        if end_regex:
+            # sentinel mode: no prompt guessing, wait for marker until timeout
+            _, end_match = buf.wait(read, [end_regex], timeout, on_data=lambda x: print(x, end=""))
+            if end_match:
+                ret_code = int(end_match.group(1))
+            else:
+                is_timeout = True
+        else:
+            last_data_time = start_time
+            while True:
+                raw_data = buf.pump(read, 0.05)
+                now = time.time()
+                if raw_data:
                     print(raw_data, end="")
-                    full_output.append(raw_data)
-                    no_data_count = 0
-
-                no_data_count += 1
-                time.sleep(0.05)
-
-            if full_output:
-                # check prompt_cmd
-                # prompt_cmd: str = r"\[root@cvitek\][^\#]+\#"
-                if len(full_output) > 3:
-                    raw_data = b''.join(full_output[-3:])
-                else:
-                    raw_data = b''.join(full_output[:])
-                last_output = raw_to_string(raw_data)
+                    last_data_time = now
+                spend_time = now - start_time
+
+                # early verdict: the case is decided the moment its pass/fail text appears,
+                # the echoed command line is skipped
+                if patterns and not echo_done:
+                    _, echo_done = buf.expect([ECHO_END])
+                if patterns and echo_done:
+                    index, verdict = buf.expect(patterns)
+                    if verdict:
+                        passed = index < pass_count
+                        break
 
                 # case 1: timeout and check
-                spend_time = time.time() - start_time
+                # prompt_cmd: str = r"\[root@cvitek\][^\#]+\#"
                 if spend_time > timeout:
-                    if prompt_cmd and last_output and re.search(prompt_cmd, last_output):
-                        is_timeout = False
-                    else:
-                        is_timeout = True
+                    is_timeout = not (prompt_regex and buf.search_tail(prompt_regex))
                     break
 
-                # case 2: execute at least 20s and check
-                if spend_time > check_time:
-                    if last_output and re.search(prompt_cmd, last_output):
+                # case 2: execute at least 20s, no data for a while and check
+                if spend_time > check_time and now - last_data_time > 0.5:
+                    if prompt_regex and buf.search_tail(prompt_regex):
                         break
 
-        raw_data = b''.join(full_output[:])
-        log = raw_to_string(raw_data)
-        logging.info(log.encode('utf-8', errors='replace').decode('utf-8', errors='replace'))
+        if verdict:
+            logging.info(f'Serial cmd: verdict \"{verdict.group(0)}\" ({"PASS" if passed else "FAIL"}) '
+                         f'in {time.time()-start_time:.2f}s')
+            if not passed:
+                send_break_signal_serial(ser, reason='Fail verdict')
+            grace = verdict_grace if passed else 2
+            _, prompt_match = buf.wait(read, [prompt_regex], grace) if prompt_regex else (-1, None)
+            if passed and not prompt_match:
+                send_break_signal_serial(ser, reason='No prompt after pass verdict')
+
+        log = buf.finish()
+        if isinstance(log, SpooledLog):
+            logging.info(f'Serial cmd: {log.size} bytes spooled to \"{log.path}\", tail:')
+            logging.info(log.tail)
+        else:
+            if end_regex:
+                log = end_regex.sub('', log)
+            logging.info(log.encode('utf-8', errors='replace').decode('utf-8', errors='replace'))
 
         if ret_regex:
-            if type(ret_regex) == str:
-                ret = re.findall(ret_regex, log)
-            else:
-                ret = ret_regex.findall(log)
+            ret = findall(ret_regex, log)
 
-        if is_timeout and cmd.strip().startswith("./"):
+        if is_timeout and end_regex:
+            ret_code = 1
+            send_break_signal_serial(ser)
+        elif is_timeout and interruptible:
             ret_code = 1
             send_break_signal_serial(ser)
 
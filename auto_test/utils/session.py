@@ -0,0 +1,176 @@
+import re
+import shlex
+import logging
+from typing import Dict, List, Optional, Tuple, Union
+
+import paramiko
+import serial
+
+from utils.ssh_utils import SSHExecutor
+
+# commands of the cases which change the state cached by DeviceSession
+_CWD_REGEX = re.compile(r"(^|[\s;&|(])(cd|pushd|popd)(\s|;|$)")
+_MOUNT_REGEX = re.compile(r"(^|[\s;&|(])u?mount(\s|;|$)")
+_ENV_REGEX = re.compile(r"(^|[\s;&|(])(export|unset|source|\.)\s")
+_REBOOT_REGEX = re.compile(r"(^|[\s;&|(])(reboot|poweroff)(\s|;|$)")
+
+
+class DeviceSession:
+    """
+    Device client (serial.Serial / SSHExecutor / paramiko.Channel, None for the host) with the shell
+    state it is known to be in: working directory, mounts and exported variables.
+
+    run_cmd() accepts a DeviceSession as client. The working directory of the cases (see set_workdir)
+    is prefixed inline to the command when the shell may be elsewhere, instead of a separate
+    "cd" round trip before every case. Housekeeping commands whose effect is already in place
+    (cd, mount, export) are not sent. The commands sent through the session are scanned for
+    cd/mount/export/reboot, which make the cached state unknown again.
+    """
+    def __init__(self, client: Union[SSHExecutor, paramiko.Channel, serial.Serial, None]):
+        self.client = client
+        # the shell of serial/ssh clients keeps its state between commands, host commands do not
+        self.stateful = type(client) in (SSHExecutor, paramiko.Channel, serial.Serial)
+        self.workdir = None     # directory the commands run in, None to leave the shell where it is
+        self.cwd = None         # None if unknown
+        self.mounts = None      # {mount point: source}, None if unknown
+        self.env = {}           # variables exported by export()
+
+    def __str__(self):
+        return f"DeviceSession({self.client})"
+
+    def reset(self):
+        """Forget the cached state, e.g. after reboot"""
+        self.cwd = None
+        self.mounts = None
+        self.env = {}
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+
+    def set_workdir(self, path: Optional[str]):
+        """Run the next commands in path (sent with the next command if needed, not right now)"""
+        self.workdir = path
+
+    def _prefix(self) -> str:
+        parts = []
+        if self.workdir and (not self.stateful or self.cwd != self.workdir):
+            parts.append(f"cd {self.workdir}")
+        if not self.stateful:
+            parts += [f"export {k}={shlex.quote(v)}" for k, v in self.env.items()]
+        return " && ".join(parts + [""]) if parts else ""
+
+    def _observe(self, cmd: str, prefix: str, ret_code: int):
+        """Update the cached state after cmd (without the prefix) was run"""
+        if _REBOOT_REGEX.search(cmd):
+            self.reset()
+            return
+        if self.stateful and prefix.startswith("cd "):
+            # "cd <workdir> && cmd": cmd ran (ret_code 0) only if the cd succeeded,
+            # a failed or timed out command leaves the shell in an unknown directory
+            self.cwd = self.workdir if ret_code == 0 else None
+        if _CWD_REGEX.search(cmd):
+            self.cwd = None
+        if _MOUNT_REGEX.search(cmd):
+            self.mounts = None
+        if _ENV_REGEX.search(cmd):
+            self.env = {}
+
+    def _send(self, cmd: str, prefix: str = "", **kwargs) -> Tuple[str, int, list]:
+        from utils.cmd import run_cmd    # utils.cmd dispatches DeviceSession to run()
+        # the transports decide from the command itself whether to interrupt it on timeout, not from the prefix
+        if kwargs.get("interruptible") is None:
+            kwargs["interruptible"] = cmd.strip().startswith("./")
+        log, ret_code, ret = run_cmd(client=self.client, cmd=prefix + cmd, **kwargs)
+        self._observe(cmd, prefix, ret_code)
+        return log, ret_code, ret
+
+    def run(self,
+            cmd: str,
+            timeout: int = 5,
+            ret_regex: Union[str, re.Pattern] = None,
+            echo: bool = True,
+            sentinel: bool = False,
+            fail_res: List[Union[str, re.Pattern]] = None,
+            interruptible: bool = None) -> Tuple[str, int, list]:
+        """Run cmd in the working directory, see utils.cmd.run_cmd()"""
+        return self._send(cmd,
+                          prefix=self._prefix(),
+                          timeout=timeout,
+                          ret_regex=ret_regex,
+                          echo=echo,
+                          sentinel=sentinel,
+                          fail_res=fail_res,
+                          interruptible=interruptible)
+
+    def chdir(self, path: str) -> bool:
+        """cd to path now, skipped if the shell is known to be there"""
+        if self.stateful and self.cwd == path:
+            return True
+        _, ret_code, _ = self._send(f"cd {path}", timeout=3, sentinel=True)
+        self.cwd = path if self.stateful and ret_code == 0 else None
+        return ret_code == 0
+
+    def export(self, name: str, value: str):
+        """Export a variable, skipped if it already has the value (kept for each command of stateless clients)"""
+        if self.env.get(name) == value:
+            return
+        if self.stateful:
+            self._send(f"export {name}={shlex.quote(value)}", timeout=3, sentinel=True)
+        self.env[name] = value
+
+    def _load_mounts(self) -> Dict[str, str]:
+        if self.mounts is None:
+            # the serial transport only reads the output with echo
+            log, _, _ = self._send("cat /proc/mounts", timeout=3, sentinel=True)
+            self.mounts = {}
+            for line in str(log).splitlines():
+                fields = line.split()
+                # "source mount_point type options 0 0", the echoed command line has other fields
+                if len(fields) == 6 and fields[1].startswith("/"):
+                    self.mounts[fields[1].replace("\\040", " ")] = fields[0].replace("\\040", " ")
+        return self.mounts
+
+    def is_mounted(self, target: str, source: str = None) -> bool:
+        """target is a mount point (of source if given)"""
+        mounts = self._load_mounts()
+        target = target.rstrip("/") or "/"
+        if target not in mounts:
+            return False
+        return source is None or mounts[target].rstrip("/") == source.rstrip("/")
+
+    def mount(self, source: str, target: str, options: str = "") -> bool:
+        """
+        Mount source on target, skipped if already mounted
+
+        :param str options: options of mount, e.g. "-t nfs -o nolock"
+        """
+        if self.is_mounted(target, source):
+            return True
+        mounts = self.mounts
+        cmd = f"mount {options} {source} {target}" if options else f"mount {source} {target}"
+        _, ret_code, _ = self._send(cmd, timeout=30, sentinel=True)
+        if ret_code == 0:
+            mounts[target.rstrip("/") or "/"] = source
+            self.mounts = mounts
+        ok = self.is_mounted(target, source)
+        if not ok:
+            logging.error(f"{self}: mount {source} on {target} fail")
+        return ok
+
+    def umount(self, target: str) -> bool:
+        """Unmount target, leave it first if the shell may be inside"""
+        if not self.is_mounted(target):
+            return True
+        target = target.rstrip("/") or "/"
+        mounts = self.mounts
+        prefix = ""
+        if self.stateful and (self.cwd is None or self.cwd == target or self.cwd.startswith(target + "/")):
+            prefix = "cd ~ && "
+        _, ret_code, _ = self._send(f"umount {target}", prefix=prefix, timeout=30, sentinel=True)
+        if prefix:
+            self.cwd = None
+        if ret_code == 0:
+            mounts.pop(target, None)
+            self.mounts = mounts
+        return not self.is_mounted(target)
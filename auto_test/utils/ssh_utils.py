@@ -1,8 +1,18 @@
 import re
 import time
-from typing import Union, Tuple
+import atexit
+import uuid
+import select
+import shlex
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Union, Tuple, List, Callable
 import logging
 import paramiko
+from utils.common_func import add_sentinel
+from utils.expect import ExpectBuffer, StreamDecoder, ECHO_END, verdict_patterns
+from utils.capture import SpoolWriter, SpooledLog, findall
 
 
 def init_ssh_client(ip: str,
@@ -42,6 +52,132 @@ def init_ssh_client(ip: str,
     return None
 
 
+class SSHPool:
+    """
+    Process-wide pool of authenticated SSH transports keyed by (host, port, user).
+
+    The TCP connection, handshake and password authentication are paid once per server, SFTP and
+    exec channels are opened on the leased transport. Transports are health-checked on every lease
+    (and reconnected if dead), and closed after being idle for idle_timeout seconds. A transport is
+    never idle while it is held (client(hold=True) until release(), e.g. the device SSHExecutor)
+    or while an SFTP session opened by open_sftp() is still open.
+
+    Example:
+        sftp = ssh_pool.open_sftp(ip, user, pwd)
+        sftp.get(remote, local)
+        sftp.close()    # closes the channel only, the transport stays in the pool
+    """
+    def __init__(self, keepalive: int = 20, idle_timeout: int = 300):
+        """
+        :param int keepalive: keepalive interval (seconds) of the transports
+        :param int idle_timeout: close the transports which are not used for such seconds
+        """
+        self.keepalive = keepalive
+        self.idle_timeout = idle_timeout
+        self._clients = {}      # (host, port, user) -> {"client", "last_used", "holds", "sftp": SFTP sessions}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _alive(ssh_client: paramiko.SSHClient) -> bool:
+        transport = ssh_client.get_transport()
+        if not transport or not transport.is_active():
+            return False
+        try:
+            transport.send_ignore()
+            return True
+        except Exception:
+            return False
+
+    def _entry(self, ip: str, user: str, pwd: str, port: int) -> dict:
+        key = (ip, port, user)
+        with self._lock:
+            self.evict_idle()
+            entry = self._clients.get(key)
+            if entry and not self._alive(entry["client"]):
+                # the holders keep the dead client, they lease again (see SSHExecutor)
+                logging.warning(f'SSHPool: \"{ip}:{port}\" transport is dead, reconnect')
+                entry["client"].close()
+                entry = None
+            if not entry:
+                ssh_client = init_ssh_client(ip=ip, user=user, pwd=pwd, port=port)
+                if not ssh_client:
+                    return None
+                ssh_client.get_transport().set_keepalive(self.keepalive)
+                entry = self._clients[key] = {"client": ssh_client, "last_used": 0, "holds": 0,
+                                              "sftp": weakref.WeakSet()}
+            entry["last_used"] = time.time()
+            return entry
+
+    def client(self, ip: str, user: str, pwd: str, port: int = 22, hold: bool = False) -> paramiko.SSHClient:
+        """
+        Lease the authenticated SSHClient of the server, connect if there is no healthy one
+
+        :param str ip: the server to connect to
+        :param str user: the username to authenticate as
+        :param str pwd: used for password authentication
+        :param int port: the server port to connect to
+        :param bool hold: keep the transport open until release(), for long-lived users (e.g. the device)
+        """
+        with self._lock:
+            entry = self._entry(ip, user, pwd, port)
+            if not entry:
+                return None
+            if hold:
+                entry["holds"] += 1
+            return entry["client"]
+
+    def release(self, ssh_client: paramiko.SSHClient):
+        """Release a client leased with hold=True, it is closed once idle"""
+        with self._lock:
+            for entry in self._clients.values():
+                if entry["client"] is ssh_client and entry["holds"] > 0:
+                    entry["holds"] -= 1
+                    entry["last_used"] = time.time()
+
+    def open_sftp(self, ip: str, user: str, pwd: str, port: int = 22) -> paramiko.SFTPClient:
+        """Open a new SFTP session on the pooled transport (kept open while the session is), see client()"""
+        with self._lock:
+            entry = self._entry(ip, user, pwd, port)
+            if not entry:
+                raise paramiko.SSHException(f'SSHPool: \"{ip}:{port}\" connect fail')
+            sftp = entry["client"].open_sftp()
+            entry["sftp"].add(sftp)
+            return sftp
+
+    @staticmethod
+    def _in_use(entry: dict) -> bool:
+        return entry["holds"] > 0 or any(not sftp.get_channel().closed for sftp in list(entry["sftp"]))
+
+    def discard(self, ip: str, user: str, port: int = 22):
+        """Close the transport of the server, e.g. after a failed transfer, the next lease reconnects"""
+        with self._lock:
+            entry = self._clients.pop((ip, port, user), None)
+        if entry:
+            entry["client"].close()
+
+    def evict_idle(self):
+        """Close the transports which are not in use and idle for more than idle_timeout seconds"""
+        now = time.time()
+        with self._lock:
+            for key, entry in list(self._clients.items()):
+                if self._in_use(entry):
+                    entry["last_used"] = now
+                elif now - entry["last_used"] > self.idle_timeout:
+                    logging.info(f'SSHPool: close idle transport \"{key[0]}:{key[1]}\"')
+                    entry["client"].close()
+                    del self._clients[key]
+
+    def close_all(self):
+        with self._lock:
+            for entry in self._clients.values():
+                entry["client"].close()
+            self._clients.clear()
+
+
+ssh_pool = SSHPool()
+atexit.register(ssh_pool.close_all)
+
+
 def init_ssh_channel(ip: str,
                      user: str,
                      pwd: str,
@@ -55,20 +191,42 @@ def init_ssh_channel(ip: str,
     :param int port: the server port to connect to
     """
     ssh_channel = None
-    ssh_client = init_ssh_client(ip=ip, user=user, pwd=pwd, port=port)
+    ssh_client = ssh_pool.client(ip=ip, user=user, pwd=pwd, port=port, hold=True)
     ssh_channel = ssh_client.invoke_shell()
     ssh_channel.settimeout(30)
     return ssh_channel
 
 
-def send_break_signal_ssh(ssh_channel: paramiko.Channel):
+def init_ssh_executor(ip: str,
+                      user: str,
+                      pwd: str,
+                      port: int = 22) -> "SSHExecutor":
+    """
+    Create an exec-channel transport on the pooled SSH transport of the server.
+
+    :param str ip: the server to connect to
+    :param str user: the username to authenticate as (defaults to the current local username)
+    :param str pwd: used for password authentication
+    :param int port: the server port to connect to
+    """
+    def connect() -> paramiko.SSHClient:
+        return ssh_pool.client(ip=ip, user=user, pwd=pwd, port=port, hold=True)
+
+    ssh_client = connect()
+    if not ssh_client:
+        return None
+    return SSHExecutor(ssh_client, connect=connect)
+
+
+def send_break_signal_ssh(ssh_channel: paramiko.Channel, reason: str = 'Timeout'):
     """
     Send CTRL+C to SSH server.
 
     :param paramiko.Channel ssh_channel: the interactive shell session.
+    :param str reason: why the command is interrupted
     """
     try:
-        logging.warning('Timeout')
+        logging.warning(reason)
         ssh_channel.send('\x03')
         ssh_channel.send('\x03')
         time.sleep(0.5)
@@ -77,19 +235,31 @@ def send_break_signal_ssh(ssh_channel: paramiko.Channel):
         logging.error(f'send CTRL+C to \"{ssh_channel}\": fail! {e}')
 
 
-def raw_to_string(raw_data):
-    ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-    output = ""
-    try:
-        decoded = raw_data.decode('utf-8', errors='replace')
-        output = ansi_escape.sub('', decoded).replace('\r\n', '\n')
-    except UnicodeDecodeError:
-        try:
-            decoded = raw_data.decode('gbk', errors='replace')
-            output = ansi_escape.sub('', decoded).replace('\r\n', '\n')
-        except:
-            output = str(raw_data)
-    return output
+def channel_reader(ssh_channel: paramiko.Channel) -> Callable[[float], bytes]:
+    """
+    Create read(wait) function of SSH channel for ExpectBuffer
+
+    :param paramiko.Channel ssh_channel: the interactive shell session.
+    """
+    def read(wait: float) -> bytes:
+        if not ssh_channel.recv_ready():
+            if ssh_channel.closed:
+                time.sleep(wait)
+                return b''
+            select.select([ssh_channel], [], [], wait)
+        if ssh_channel.recv_ready():
+            return ssh_channel.recv(4096)
+        return b''
+    return read
+
+
+def raw_to_string(raw_data: bytes) -> str:
+    """
+    Decode the whole raw output at once, see StreamDecoder for streams
+
+    :param bytes raw_data: raw bytes read from ssh channel
+    """
+    return StreamDecoder().decode(raw_data, final=True)
 
 
 def ssh_run_cmd(ssh_channel: paramiko.Channel,
@@ -97,7 +267,12 @@ def ssh_run_cmd(ssh_channel: paramiko.Channel,
                 timeout: int = 5,
                 ret_regex: Union[str, re.Pattern] = None,
                 echo=True,
-                prompt_cmd: str = r"\[root@cvitek\][^\#]+\#") -> Tuple[str, int, list]:
+                prompt_cmd: str = r"\[root@cvitek\][^\#]+\#",
+                sentinel: bool = False,
+                fail_res: List[Union[str, re.Pattern]] = None,
+                verdict_grace: int = 10,
+                spool: SpoolWriter = None,
+                interruptible: bool = None) -> Tuple[str, int, list]:
     """
     Executes the command on SSH server, and handles output reading.
 
@@ -107,23 +282,41 @@ def ssh_run_cmd(ssh_channel: paramiko.Channel,
     :param Union[str, re.Pattern] ret_regex: Regular expressions used to extract the output
     :param bool echo: whether read log
     :param str prompt_cmd: Command line prompt.
+    :param bool sentinel: wrap the command with an end marker, return as soon as the marker arrives
+        and use the shell exit status as ret_code (1 if the marker never arrives).
+    :param List[Union[str, re.Pattern]] fail_res: declared failure patterns, if not None the case is decided
+        on the live stream: ret_regex (pass) or fail_res (fail) stops reading the moment it appears.
+    :param int verdict_grace: seconds to wait for the prompt after the pass verdict before sending CTRL+C
+    :param SpoolWriter spool: write the raw output to a spool file instead of keeping it in memory,
+        log is returned as a lazy SpooledLog handle
+    :param bool interruptible: send CTRL+C when the command times out, by default if it runs a program ("./...")
 
-    :return Tuple[str, int, list]: (log, ret_code, ret)
+    :return Tuple[Union[str, SpooledLog], int, list]: (log, ret_code, ret)
     """
+    if interruptible is None:
+        interruptible = cmd.strip().startswith("./")
     # init result variables
     log = ""
-    ret_code = 0    # 0: success; 1: fail(include timeout)
+    ret_code = 0    # 0: success; 1: fail(include timeout); exit status in sentinel mode
     ret = []
 
     # init temp variables
-    full_output = []
+    buf = ExpectBuffer(spool=spool)
+    read = channel_reader(ssh_channel)
     is_timeout = False
     check_time = min(20, timeout)
+    prompt_regex = re.compile(prompt_cmd) if prompt_cmd else None
+    patterns, pass_count = verdict_patterns(ret_regex, fail_res) if fail_res is not None else ([], 0)
+    verdict = None
+    echo_done = None
 
     # clear buffer
     while ssh_channel.recv_ready():
         ssh_channel.recv(1024)
 
+    end_regex = None
+    if sentinel and echo:
+        cmd, end_regex = add_sentinel(cmd)
     cmd = cmd.strip() if cmd.strip().endswith("\n") else cmd.strip() + '\n'
     start_time = time.time()
 
@@ -131,40 +324,66 @@ def ssh_run_cmd(ssh_channel: paramiko.Channel,
     logging.info(f'SSH Channel: send command \"{cmd}\" to {ssh_channel}')
     logging.info('****** return messages start ******')
 
-    while True and echo:
-        time.sleep(1)
-        while ssh_channel.recv_ready():
-            raw_data = ssh_channel.recv(4096)
-            full_output.append(raw_data)
-            time.sleep(0.2)
-
-        spend_time = time.time() - start_time
-        last_output = raw_to_string(full_output[-1]) if full_output else ""
-
-        if spend_time > timeout:
-            if prompt_cmd and last_output and re.search(prompt_cmd, last_output):
-                is_timeout = False
-            else:
-                is_timeout = True
-            break
-
-        # prompt_cmd: str = r"\[root@cvitek\][^\#]+\#"
-        if spend_time > check_time and prompt_cmd:
-            if last_output and re.search(prompt_cmd, last_output):
+    if echo and end_regex:
+        # sentinel mode: no prompt guessing, wait for marker until timeout
+        _, end_match = buf.wait(read, [end_regex], timeout)
+        if end_match:
+            ret_code = int(end_match.group(1))
+        else:
+            is_timeout = True
+    elif echo:
+        last_data_time = start_time
+        while True:
+            if buf.pump(read, 0.05):
+                last_data_time = time.time()
+            spend_time = time.time() - start_time
+
+            # early verdict: the case is decided the moment its pass/fail text appears,
+            # the echoed command line is skipped
+            if patterns and not echo_done:
+                _, echo_done = buf.expect([ECHO_END])
+            if patterns and echo_done:
+                index, verdict = buf.expect(patterns)
+                if verdict:
+                    passed = index < pass_count
+                    break
+
+            # prompt_cmd: str = r"\[root@cvitek\][^\#]+\#"
+            if spend_time > timeout:
+                is_timeout = not (prompt_regex and buf.search_tail(prompt_regex))
                 break
 
+            if spend_time > check_time and time.time() - last_data_time > 0.5:
+                if prompt_regex and buf.search_tail(prompt_regex):
+                    break
+
+    if verdict:
+        logging.info(f'SSH Channel: verdict \"{verdict.group(0)}\" ({"PASS" if passed else "FAIL"}) '
+                     f'in {time.time()-start_time:.2f}s')
+        if not passed:
+            send_break_signal_ssh(ssh_channel, reason='Fail verdict')
+        grace = verdict_grace if passed else 2
+        _, prompt_match = buf.wait(read, [prompt_regex], grace) if prompt_regex else (-1, None)
+        if passed and not prompt_match:
+            send_break_signal_ssh(ssh_channel, reason='No prompt after pass verdict')
+
     if echo:
-        for item in full_output:
-            log += raw_to_string(item)
-        logging.info(log.encode('utf-8', errors='replace').decode('utf-8'))
+        log = buf.finish()
+        if isinstance(log, SpooledLog):
+            logging.info(f'SSH Channel: {log.size} bytes spooled to \"{log.path}\", tail:')
+            logging.info(log.tail)
+        else:
+            if end_regex:
+                log = end_regex.sub('', log)
+            logging.info(log.encode('utf-8', errors='replace').decode('utf-8'))
 
         if ret_regex:
-            if type(ret_regex) == str:
-                ret = re.findall(ret_regex, log)
-            else:
-                ret = ret_regex.findall(log)
+            ret = findall(ret_regex, log)
 
-        if is_timeout and cmd.strip().startswith("./"):
+        if is_timeout and end_regex:
+            ret_code = 1
+            send_break_signal_ssh(ssh_channel)
+        elif is_timeout and interruptible:
             ret_code = 1
             send_break_signal_ssh(ssh_channel)
 
@@ -175,3 +394,257 @@ def ssh_run_cmd(ssh_channel: paramiko.Channel,
     logging.info(f"SSH Channel: execute {time.time() - start_time:.2f}s")
 
     return log, ret_code, ret
+
+
+def exec_reader(channel: paramiko.Channel) -> Callable[[float], bytes]:
+    """
+    Create read(wait) function of exec channel for ExpectBuffer, stdout and stderr are both read
+
+    :param paramiko.Channel channel: the exec channel
+    """
+    def read(wait: float) -> bytes:
+        if not (channel.recv_ready() or channel.recv_stderr_ready()):
+            if channel.closed or channel.eof_received:
+                time.sleep(wait)
+                return b''
+            select.select([channel], [], [], wait)
+        data = b''
+        if channel.recv_ready():
+            data += channel.recv(32768)
+        if channel.recv_stderr_ready():
+            data += channel.recv_stderr(32768)
+        return data
+    return read
+
+
+class SSHExecutor:
+    """
+    Exec-channel transport of the SSH server.
+
+    Every command runs on its own exec channel of one SSHClient transport: completion is the channel's
+    exit status instead of a guessed prompt, stdout and stderr are streamed via select, and several
+    commands can run at once (see run_many). The working directory is tracked across commands
+    like an interactive shell.
+    """
+    def __init__(self,
+                 ssh_client: paramiko.SSHClient,
+                 cwd: str = None,
+                 source_profile: bool = True,
+                 connect: Callable[[], paramiko.SSHClient] = None):
+        """
+        :param paramiko.SSHClient ssh_client: the connected client (see init_ssh_client)
+        :param str cwd: initial working directory, home directory by default
+        :param bool source_profile: source /etc/profile before each command, like a login shell
+        :param Callable connect: lease a client again when the transport is gone (held from ssh_pool,
+            see init_ssh_executor), None to use ssh_client only
+        """
+        self.client = ssh_client
+        self._connect = connect
+        self.cwd = cwd
+        self.source_profile = source_profile
+        self._lock = threading.Lock()
+        self._detached = []     # channels of commands left running after timeout
+
+    def __str__(self):
+        transport = self.client.get_transport()
+        peer = transport.getpeername() if transport and transport.is_active() else "closed"
+        return f"SSHExecutor({peer})"
+
+    @property
+    def transport(self) -> paramiko.Transport:
+        """The active transport, leased again if it was closed (e.g. a lost connection)"""
+        transport = self.client.get_transport()
+        if (not transport or not transport.is_active()) and self._connect:
+            with self._lock:
+                transport = self.client.get_transport()
+                if not transport or not transport.is_active():
+                    logging.warning(f'{self}: transport is gone, reconnect')
+                    ssh_pool.release(self.client)
+                    ssh_client = self._connect()
+                    if ssh_client:
+                        self.client = ssh_client
+                    transport = self.client.get_transport()
+        if not transport or not transport.is_active():
+            raise paramiko.SSHException("transport is not connected")
+        return transport
+
+    def _reap(self):
+        """Close the channels of the commands left running after timeout which have exited since"""
+        with self._lock:
+            for channel in list(self._detached):
+                if channel.closed or channel.exit_status_ready():
+                    channel.close()
+                    self._detached.remove(channel)
+
+    def close(self):
+        with self._lock:
+            for channel in self._detached:
+                channel.close()
+            self._detached.clear()
+        if self._connect:
+            ssh_pool.release(self.client)
+        else:
+            self.client.close()
+
+    def _wrap(self, cmd: str, token: str) -> str:
+        """Run the command in the tracked cwd, report the pid and the new cwd with markers"""
+        lines = [f"echo __PID_{token}_$$__"]
+        if self.source_profile:
+            lines.append("[ -f /etc/profile ] && . /etc/profile >/dev/null 2>&1")
+        if self.cwd:
+            lines.append(f"cd {shlex.quote(self.cwd)} 2>/dev/null")
+        lines += [cmd.strip(), f"__rc=$?; echo; echo __CWD_{token}_$(pwd)__; exit $__rc"]
+        return "\n".join(lines)
+
+    def interrupt(self, pid: str):
+        """Send SIGINT (like CTRL+C, then SIGTERM) to the command through another channel"""
+        logging.debug(f'{self}: interrupt pid {pid}')
+        try:
+            cmd = f"pkill -INT -P {pid} && sleep 1; pkill -TERM -P {pid}; kill -TERM {pid}"
+            _, stdout, _ = self.client.exec_command(cmd, timeout=5)
+            stdout.channel.recv_exit_status()
+        except Exception as e:
+            logging.error(f'{self}: interrupt pid {pid} fail! {e}')
+
+    def run(self,
+            cmd: str,
+            timeout: int = 5,
+            ret_regex: Union[str, re.Pattern] = None,
+            echo: bool = True,
+            fail_res: List[Union[str, re.Pattern]] = None,
+            verdict_grace: int = 10,
+            spool: SpoolWriter = None,
+            update_cwd: bool = True,
+            interruptible: bool = None) -> Tuple[str, int, list]:
+        """
+        Executes the command on its own exec channel, and handles output reading.
+
+        :param str cmd: The command to execute.
+        :param int timeout: Maximum time to wait for execution.
+        :param Union[str, re.Pattern] ret_regex: Regular expressions used to extract the output
+        :param bool echo: whether print the output in real time
+        :param List[Union[str, re.Pattern]] fail_res: declared failure patterns, if not None the case is decided
+            on the live stream: ret_regex (pass) or fail_res (fail) stops reading the moment it appears.
+        :param int verdict_grace: seconds to wait for the exit after the pass verdict before interrupting
+        :param SpoolWriter spool: write the raw output to a spool file instead of keeping it in memory
+        :param bool update_cwd: keep the working directory of the command for the next commands
+        :param bool interruptible: interrupt the command when it times out, by default if it runs a program ("./...")
+
+        :return Tuple[Union[str, SpooledLog], int, list]: (log, ret_code, ret), ret_code is the exit status
+            (1 if timeout)
+        """
+        log = ""
+        ret_code = 0
+        ret = []
+
+        token = uuid.uuid4().hex[:8]
+        pid_regex = re.compile(f"__PID_{token}_(\\d+)__")
+        cwd_regex = re.compile(f"__CWD_{token}_(.*?)__")
+        marker_regex = re.compile(f"\n?__(?:PID|CWD)_{token}_(.*?)__\n?")
+        buf = ExpectBuffer(spool=spool)
+        patterns, pass_count = verdict_patterns(ret_regex, fail_res) if fail_res is not None else ([], 0)
+        verdict = None
+        is_timeout = False
+        pid = None
+        on_data = (lambda x: print(x, end="")) if echo else None
+
+        self._reap()
+        start_time = time.time()
+        logging.info(f'{self}: exec command \"{cmd}\"')
+        logging.info('****** return messages start ******')
+        try:
+            channel = self.transport.open_session(timeout=10)
+            channel.exec_command(self._wrap(cmd, token))
+            read = exec_reader(channel)
+            deadline = start_time + timeout
+            while not channel.exit_status_ready():
+                data = buf.pump(read, 0.05)
+                if data and on_data:
+                    on_data(data)
+                if not pid:
+                    match = buf.search_tail(pid_regex)
+                    pid = match.group(1) if match else None
+                if patterns:
+                    index, verdict = buf.expect(patterns)
+                    if verdict:
+                        break
+                if time.time() > deadline:
+                    is_timeout = True
+                    break
+
+            if verdict:
+                passed = index < pass_count
+                logging.info(f'{self}: verdict \"{verdict.group(0)}\" ({"PASS" if passed else "FAIL"}) '
+                             f'in {time.time()-start_time:.2f}s')
+                grace_end = time.time() + (verdict_grace if passed else 0)
+                while not channel.exit_status_ready() and time.time() < grace_end:
+                    buf.pump(read, 0.05)
+                if not channel.exit_status_ready() and pid:
+                    self.interrupt(pid)
+            elif is_timeout:
+                logging.warning('Timeout')
+                # same as the shell transport: only the test programs are interrupted, daemons keep running
+                if (interruptible if interruptible is not None else cmd.strip().startswith("./")) and pid:
+                    self.interrupt(pid)
+                else:
+                    with self._lock:
+                        self._detached.append(channel)
+
+            # drain the output which is still in flight
+            drain_end = time.time() + (2 if channel.exit_status_ready() else 0)
+            while time.time() < drain_end and not channel.eof_received:
+                data = buf.pump(read, 0.05)
+                if data and on_data:
+                    on_data(data)
+            while channel.recv_ready() or channel.recv_stderr_ready():
+                data = buf.pump(read, 0)
+                if data and on_data:
+                    on_data(data)
+            buf.flush()
+            cwd = cwd_regex.search(buf.tail)
+            if update_cwd and cwd:
+                with self._lock:
+                    self.cwd = cwd.group(1)
+
+            if is_timeout:
+                ret_code = 1
+            elif channel.exit_status_ready():
+                ret_code = channel.recv_exit_status()
+            if channel not in self._detached:
+                channel.close()
+        except (paramiko.SSHException, OSError) as e:
+            logging.error(f'{self}: exec \"{cmd}\" fail! {e}')
+            ret_code = 1
+
+        log = buf.finish()
+        if isinstance(log, SpooledLog):
+            log = SpooledLog(log.path, log.size, tail=log.tail, compressed=log.compressed, strip=marker_regex)
+            logging.info(f'{self}: {log.size} bytes spooled to \"{log.path}\", tail:')
+            logging.info(log.tail)
+        else:
+            log = marker_regex.sub('', log)
+            if echo:
+                logging.info(log)
+        if ret_regex:
+            ret = findall(ret_regex, log)
+
+        logging.info('****** return messages end ******')
+        logging.info(f"{self}: execute {time.time() - start_time:.2f}s, exit status {ret_code}")
+        return log, ret_code, ret
+
+    def run_many(self, cmds: List[str], timeout: int = 5, max_workers: int = 8, **kwargs) -> List[Tuple[str, int, list]]:
+        """
+        Run several commands at once over the same transport, each on its own channel.
+        All of them start in the current working directory, which they do not change.
+
+        :param List[str] cmds: the commands
+        :param int timeout: Maximum time to wait for each command
+        :param int max_workers: maximum number of concurrent channels
+        :param kwargs: see run()
+
+        :return List[Tuple[str, int, list]]: (log, ret_code, ret) of each command in order
+        """
+        kwargs.setdefault("echo", False)
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(cmds)))) as executor:
+            futures = [executor.submit(self.run, cmd, timeout, update_cwd=False, **kwargs) for cmd in cmds]
+            return [f.result() for f in futures]
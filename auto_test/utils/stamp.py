@@ -0,0 +1,133 @@
+import os
+import json
+import hashlib
+import logging
+from typing import Dict, List, Optional, Set, Tuple
+
+from utils.action_graph import BOARD_ACTIONS, _overlap
+
+STAMP_DIR = ".env_stamps"     # in host_ws
+
+
+def fingerprints(env_config: List[dict]) -> List[str]:
+    """
+    sha256 of each resolved action (after replace_params/extract_regex_segments),
+    identical actions of one env file are numbered so each has its own fingerprint
+    """
+    result, seen = [], {}
+    for env_op in env_config:
+        digest = hashlib.sha256(json.dumps(env_op, sort_keys=True, default=str).encode()).hexdigest()
+        seen[digest] = seen.get(digest, 0) + 1
+        result.append(digest if seen[digest] == 1 else f"{digest}#{seen[digest]}")
+    return result
+
+
+def path_signature(path: str) -> Optional[list]:
+    """
+    State of a path on disk
+
+    :return list: ["file", size, mtime_ns], ["dir", files, sha256 of (name, size, mtime_ns) of all files],
+        None if the path does not exist
+    """
+    if not os.path.lexists(path):
+        return None
+    if not os.path.isdir(path) or os.path.islink(path):
+        st = os.lstat(path)
+        return ["file", st.st_size, st.st_mtime_ns]
+    h = hashlib.sha256()
+    count = 0
+    for root, dirnames, filenames in os.walk(path):
+        dirnames[:] = sorted(d for d in dirnames if d != STAMP_DIR)
+        for name in sorted(filenames + [d for d in dirnames if os.path.islink(os.path.join(root, d))]):
+            st = os.lstat(os.path.join(root, name))
+            h.update(f"{os.path.relpath(os.path.join(root, name), path)}|{st.st_size}|{st.st_mtime_ns}\n".encode())
+            count += 1
+    return ["dir", count, h.hexdigest()]
+
+
+def stamp_file(host_ws: str, env_file: str) -> str:
+    """Stamp of an env file in host_ws, named after the env file (and its path, the names are not unique)"""
+    tag = hashlib.sha1(os.path.abspath(env_file).encode()).hexdigest()[:8]
+    return os.path.join(host_ws, STAMP_DIR, f"{os.path.basename(env_file)}.{tag}.json")
+
+
+def load_stamp(path: str) -> Dict[str, dict]:
+    """
+    :return Dict[str, dict]: {fingerprint: {"desc", "artifacts": {path: path_signature()}}}, empty if missing or broken
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_stamp(path: str, stamp: Dict[str, dict]):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(stamp, f)
+    os.replace(path + ".tmp", path)
+
+
+def make_stamp(env_config: List[dict], writes: List[Set[str]], stamp: Dict[str, dict] = None) -> Dict[str, dict]:
+    """
+    Record the artifacts of the host actions once the preparation is finished. Board actions
+    and actions whose outputs are unknown are not recorded, so they are never skipped.
+
+    :param List[Set[str]] writes: host paths written by each action
+    :param Dict[str, dict] stamp: the previous stamp, its other actions (e.g. of cases not selected this time) are kept
+
+    :return Dict[str, dict]: the new stamp, see load_stamp()
+    """
+    stamp = dict(stamp or {})
+    for fingerprint, env_op, paths in zip(fingerprints(env_config), env_config, writes):
+        if env_op['action'] in BOARD_ACTIONS or not paths or any(p == "/" or p.startswith("board:") for p in paths):
+            stamp.pop(fingerprint, None)
+            continue
+        stamp[fingerprint] = {"desc": env_op.get('desc'), "artifacts": {p: path_signature(p) for p in sorted(paths)}}
+    return stamp
+
+
+def check_stamp(env_config: List[dict],
+                deps: List[Set[int]],
+                paths: List[Tuple[Set[str], Set[str]]],
+                stamp: Dict[str, dict]) -> Set[int]:
+    """
+    Find the actions already done by a previous run
+
+    An action is done if the stamp has its fingerprint and its artifacts are still as recorded.
+    It is redone if a host action it depends on is redone (its inputs change), or if a redone action
+    needs a path it produced which is gone since (e.g. the source of a later rename).
+    Board actions are always redone, the board may have been rebooted.
+
+    :param List[Set[int]] deps: see action_graph.build_graph()
+    :param List[Tuple[Set[str], Set[str]]] paths: (reads, writes) of each action, see action_graph.action_paths()
+    :param Dict[str, dict] stamp: see load_stamp()
+
+    :return Set[int]: indexes of the actions which can be skipped
+    """
+    entries = [stamp.get(fingerprint) for fingerprint in fingerprints(env_config)]
+    redo = set()
+    for i, env_op in enumerate(env_config):
+        entry = entries[i]
+        if env_op['action'] in BOARD_ACTIONS or not entry or \
+                any(path_signature(p) != sig for p, sig in entry['artifacts'].items()):
+            redo.add(i)
+
+    changed = True
+    while changed:
+        changed = False
+        for i in range(len(env_config)):
+            if i in redo:
+                continue
+            gone = {p for p, sig in entries[i]['artifacts'].items() if sig is None}
+            inputs_changed = any(j in redo and env_config[j]['action'] not in BOARD_ACTIONS for j in deps[i])
+            consumed = any(i in deps[k] and _overlap(gone, paths[k][0] | paths[k][1]) for k in redo) if gone else False
+            if inputs_changed or consumed:
+                redo.add(i)
+                changed = True
+
+    skipped = set(range(len(env_config))) - redo
+    for i in sorted(skipped):
+        logging.info(f'Skip "{env_config[i].get("desc")}": already prepared')
+    return skipped
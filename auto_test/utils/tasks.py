@@ -0,0 +1,171 @@
+import os
+import math
+import time
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pytest
+from _pytest.junitxml import LogXML
+
+_UNITS = {"s": 1, "m": 60, "h": 3600}
+
+# Time budget of the running group, configured by TaskGroups
+_TASKS = {
+    "task": None,       # name of the running group
+    "deadline": None,   # epoch, None if it has no budget
+}
+
+
+def parse_tasks(spec: str) -> List[Tuple[str, float]]:
+    """
+    Parse --tasks
+
+    :param str spec: e.g. "auto_test=2h,audio_ut=3600,isp"
+
+    :return List[Tuple[str, float]]: [(marker, budget seconds, 0 if none)], e.g. [("auto_test", 7200), ...]
+    """
+    tasks = []
+    for entry in spec.split(","):
+        name, _, budget = entry.strip().partition("=")
+        if not name:
+            continue
+        budget = budget.strip().lower()
+        try:
+            seconds = float(budget[:-1]) * _UNITS[budget[-1]] if budget[-1:] in _UNITS else float(budget or 0)
+        except ValueError:
+            raise pytest.UsageError(f'--tasks: invalid time budget \"{budget}\" of {name}')
+        tasks.append((name.strip(), seconds))
+    return tasks
+
+
+def budget_timeout(timeout: float) -> float:
+    """Timeout of a case command of the running group, at most the rest of its time budget"""
+    deadline = _TASKS["deadline"]
+    if deadline is None:
+        return timeout
+    left = max(1, math.ceil(deadline - time.time()))
+    if left < timeout:
+        logging.info(f'Time budget of {_TASKS["task"]}: timeout {timeout}s -> {left}s')
+        return left
+    return timeout
+
+
+class TaskGroups:
+    """
+    Run several marker groups (tasks) in one session (pytest plugin, see conftest.py)
+
+    The device is set up once (connection, reboot, image check, nfs mount) and the cases are collected
+    once. A case belongs to the first task whose marker it has, the others are deselected. The tasks
+    run one after another in the given order, each within its time budget counted from its first case:
+    the case commands are cut at the end of the budget and the remaining cases of the task are skipped.
+    Each task gets its own html/junit report (besides the --html/--junit-xml of the whole session).
+    With several boards (--devices) the budget is counted on each board.
+    """
+    def __init__(self, tasks: List[Tuple[str, float]]):
+        """
+        :param List[Tuple[str, float]] tasks: [(marker, budget seconds, 0 if none)], see parse_tasks()
+        """
+        self.tasks = tasks
+        self.budgets = dict(tasks)
+        self.started = {}       # task -> epoch of its first case
+
+    def task_of(self, item: pytest.Item) -> Optional[str]:
+        markers = {marker.name for marker in item.iter_markers()}
+        return next((name for name, _ in self.tasks if name in markers), None)
+
+    def pytest_collection_modifyitems(self, session, config, items):
+        selected, deselected = [], []
+        for item in items:
+            (selected if self.task_of(item) else deselected).append(item)
+        if deselected:
+            config.hook.pytest_deselected(items=deselected)
+            items[:] = selected
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_collection_finish(self, session):
+        """After the other orderings (pytest-ordering, --schedule): the tasks in the given order"""
+        order = {name: n for n, (name, _) in enumerate(self.tasks)}
+        position = {id(item): n for n, item in enumerate(session.items)}
+        session.items.sort(key=lambda item: (order[self.task_of(item)], position[id(item)]))
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_runtest_setup(self, item):
+        """Before the fixtures: start the budget of a new task, skip the cases once it is used up"""
+        task = self.task_of(item)
+        start = self.started.setdefault(task, time.time())
+        budget = self.budgets.get(task)
+        _TASKS.update(task=task, deadline=start + budget if budget else None)
+        if budget and time.time() >= start + budget:
+            pytest.skip(f"time budget of {task} ({budget:.0f}s) used up")
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_makereport(self, item, call):
+        """Tag the report with its task (kept by pytest-xdist), the task reports filter on it"""
+        outcome = yield
+        outcome.get_result().task = self.task_of(item)
+
+    def pytest_sessionfinish(self, session):
+        _TASKS.update(task=None, deadline=None)
+
+
+class _TaskReport:
+    """Mixin of the report plugins, only the test reports of one task"""
+    task = None
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_runtest_logreport(self, report):
+        if getattr(report, "task", None) == self.task:
+            super().pytest_runtest_logreport(report)
+
+
+class _TaskLogXML(_TaskReport, LogXML):
+    pass
+
+
+def task_reports(config: pytest.Config, groups: TaskGroups, reports_dir: str) -> Dict[str, object]:
+    """
+    Report plugins of the tasks (main process only, like --html/--junit-xml):
+    <reports_dir>/<task>.xml with the junit_* ini options, <reports_dir>/<task>.html like --html
+    (--self-contained-html, --css) if pytest-html is installed
+
+    :return Dict[str, object]: {plugin name: plugin} to register
+    """
+    plugins = {}
+    for name, _ in groups.tasks:
+        xml = _TaskLogXML(os.path.join(reports_dir, f"{name}.xml"),
+                          config.option.junitprefix,
+                          config.getini("junit_suite_name"),
+                          config.getini("junit_logging"),
+                          config.getini("junit_duration_report"),
+                          config.getini("junit_family"),
+                          config.getini("junit_log_passing_tests"))
+        xml.task = name
+        plugins[f"task_junit_{name}"] = xml
+
+    try:
+        import pytest_html
+        from pytest_html.report import Report
+        from pytest_html.report_data import ReportData
+        from pytest_html.selfcontained_report import SelfContainedReport
+        from pytest_html.util import _process_css, _read_template
+    except ImportError:
+        logging.warning("pytest-html is not installed, no html report of the tasks")
+        return plugins
+
+    resources = Path(pytest_html.__file__).parent.joinpath("resources")
+    template = _read_template([resources])
+    css = _process_css(Path(resources, "style.css"),
+                       [Path(os.path.expandvars(path)).expanduser() for path in config.getoption("css")])
+    base = SelfContainedReport if config.getoption("self_contained_html") else Report
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_collection_finish(self, session):
+        self._report.collected_items = sum(1 for item in session.items if groups.task_of(item) == self.task)
+
+    html_class = type("TaskHTMLReport", (_TaskReport, base), {"pytest_collection_finish": pytest_collection_finish})
+    for name, _ in groups.tasks:
+        html = html_class(os.path.join(reports_dir, f"{name}.html"), config, ReportData(config), template, css)
+        html.task = name
+        plugins[f"task_html_{name}"] = html
+    return plugins
@@ -77,25 +77,23 @@ upgrade_board() {
     fi
 }
 
-# 运行pytest测试函数
-run_pytest() {
+# 运行测试任务函数: 选中的任务(marker)在一个pytest会话中执行, 设备只初始化一次,
+# 每个任务有自己的时间预算和报告 reports/<任务>.html/.xml (见 cv186x/run_tasks.py)
+run_tasks() {
     local workspace=$1
-    local marker=$2
-    local report_entry=$3
-    local html_name=$(echo "$marker" | sed 's/ and /-/g')
     
-    log "运行pytest测试: workspace=$workspace, marker=$marker"
+    log "运行测试任务: workspace=$workspace, tasks=$TEST_TASK"
     
     cd "$workspace" || error_exit "无法进入目录: $workspace"
     
     # 安装依赖
     python3 -m pip install -q -r ../requirements.txt -i https://pypi.tuna.tsinghua.edu.cn/simple
     
-    # 运行测试
-    python3 -m pytest \
-        -m "$marker" \
-        --html="reports/${html_name}.html" \
-        --junit-xml="reports/${html_name}.xml" \
+    # 运行测试: 各任务的时间预算在会话内执行, 外层timeout只防止整个会话挂死
+    local ret=0
+    timeout 10h python3 run_tasks.py \
+        --test_task="$TEST_TASK" \
+        --task_reports="reports" \
         --serial_port="$SERIAL_PORT" \
         --board="$BOARD" \
         --test_path="/mnt/nfs" \
@@ -107,17 +105,19 @@ run_pytest() {
         --branch="$TEST_BRANCH" \
         --sdk_version="latest_release" \
         --model_ver="<newest>" \
-        --cvipqtool_ver="<newest>"
+        --cvipqtool_ver="<newest>" || ret=$?
     
     # 处理测试报告
-    if [ -f "reports/${html_name}.html" ]; then
-        python3 ../scripts/report_process.py "reports/${html_name}.html" "${html_name}.html.tmp"
-        if [ $? -eq 0 ]; then
-            mv -f "${html_name}.html.tmp" "reports/${html_name}.html"
+    local html_name
+    for html_name in auto_test audio_ut vc_ut isp tdl_sdk; do
+        if [ -f "reports/${html_name}.html" ]; then
+            python3 ../scripts/report_process.py "reports/${html_name}.html" "${html_name}.html.tmp" \
+                && mv -f "${html_name}.html.tmp" "reports/${html_name}.html"
         fi
-    fi
+    done
     
     cd - > /dev/null
+    return $ret
 }
 
 # 检查任务是否应该执行
@@ -194,45 +194,9 @@ main() {
     # Stage 4: 执行测试任务
     log "=== Stage 4: 执行测试任务 ==="
     
-    # Multimedia - auto_test
-    if should_run_task "auto_test"; then
-        log "执行 Multimedia auto_test 测试"
-        timeout 2h bash -c "
-            run_pytest \"auto_test/cv186x\" \"auto_test\" \"Multimedia\"
-        " || log "Multimedia auto_test 测试超时或有错误"
-    fi
-    
-    # Multimedia - audio_ut
-    if should_run_task "audio_ut"; then
-        log "执行 Multimedia audio_ut 测试"
-        timeout 1h bash -c "
-            run_pytest \"auto_test/cv186x\" \"audio_ut\" \"Multimedia\"
-        " || log "Multimedia audio_ut 测试超时或有错误"
-    fi
-    
-    # Multimedia - vc_ut
-    if should_run_task "vc_ut"; then
-        log "执行 Multimedia vc_ut 测试"
-        timeout 4h bash -c "
-            run_pytest \"auto_test/cv186x\" \"vc_ut\" \"Multimedia\"
-        " || log "Multimedia vc_ut 测试超时或有错误"
-    fi
-    
-    # ISP 测试
-    if should_run_task "isp"; then
-        log "执行 ISP 测试"
-        timeout 1h bash -c "
-            run_pytest \"auto_test/cv186x\" \"isp\" \"ISP\"
-        " || log "ISP 测试超时或有错误"
-    fi
-    
-    # TDL_SDK 测试
-    if should_run_task "tdl_sdk"; then
-        log "执行 TDL_SDK 测试"
-        timeout 1h bash -c "
-            run_pytest \"auto_test/cv186x\" \"tdl_sdk\" \"TDL_SDK\"
-        " || log "TDL_SDK 测试超时或有错误"
-    fi
+    # 各任务的时间预算(auto_test 2h, audio_ut 1h, vc_ut 4h, isp 1h, tdl_sdk 1h)在会话内执行,
+    # 超出预算的用例命令被中断, 剩余用例跳过
+    run_tasks "auto_test/cv186x" || log "测试任务超时或有错误"
     
     log "所有任务执行完成"
 }